@@ -0,0 +1,158 @@
+import numpy as np
+
+from DismalSim.deltagraph import deltacalc
+from DismalSim.deltagraph import digraph
+
+"""Regression checks of the simulation engines against gc_multicount_delta.
+
+The script builds the graphs of test_05, which has only linear edges,
+and of test_00, which mixes absolute and percent edges, and runs each
+of them through every other engine: the compiled, sparse and
+generous-parent runs, the ordered steps of the CompiledGraph, the batch
+and ensemble runs, and the impulse response. Each engine's data must
+match the data log of the greedy-child DiGraph run to a relative
+tolerance of 1e-12; both graphs are a single feedback loop, so that
+ordered steps follow the same lag as plain ones, and neither has random
+vertices, so that every run of the ensemble is the plain run. The
+script prints True for every engine that agrees, and raises an
+AssertionError otherwise.
+"""
+
+
+def build_05():
+    aGraph = digraph.DiGraph()
+    aGraph + digraph.Vertex("G", 1920.2, deltaInherent=3.59)
+    aGraph + digraph.Vertex("T", 1712.9, deltaInherent=1.11)
+    aGraph + digraph.Vertex("YD", 4266.7)
+    aGraph + digraph.Vertex("C", 3825.6, deltaInherent=-1.37)
+    aGraph + digraph.Vertex("IM", 629.7, deltaInherent=36.14)
+    aGraph + digraph.Vertex("Y", 5979.6)
+    aGraph + digraph.Vertex("EX", 551.9, deltaInherent=62.03)
+    aGraph + digraph.Vertex("PL", 66.77, deltaInherent=0.54)
+    aGraph + digraph.Vertex('I', 993.5, deltaInherent=0.77)
+    aGraph + digraph.Vertex("FX", 71.41, deltaInherent=3)
+    aGraph + digraph.Vertex("M2", 3223.58, deltaInherent=10.65)
+    aGraph + digraph.Vertex("NIR", 8.1, deltaInherent=0.38)
+    aGraph + digraph.Vertex("RIR", 4.4)
+    aGraph.add_edge("T", "G", "aa_lin", [1.15])
+    aGraph.add_edge("Y", "T", "aa_lin", [0.31])
+    aGraph.add_edge("G", "Y", "aa_lin", [1])
+    aGraph.add_edge("T", "YD", "aa_lin", [-1])
+    aGraph.add_edge("Y", "YD", "aa_lin", [1])
+    aGraph.add_edge("YD", "C", "aa_lin", [0.98])
+    aGraph.add_edge("C", "Y", "aa_lin", [1])
+    aGraph.add_edge("IM", "Y", "aa_lin", [-1])
+    aGraph.add_edge("Y", "IM", "aa_lin", [0.08])
+    aGraph.add_edge("EX", "Y", "aa_lin", [1])
+    aGraph.add_edge("PL", "IM", "aa_lin", [-9.14])
+    aGraph.add_edge("Y", "PL", "aa_lin", [0.03])
+    aGraph.add_edge("PL", "EX", "aa_lin", [-12.05])
+    aGraph.add_edge("Y", "I", "aa_lin", [0.11])
+    aGraph.add_edge("I", "Y", "aa_lin", [1])
+    aGraph.add_edge("IM", "FX", "aa_lin", [0.03])
+    aGraph.add_edge("FX", "IM", "aa_lin", [-0.6])
+    aGraph.add_edge("FX", "EX", "aa_lin", [-4.11])
+    aGraph.add_edge("EX", "FX", "aa_lin", [-0.09])
+    aGraph.add_edge("PL", "I", "aa_lin", [8.6])
+    aGraph.add_edge("Y", "M2", "aa_lin", [0.43])
+    aGraph.add_edge("M2", "PL", "aa_lin", [-0.03])
+    aGraph.add_edge("PL", "M2", "aa_lin", [11.4])
+    aGraph.add_edge("NIR", "M2", "aa_lin", [-14.97])
+    aGraph.add_edge("PL", "NIR", "aa_lin", [0.37])
+    aGraph.add_edge("PL", "RIR", "pa_lin", [-1])
+    aGraph.add_edge("NIR", "RIR", "aa_lin", [1])
+    aGraph.add_edge("RIR", "I", "aa_lin", [-4.92])
+    aGraph.add_edge("RIR", "FX", "aa_lin", [0.79])
+    aGraph.add_edge("RIR", "C", "aa_lin", [-6.22])
+    return aGraph
+
+
+def build_00():
+    aGraph = digraph.DiGraph()
+    aGraph + digraph.Vertex("G", 1920.2)
+    aGraph + digraph.Vertex("T", 1712.9)
+    aGraph + digraph.Vertex("C", 3825.6)
+    aGraph + digraph.Vertex("YD", 4266.7)
+    aGraph + digraph.Vertex("M", 629.7)
+    aGraph + digraph.Vertex("Y", 5979.6)
+    aGraph + digraph.Vertex("X", 551.9)
+    aGraph + digraph.Vertex("PL", 130.7)
+    aGraph + digraph.Vertex("I", 993.5)
+    aGraph + digraph.Vertex("FX", 91.22)
+    aGraph + digraph.Vertex("M2", 3223.58)
+    aGraph + digraph.Vertex("NIR", 8.1)
+    aGraph + digraph.Vertex("RIR", 2.7)
+    aGraph.add_edge("T", "G", "aa_lin", [0.898, 12.571])
+    aGraph.add_edge("G", "Y", "aa_lin", [1])
+    aGraph.add_edge("T", "YD", "aa_lin", [-1])
+    aGraph.add_edge("Y", "YD", "aa_lin", [1])
+    aGraph.add_edge("Y", "T", "aa_lin", [0.2786, 5.5414])
+    aGraph.add_edge("YD", "C", "aa_lin", [0.8631, 11.281])
+    aGraph.add_edge("C", "Y", "aa_lin", [1])
+    aGraph.add_edge("Y", "M", "aa_lin", [0.1045, 2.0599])
+    aGraph.add_edge("M", "Y", "aa_lin", [-1])
+    aGraph.add_edge("X", "Y", "aa_lin", [1])
+    aGraph.add_edge("PL", "M", "aa_lin", [2.7145, 9.8097])
+    aGraph.add_edge("Y", "PL", "aa_lin", [0.0159, 0.6069])
+    aGraph.add_edge("PL", "M2", "aa_lin", [16.766, 42.133])
+    aGraph.add_edge("M2", "PL", "aa_lin", [0.0211, 1.3332])
+    aGraph.add_edge("Y", "M2", "aa_lin", [0.4264, 24.288])
+    aGraph.add_edge("I", "Y", "aa_lin", [1])
+    aGraph.add_edge("NIR", "RIR", "aa_lin", [1])
+    aGraph.add_edge("FX", "X", "pp_lin", [-1.0399, 9.6864])
+    aGraph.add_edge("NIR", "M2", "ap_lin", [-0.5897, 8.3919])
+    aGraph.add_edge("NIR", "I", "ap_lin", [-2.4148, 9.5452])
+    aGraph.add_edge("RIR", "FX", "ap_lin", [1.1715, -0.3175])
+    aGraph.add_edge("PL", "RIR", "pa_lin", [-1])
+    aGraph.add_edge("Y", "NIR", "pa_lin", [0.2122, -1.5666])
+    return aGraph
+
+
+def check(label, values, expected):
+    agree = np.allclose(values, expected, rtol=1e-12, atol=1e-12)
+    print(label, agree)
+    assert agree, label
+
+
+iDelta = {"G": 114.4, "T": 50.4, "C": 134.6, "YD": 144, "IM": -6.2, "M": -6.2,
+          "Y": 194.4, "EX": 43, "X": 43, "PL": 5.5, "I": -49.2, "FX": -1.54,
+          "M2": 118.6, "NIR": -2.41, "RIR": -1.21}
+maxCount = 10
+
+for name, build in (("test_05", build_05), ("test_00", build_00)):
+    expected = deltacalc.gc_multicount_delta(build(), maxCount,
+                                             iDelta).get_array()
+
+    output = deltacalc.gc_multicount_delta(build().compile(), maxCount,
+                                           iDelta)
+    check(name + " compiled", output.get_array(), expected)
+
+    output = deltacalc.gc_multicount_delta(build(), maxCount, iDelta,
+                                           sparseFlag=True)
+    check(name + " sparse", output.get_array(), expected)
+
+    output = deltacalc.gp_multicount_delta(build(), maxCount, iDelta)
+    check(name + " generous parent", output.get_array(), expected)
+
+    output = build().compile().multicount_delta(maxCount, iDelta,
+                                                orderedFlag=True)
+    check(name + " ordered_step", output.get_array(), expected)
+    output = build().compile().multicount_delta(maxCount, iDelta,
+                                                orderedFlag=True, workers=2)
+    check(name + " threaded ordered_step", output.get_array(), expected)
+
+    outputs = deltacalc.gc_batch_multicount_delta(build(), maxCount,
+                                                  [iDelta, {"Y": 1}, iDelta])
+    check(name + " batch", outputs[0].get_array(), expected)
+    check(name + " batch, last run", outputs[2].get_array(), expected)
+
+    runs = deltacalc.gc_ensemble(build(), maxCount, iDelta, 3, seed=1)
+    check(name + " ensemble", runs, np.broadcast_to(expected, runs.shape))
+
+    # Horizon k of the impulse response is row k + 1 of the data log.
+    for method in ("power", "eigen", "step"):
+        response = deltacalc.gc_impulse_response(build(), range(maxCount + 1),
+                                                 iDelta, method)
+        check("{0} impulse_response, {1} ({2})".format(name, method,
+                                                       response.method),
+              response.values, expected[1:])
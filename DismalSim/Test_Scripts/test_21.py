@@ -0,0 +1,170 @@
+import tempfile
+
+import numpy as np
+
+from DismalSim.deltagraph import checkpoint
+from DismalSim.deltagraph import deltacalc
+from DismalSim.deltagraph import digraph
+
+"""Regression checks of checkpoint save and resume for every engine.
+
+The script builds the graph of test_00, runs it with every engine, and
+runs it again with checkpoints, interrupting the second run part of the
+way through; the interrupted run is then resumed from its last
+checkpoint by gc_resume, on a freshly built graph. The single runs are
+interrupted by an output sink raising an exception, and the batch and
+ensemble runs, which take no sinks, by a checkpoint raising one after
+being saved. The resumed data must match that of the uninterrupted run
+to a relative tolerance of 1e-12, and the uninterrupted runs must match
+the greedy-child DiGraph run. The script prints True for every engine
+that agrees, and raises an AssertionError otherwise.
+"""
+
+
+class Interruption(Exception):
+    pass
+
+
+class InterruptingSink:
+    """Raises an Interruption on the <at>th row written to it."""
+
+    def __init__(self, at):
+        self.at = at
+        self.rows = 0
+
+    def open(self, names):
+        self.rows = 0
+
+    def write_row(self, values):
+        self.rows += 1
+        if self.rows == self.at:
+            raise Interruption()
+
+    def close(self):
+        pass
+
+
+class InterruptingCheckpoint(checkpoint.Checkpoint):
+    """Raises an Interruption after saving the checkpoint of step <at>."""
+
+    at = None
+
+    def save(self, count, state, dataLog=None, rng=None):
+        super().save(count, state, dataLog, rng)
+        if count == self.at:
+            raise Interruption()
+
+
+def run_interrupted(run):
+    """Calls <run>, saving InterruptingCheckpoints until it is interrupted."""
+
+    originalCheckpoint = checkpoint.Checkpoint
+    checkpoint.Checkpoint = InterruptingCheckpoint
+    try:
+        run()
+    except Interruption:
+        pass
+    finally:
+        checkpoint.Checkpoint = originalCheckpoint
+
+
+def build():
+    aGraph = digraph.DiGraph()
+    aGraph + digraph.Vertex("G", 1920.2)
+    aGraph + digraph.Vertex("T", 1712.9)
+    aGraph + digraph.Vertex("C", 3825.6)
+    aGraph + digraph.Vertex("YD", 4266.7)
+    aGraph + digraph.Vertex("M", 629.7)
+    aGraph + digraph.Vertex("Y", 5979.6)
+    aGraph + digraph.Vertex("X", 551.9)
+    aGraph + digraph.Vertex("PL", 130.7)
+    aGraph + digraph.Vertex("I", 993.5)
+    aGraph + digraph.Vertex("FX", 91.22)
+    aGraph + digraph.Vertex("M2", 3223.58)
+    aGraph + digraph.Vertex("NIR", 8.1)
+    aGraph + digraph.Vertex("RIR", 2.7)
+    aGraph.add_edge("T", "G", "aa_lin", [0.898, 12.571])
+    aGraph.add_edge("G", "Y", "aa_lin", [1])
+    aGraph.add_edge("T", "YD", "aa_lin", [-1])
+    aGraph.add_edge("Y", "YD", "aa_lin", [1])
+    aGraph.add_edge("Y", "T", "aa_lin", [0.2786, 5.5414])
+    aGraph.add_edge("YD", "C", "aa_lin", [0.8631, 11.281])
+    aGraph.add_edge("C", "Y", "aa_lin", [1])
+    aGraph.add_edge("Y", "M", "aa_lin", [0.1045, 2.0599])
+    aGraph.add_edge("M", "Y", "aa_lin", [-1])
+    aGraph.add_edge("X", "Y", "aa_lin", [1])
+    aGraph.add_edge("PL", "M", "aa_lin", [2.7145, 9.8097])
+    aGraph.add_edge("Y", "PL", "aa_lin", [0.0159, 0.6069])
+    aGraph.add_edge("PL", "M2", "aa_lin", [16.766, 42.133])
+    aGraph.add_edge("M2", "PL", "aa_lin", [0.0211, 1.3332])
+    aGraph.add_edge("Y", "M2", "aa_lin", [0.4264, 24.288])
+    aGraph.add_edge("I", "Y", "aa_lin", [1])
+    aGraph.add_edge("NIR", "RIR", "aa_lin", [1])
+    aGraph.add_edge("FX", "X", "pp_lin", [-1.0399, 9.6864])
+    aGraph.add_edge("NIR", "M2", "ap_lin", [-0.5897, 8.3919])
+    aGraph.add_edge("NIR", "I", "ap_lin", [-2.4148, 9.5452])
+    aGraph.add_edge("RIR", "FX", "ap_lin", [1.1715, -0.3175])
+    aGraph.add_edge("PL", "RIR", "pa_lin", [-1])
+    aGraph.add_edge("Y", "NIR", "pa_lin", [0.2122, -1.5666])
+    return aGraph
+
+
+def check(label, values, expected):
+    agree = np.allclose(values, expected, rtol=1e-12, atol=1e-12)
+    print(label, agree)
+    assert agree, label
+
+
+iDelta = {"G": 114.4, "T": 50.4, "C": 134.6, "YD": 144, "M": -6.2, "Y": 194.4,
+          "X": 43, "PL": 5.5, "I": -49.2, "FX": -1.54, "M2": 118.6, "NIR":
+          -2.41, "RIR": -1.21}
+maxCount = 20
+expected = deltacalc.gc_multicount_delta(build(), maxCount, iDelta).get_array()
+
+# Single runs, interrupted by a sink partway between two checkpoints.
+singleRuns = (
+    ("gc_multicount_delta",
+     lambda **kwargs: deltacalc.gc_multicount_delta(
+         build(), maxCount, iDelta, **kwargs)),
+    ("sparse",
+     lambda **kwargs: deltacalc.gc_multicount_delta(
+         build(), maxCount, iDelta, sparseFlag=True, **kwargs)),
+    ("generous parent",
+     lambda **kwargs: deltacalc.gp_multicount_delta(
+         build(), maxCount, iDelta, **kwargs)),
+    ("compiled",
+     lambda **kwargs: build().compile().multicount_delta(
+         maxCount, iDelta, **kwargs)),
+    ("ordered_step",
+     lambda **kwargs: build().compile().multicount_delta(
+         maxCount, iDelta, orderedFlag=True, **kwargs)))
+
+for name, run in singleRuns:
+    check(name, run().get_array(), expected)
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            run(sinks=[InterruptingSink(14)], checkpointDir=directory,
+                checkpointEvery=5)
+        except Interruption:
+            pass
+        output = deltacalc.gc_resume(build(), directory)
+        check(name + " resumed", output.get_array(), expected)
+
+# Batch and ensemble runs, interrupted right after the checkpoint of
+# step 10; only the interrupted runs save InterruptingCheckpoints.
+InterruptingCheckpoint.at = 10
+with tempfile.TemporaryDirectory() as directory:
+    run_interrupted(lambda: deltacalc.gc_batch_multicount_delta(
+        build(), maxCount, [iDelta, {"Y": 1}], checkpointDir=directory,
+        checkpointEvery=5))
+    outputs = deltacalc.gc_resume(build(), directory)
+    check("batch resumed", outputs[0].get_array(), expected)
+    check("batch resumed, last run", outputs[1].get_array(),
+          deltacalc.gc_multicount_delta(build(), maxCount,
+                                        {"Y": 1}).get_array())
+with tempfile.TemporaryDirectory() as directory:
+    run_interrupted(lambda: deltacalc.gc_ensemble(
+        build(), maxCount, iDelta, 3, seed=1, checkpointDir=directory,
+        checkpointEvery=5))
+    runs = deltacalc.gc_resume(build(), directory)
+    check("ensemble resumed", runs, np.broadcast_to(expected, runs.shape))
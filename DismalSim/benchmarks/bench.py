@@ -0,0 +1,293 @@
+"""Scaling benchmarks of the simulation engines.
+
+The functions of this module time, separately, the stages of a
+simulation of the synthetic graphs of the generators module: building
+the DiGraph through its public API, compiling it, stepping it with
+each of the engines of the deltacalc module, and writing the data log
+through the output sinks. The results are collected as CaseResults,
+and written to a JSON file together with a description of the
+environment, so that the throughput of the engines--steps and edges
+per second--can be tracked across versions of the package.
+
+The module can be run as a script:
+
+    python -m DismalSim.benchmarks.bench --sizes 100 10000 1000000
+
+which writes its results to 'benchmark.json'; see main for the other
+options.
+
+Functions:
+    - time_case
+    - run_suite
+    - write_results
+
+Classes:
+    - CaseResult
+"""
+
+import argparse
+import collections
+import datetime
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+
+import numpy as np
+
+from DismalSim.benchmarks import generators
+from DismalSim.deltagraph import deltacalc
+from DismalSim.deltagraph import output
+
+
+CaseResult = collections.namedtuple("CaseResult",
+                                    ["kind", "seed", "vertices", "edges",
+                                     "steps", "generateTime", "buildTime",
+                                     "compileTime", "engines", "outputs"])
+CaseResult.__doc__ = """The timings of one synthetic graph.
+
+All times are in seconds, measured with time.perf_counter.
+
+Class Data:
+    - kind, the generator of the graph.
+    - seed, the seed of the graph.
+    - vertices, the number of vertices of the graph.
+    - edges, the number of edges of the graph.
+    - steps, the number of steps run after the initial deltas.
+    - generateTime, the time taken to draw the random graph.
+    - buildTime, the time taken to build the DiGraph.
+    - compileTime, the time taken to compile the DiGraph, or None if
+      no compiled engine was run.
+    - engines, a dictionary of the timings of each engine, indexed by
+      engine name: 'stepTime', the time of the run, and its throughput
+      in 'stepsPerSecond' and 'edgesPerSecond', counting the <steps>
+      steps that evaluate the edges.
+    - outputs, a dictionary of the timings of each output format,
+      indexed by format: 'time', the time taken to write the data log,
+      'rowsPerSecond', and 'bytes', the size of the file written.
+"""
+
+engines = ("loop", "sparse", "gp", "compiled")
+formats = ("npy", "csv", "xlsx")
+
+_sinks = {"npy": lambda name: output.NumpySink(name, False),
+          "csv": output.CSVSink,
+          "xlsx": output.SpreadsheetSink}
+
+
+def _timed(function, *args, **kwargs):
+    """Returns the result of a call and the time it took."""
+
+    gc.collect()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _run_engine(engine, aGraph, compiledGraph, steps, initDeltaDict):
+    """Runs <steps> steps of <engine>, and returns the data log."""
+
+    if engine == "compiled":
+        return deltacalc.gc_multicount_delta(compiledGraph, steps,
+                                             initDeltaDict)
+    if engine == "gp":
+        return deltacalc.gp_multicount_delta(aGraph, steps, initDeltaDict)
+    return deltacalc.gc_multicount_delta(aGraph, steps, initDeltaDict,
+                                         sparseFlag=(engine == "sparse"))
+
+
+def _write_log(sink, dataLog):
+    """Streams the rows of <dataLog> to <sink>."""
+
+    with sink:
+        sink.open(dataLog.names)
+        for row in dataLog.get_array():
+            sink.write_row(row)
+
+
+def time_case(spec, steps, engineNames=("loop", "compiled"),
+              formatNames=("npy", "csv"), generateTime=None):
+    """Times the stages of a simulation of the graph of <spec>.
+
+    The engines are run one after another, each from the initial state
+    of the graph: the first DiGraph engine on the DiGraph whose build
+    is timed, every other one on a DiGraph built anew from <spec>,
+    outside the timed section, and the compiled engine on a
+    CompiledGraph compiled before any of them. Every run applies
+    an initial delta of 1 to the first tenth of the vertices. The data
+    log of the first engine is then written in each of <formatNames>,
+    to a temporary directory; 'xlsx' is skipped for graphs with more
+    columns than a spreadsheet can hold.
+
+    Function Arguments:
+        - spec, a generators.GraphSpec.
+        - steps, the number of steps of each run.
+        - engineNames, the engines to run: 'loop' for the greedy-child
+          loop, 'sparse' for its frontier-based variant, 'gp' for the
+          generous-parent loop, and 'compiled' for the CompiledGraph.
+        - formatNames, the output formats to time: 'npy', 'csv' or
+          'xlsx'.
+        - generateTime, the time taken to generate <spec>, if known.
+
+    Returns a CaseResult.
+    """
+
+    aGraph, buildTime = _timed(generators.build_graph, spec)
+    nEdges = len(spec.edgeParent)
+    initDeltaDict = {"v{0}".format(i): 1.0
+                     for i in range(max(len(spec.data) // 10, 1))}
+    compiledGraph = None
+    compileTime = None
+    if "compiled" in engineNames:
+        compiledGraph, compileTime = _timed(aGraph.compile)
+    engineTimes = {}
+    firstLog = None
+    freshGraph = aGraph
+    for engine in engineNames:
+        if freshGraph is None and engine != "compiled":
+            freshGraph = generators.build_graph(spec)
+        dataLog, stepTime = _timed(_run_engine, engine, freshGraph,
+                                   compiledGraph, steps, initDeltaDict)
+        if engine != "compiled":
+            freshGraph = None
+        if firstLog is None:
+            firstLog = dataLog
+        engineTimes[engine] = {
+            "stepTime": stepTime,
+            "stepsPerSecond": steps / stepTime,
+            "edgesPerSecond": nEdges * steps / stepTime}
+    outputTimes = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in formatNames:
+            if firstLog is None:
+                break
+            if name == "xlsx" and len(firstLog.names) > 16384:
+                continue
+            sink = _sinks[name](os.path.join(directory, "bench"))
+            _, writeTime = _timed(_write_log, sink, firstLog)
+            outputTimes[name] = {
+                "time": writeTime,
+                "rowsPerSecond": firstLog.count / writeTime,
+                "bytes": os.path.getsize(sink.filename)}
+    return CaseResult(spec.kind, spec.seed, len(spec.data), nEdges, steps,
+                      generateTime, buildTime, compileTime, engineTimes,
+                      outputTimes)
+
+
+def run_suite(kinds=generators.kinds, sizes=(10**2, 10**3, 10**4, 10**5),
+              steps=10, engineNames=("loop", "compiled"),
+              formatNames=("npy", "csv"), mix=None, seed=0, report=None):
+    """Times every generator of <kinds> at every size of <sizes>.
+
+    Function Arguments:
+        - kinds, the generators to run.
+        - sizes, the approximate numbers of edges of the graphs.
+        - steps
+        - engineNames
+        - formatNames
+        - mix, the transform mix of the graphs, as for the generators.
+        - seed, the seed of every graph.
+        - report, an optional function called with each CaseResult as
+          soon as it is complete.
+
+    Returns the list of CaseResults.
+    """
+
+    results = []
+    for kind in kinds:
+        for size in sizes:
+            spec, generateTime = _timed(generators.generate, kind, size,
+                                        seed, mix)
+            result = time_case(spec, steps, engineNames, formatNames,
+                               generateTime)
+            results.append(result)
+            if report is not None:
+                report(result)
+    return results
+
+
+def write_results(results, filename, label=None, mix=None):
+    """Writes CaseResults to the JSON file <filename>.
+
+    The file holds the results, together with the <label> of the run,
+    the transform <mix>, a timestamp, and the versions of Python and
+    NumPy, the platform and the number of processors.
+
+    Function Arguments:
+        - results
+        - filename
+        - label, a free-form label for the run, such as a version.
+        - mix
+    """
+
+    document = {
+        "format": "DismalSim-Benchmark", "version": 1, "label": label,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(),
+                        "numpy": np.__version__,
+                        "platform": platform.platform(),
+                        "processors": os.cpu_count()},
+        "mix": mix if mix is not None else generators.defaultMix,
+        "results": [result._asdict() for result in results]}
+    with open(filename, "w") as resultFile:
+        json.dump(document, resultFile, indent=1)
+
+
+def _parse_mix(text):
+    """Parses a mix given as 'aa_lin=3,aa_exp=1'."""
+
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def _print_result(result):
+    """Prints a one-line summary of a CaseResult."""
+
+    timings = " ".join("{0} {1:.3g} steps/s {2:.3g} edges/s".format(
+        engine, times["stepsPerSecond"], times["edgesPerSecond"])
+        for engine, times in result.engines.items())
+    print("{0} {1} vertices {2} edges: build {3:.3g} s, {4}".format(
+        result.kind, result.vertices, result.edges, result.buildTime,
+        timings), flush=True)
+
+
+def main():
+    """Runs the benchmark suite from the command line.
+
+    The options select the generators (--kinds), the approximate edge
+    counts (--sizes), the number of steps (--steps), the engines
+    (--engines), the output formats (--formats), the transform mix
+    (--mix), the seed (--seed), a label for the run (--label) and the
+    name of the JSON results file (--out).
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Time the DismalSim engines on synthetic graphs.")
+    parser.add_argument("--kinds", nargs="+", default=list(generators.kinds),
+                        choices=generators.kinds)
+    parser.add_argument("--sizes", nargs="+", type=int,
+                        default=[10**2, 10**3, 10**4, 10**5])
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--engines", nargs="+", default=["loop", "compiled"],
+                        choices=engines)
+    parser.add_argument("--formats", nargs="+", default=["npy", "csv"],
+                        choices=formats)
+    parser.add_argument("--mix", type=_parse_mix, default=None,
+                        help="transform weights, as 'aa_lin=3,aa_exp=1'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--out", default="benchmark.json")
+    args = parser.parse_args()
+    results = run_suite(args.kinds, args.sizes, args.steps, args.engines,
+                        args.formats, args.mix, args.seed, _print_result)
+    write_results(results, args.out, args.label, args.mix)
+    print(args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Seeded generators of synthetic graphs for benchmarking.
+
+The models of the Test_Scripts have a dozen vertices, which says little
+about how the simulation engines scale. The generators of this module
+produce random graphs of any size, from a seed, so that the same graph
+can be rebuilt on every run and every version of the package:
+
+    - erdos_renyi, edges drawn uniformly between all ordered pairs of
+      vertices, with feedback loops throughout.
+    - scale_free, a preferential-attachment graph, in which a few hub
+      vertices aggregate the deltas of very many parents.
+    - layered_dag, an acyclic graph of layers, each vertex feeding on
+      vertices of the layer before it.
+    - dense_feedback, a small graph in which a large fraction of all
+      ordered pairs of vertices are linked, with feedback everywhere.
+
+A generator returns a GraphSpec: the vertex data and the edge list,
+with the transform and parameters of each edge, but no DiGraph yet, so
+that the time taken to build the DiGraph with build_graph can be
+measured separately from the time taken to draw the random graph. The
+transforms of the edges are drawn from a configurable mix, and their
+parameters are scaled to the in-degree of each child, so that the
+deltas of a simulation neither explode nor die out immediately.
+
+Functions:
+    - erdos_renyi
+    - scale_free
+    - layered_dag
+    - dense_feedback
+    - generate
+    - build_graph
+
+Classes:
+    - GraphSpec
+"""
+
+import collections
+
+import numpy as np
+
+from DismalSim.deltagraph import digraph
+
+
+GraphSpec = collections.namedtuple("GraphSpec",
+                                   ["kind", "data", "edgeParent",
+                                    "edgeChild", "edgeTransform",
+                                    "edgeParameters", "seed"])
+GraphSpec.__doc__ = """The description of a synthetic graph.
+
+Class Data:
+    - kind, the name of the generator that produced the graph.
+    - data, the array of starting data of each vertex; vertex i is
+      named 'v<i>'.
+    - edgeParent, the array of parent indices of each edge.
+    - edgeChild, the array of child indices of each edge.
+    - edgeTransform, the list of transform names of each edge.
+    - edgeParameters, the list of parameter lists of each edge.
+    - seed, the seed the graph was generated from.
+"""
+
+defaultMix = {"aa_lin": 1.0}
+
+kinds = ("erdos_renyi", "scale_free", "layered_dag", "dense_feedback")
+
+
+def _finish(kind, nVertices, parents, children, rng, mix, seed):
+    """Draws the data and transforms of a graph, and returns its spec.
+
+    Duplicate edges and self-loops are dropped first, keeping the first
+    occurrence of each edge.
+    """
+
+    if mix is None:
+        mix = defaultMix
+    parents = np.asarray(parents, dtype=np.int64)
+    children = np.asarray(children, dtype=np.int64)
+    keep = parents != children
+    parents = parents[keep]
+    children = children[keep]
+    _, first = np.unique(parents * nVertices + children, return_index=True)
+    first.sort()
+    parents = parents[first]
+    children = children[first]
+
+    names = sorted(mix)
+    weights = np.array([mix[name] for name in names], dtype=np.float64)
+    choice = rng.choice(len(names), size=len(parents),
+                        p=weights / weights.sum())
+    inDegree = np.bincount(children, minlength=nVertices)
+    scale = 0.9 / np.maximum(inDegree[children], 1)
+    gradient = rng.uniform(-1, 1, len(parents)) * scale
+    transforms = []
+    parameters = []
+    for tIndex, g in zip(choice.tolist(), gradient.tolist()):
+        tName = names[tIndex]
+        transforms.append(tName)
+        if tName.endswith("_lin"):
+            parameters.append([g])
+        elif tName.endswith("_exp"):
+            parameters.append([float(np.exp(g)), -1.0])
+        else:
+            parameters.append([g, 1, g / 1000, 2])
+    data = rng.uniform(50, 150, nVertices)
+    return GraphSpec(kind, data, parents, children, transforms, parameters,
+                     seed)
+
+
+def erdos_renyi(nVertices, nEdges, seed=None, mix=None):
+    """Returns a random graph of about <nEdges> uniform edges.
+
+    Function Arguments:
+        - nVertices, the number of vertices.
+        - nEdges, the number of edges to draw; duplicates and
+          self-loops are dropped, so slightly fewer may remain.
+        - seed, the seed of the random number generator.
+        - mix, a dictionary of relative weights, indexed by transform
+          name; it defaults to 'aa_lin' edges only.
+    """
+
+    rng = np.random.default_rng(seed)
+    parents = rng.integers(0, nVertices, nEdges)
+    children = rng.integers(0, nVertices, nEdges)
+    return _finish("erdos_renyi", nVertices, parents, children, rng, mix,
+                   seed)
+
+
+def scale_free(nVertices, edgesPerVertex, seed=None, mix=None):
+    """Returns a preferential-attachment graph.
+
+    Every vertex after the first <edgesPerVertex> becomes a parent of
+    <edgesPerVertex> earlier vertices, chosen with a probability
+    proportional to the number of edges they already have, plus one.
+    The graph is acyclic, with a heavy-tailed in-degree.
+
+    Function Arguments:
+        - nVertices
+        - edgesPerVertex
+        - seed
+        - mix
+    """
+
+    rng = np.random.default_rng(seed)
+    m = edgesPerVertex
+    targets = np.empty(2 * m * nVertices + nVertices, dtype=np.int64)
+    targets[:m] = np.arange(m)
+    size = m
+    parents = np.repeat(np.arange(m, nVertices, dtype=np.int64), m)
+    children = np.empty(len(parents), dtype=np.int64)
+    draws = rng.random(len(parents))
+    for v in range(m, nVertices):
+        offset = (v - m) * m
+        picks = targets[(draws[offset:offset + m] * size).astype(np.int64)]
+        children[offset:offset + m] = picks
+        targets[size:size + m] = picks
+        targets[size + m] = v
+        size += m + 1
+    return _finish("scale_free", nVertices, parents, children, rng, mix,
+                   seed)
+
+
+def layered_dag(nLayers, width, edgesPerVertex, seed=None, mix=None):
+    """Returns an acyclic graph of <nLayers> layers of <width> vertices.
+
+    Every vertex past the first layer has <edgesPerVertex> parents,
+    drawn uniformly from the layer before it.
+
+    Function Arguments:
+        - nLayers
+        - width
+        - edgesPerVertex
+        - seed
+        - mix
+    """
+
+    rng = np.random.default_rng(seed)
+    children = np.repeat(np.arange(width, nLayers * width, dtype=np.int64),
+                         edgesPerVertex)
+    layerStart = (children // width - 1) * width
+    parents = layerStart + rng.integers(0, width, len(children))
+    return _finish("layered_dag", nLayers * width, parents, children, rng,
+                   mix, seed)
+
+
+def dense_feedback(nVertices, density, seed=None, mix=None):
+    """Returns a graph linking a fraction <density> of all vertex pairs.
+
+    Function Arguments:
+        - nVertices
+        - density, the probability of an edge between each ordered
+          pair of distinct vertices.
+        - seed
+        - mix
+    """
+
+    rng = np.random.default_rng(seed)
+    pairs = np.flatnonzero(rng.random(nVertices * nVertices) < density)
+    return _finish("dense_feedback", nVertices, pairs // nVertices,
+                   pairs % nVertices, rng, mix, seed)
+
+
+def generate(kind, nEdges, seed=None, mix=None):
+    """Returns a graph of the generator <kind> with about <nEdges> edges.
+
+    The size of the graph is derived from <nEdges>: five edges per
+    vertex for erdos_renyi, four for scale_free, four per vertex over
+    ten layers for layered_dag, and a density of one half for
+    dense_feedback. A KeyError is raised for an unknown <kind>.
+
+    Function Arguments:
+        - kind, 'erdos_renyi', 'scale_free', 'layered_dag' or
+          'dense_feedback'.
+        - nEdges
+        - seed
+        - mix
+    """
+
+    if kind == "erdos_renyi":
+        return erdos_renyi(max(nEdges // 5, 2), nEdges, seed, mix)
+    if kind == "scale_free":
+        return scale_free(nEdges // 4 + 4, 4, seed, mix)
+    if kind == "layered_dag":
+        return layered_dag(10, max(-(-nEdges // 36), 1), 4, seed, mix)
+    if kind == "dense_feedback":
+        return dense_feedback(max(int(round((2 * nEdges) ** 0.5)), 2), 0.5,
+                              seed, mix)
+    raise KeyError(kind)
+
+
+def build_graph(spec):
+    """Builds the DiGraph of <spec>, through the public DiGraph API.
+
+    Function Arguments:
+        - spec, a GraphSpec.
+    """
+
+    aGraph = digraph.DiGraph()
+    vertices = []
+    for i, data in enumerate(spec.data.tolist()):
+        vertex = digraph.Vertex("v{0}".format(i), data)
+        aGraph + vertex
+        vertices.append(vertex)
+    edges = zip(spec.edgeParent.tolist(), spec.edgeChild.tolist(),
+                spec.edgeTransform, spec.edgeParameters)
+    for parent, child, tName, parameters in edges:
+        aGraph.add_edge(vertices[parent], vertices[child], tName, parameters)
+    return aGraph
+
+
+def main():
+    """Test script for the generators of this module.
+
+    The script generates a graph of every kind, with about a thousand
+    edges, and prints its number of vertices and edges.
+    """
+
+    for kind in kinds:
+        spec = generate(kind, 1000, seed=0,
+                        mix={"aa_lin": 3, "aa_exp": 1, "ap_poly": 1})
+        aGraph = build_graph(spec)
+        nEdges = sum(len(vertex._parents) for vertex in aGraph)
+        print(kind, len(aGraph), nEdges)
+
+
+if __name__ == '__main__':
+    main()
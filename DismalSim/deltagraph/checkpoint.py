@@ -0,0 +1,405 @@
+"""Checkpoints of in-flight simulations.
+
+A long simulation keeps all of its state in memory--the data, floating
+deltas and delta histories of its vertices, the rows of its data log,
+and the state of the random number generators it draws from--so that a
+crash loses the whole run. A Checkpoint saves that state to a directory
+every few steps, and a run can then be resumed from the last saved
+step, continuing exactly as if it had never stopped.
+
+A checkpoint directory holds two files. The rows of the data log are
+written to 'log.npy', a NumPy array file opened as a memory map, with
+room for every row of the run; the batched engines of the compiled
+module step straight into it. A data log already kept in a log file,
+as by the <logFile> argument of deltacalc.gc_multicount_delta, is
+flushed instead, and reopened on resumption. The state of the last
+saved step is written to 'state.npz', together with a JSON header
+describing the run. The header is only replaced once the log rows it
+covers are on disk, and it is replaced atomically, so that a crash
+while saving leaves the previous checkpoint intact.
+
+Runs are checkpointed through the <checkpointDir> argument of
+deltacalc.gc_multicount_delta and of the batched functions, and
+resumed with deltacalc.gc_resume.
+
+Functions:
+    - get_vertex_state
+    - set_vertex_state
+
+Classes:
+    - Checkpoint
+"""
+
+import json
+import os
+import random
+
+import numpy as np
+
+from DismalSim.deltagraph import datalog
+from DismalSim.deltagraph import digraph
+
+
+formatName = "DismalSim-Checkpoint"
+formatVersion = 1
+
+_logName = "log.npy"
+_stateName = "state.npz"
+
+
+def get_vertex_state(vertices):
+    """Returns the simulation state of <vertices> as arrays.
+
+    The delta histories are stored latest first, one row per vertex,
+    padded to the greatest history depth; 'historySize' holds the
+    number of values of each history.
+
+    Function Arguments:
+        - vertices, the sequence of vertices, in DiGraph order.
+    """
+
+    depth = max([vertex._deltaPrevAbs.get_depth() for vertex in vertices],
+                default=1)
+    if depth == 1:
+        prevAbs = np.array([vertex._deltaPrevAbs.latest
+                            for vertex in vertices],
+                           dtype=np.float64).reshape(-1, 1)
+        prevPer = np.array([vertex._deltaPrevPer.latest
+                            for vertex in vertices],
+                           dtype=np.float64).reshape(-1, 1)
+        sizes = np.ones(len(vertices), dtype=np.int64)
+    else:
+        prevAbs = np.zeros((len(vertices), depth))
+        prevPer = np.zeros((len(vertices), depth))
+        sizes = np.empty(len(vertices), dtype=np.int64)
+        for i, vertex in enumerate(vertices):
+            size = len(vertex._deltaPrevAbs)
+            prevAbs[i, :size] = list(vertex._deltaPrevAbs)
+            prevPer[i, :size] = list(vertex._deltaPrevPer)
+            sizes[i] = size
+    return {"data": np.array([vertex.data for vertex in vertices],
+                             dtype=np.float64),
+            "deltaFloat": np.array([vertex.deltaFloat
+                                    for vertex in vertices],
+                                   dtype=np.float64),
+            "deltaPrevAbs": prevAbs, "deltaPrevPer": prevPer,
+            "historySize": sizes}
+
+
+def _restore_history(history, values):
+    """Returns a history of the depth of <history> holding <values>."""
+
+    restored = digraph.DeltaHistory(history.get_depth(), values[-1])
+    for value in reversed(values[:-1]):
+        restored.push(value)
+    return restored
+
+
+def set_vertex_state(vertices, state):
+    """Sets the simulation state of <vertices> from get_vertex_state.
+
+    Histories of depth 1 are updated in place; deeper ones are rebuilt.
+
+    Function Arguments:
+        - vertices
+        - state, the dictionary of arrays returned by get_vertex_state.
+    """
+
+    for vertex, data, deltaFloat in zip(vertices, state["data"].tolist(),
+                                        state["deltaFloat"].tolist()):
+        vertex.data = data
+        vertex.deltaFloat = deltaFloat
+    prevAbs = state["deltaPrevAbs"]
+    prevPer = state["deltaPrevPer"]
+    if prevAbs.shape[1] == 1:
+        for vertex, latestAbs, latestPer in zip(vertices,
+                                                prevAbs[:, 0].tolist(),
+                                                prevPer[:, 0].tolist()):
+            vertex._deltaPrevAbs.set_latest(latestAbs)
+            vertex._deltaPrevPer.set_latest(latestPer)
+        return
+    rows = zip(vertices, prevAbs.tolist(), prevPer.tolist(),
+               state["historySize"].tolist())
+    for vertex, absValues, perValues, size in rows:
+        vertex._deltaPrevAbs = _restore_history(vertex._deltaPrevAbs,
+                                                absValues[:size])
+        vertex._deltaPrevPer = _restore_history(vertex._deltaPrevPer,
+                                                perValues[:size])
+
+
+class Checkpoint:
+    """The checkpoint directory of a single simulation run.
+
+    A Checkpoint is either created for a new run, with begin, or
+    opened from the directory of an interrupted one, with open. The
+    engines call save after every step for which due returns True:
+    every <every> steps, counting from the step applying the initial
+    deltas, and after the last step of the run.
+
+    Class Data:
+        - self.directory, the path of the checkpoint directory.
+        - self.every, the number of steps between checkpoints.
+        - self.meta, the dictionary describing the run: its engine,
+          its number of steps and the settings needed to resume it.
+        - self.names, the list of vertex names of the run.
+        - self.count, the last step saved, or None before the first
+          save.
+        - self.state, the dictionary of state arrays of the last step
+          saved, set by open.
+        - self.log, the memory-mapped array of log rows, or None if
+          the run keeps no log.
+        - self._saved, the number of log rows already written to
+          <log>.
+
+    Public Methods:
+        - begin
+        - open
+        - due
+        - save
+        - get_log
+        - check_names
+        - restore_random
+    """
+
+    def __init__(self, directory, every=100):
+        """Initializes a Checkpoint, without touching the directory.
+
+        The method raises a DataError if <every> is not a positive
+        integer.
+
+        Method Parameters:
+            - directory, the path of the checkpoint directory.
+            - every, the number of steps between checkpoints; it
+              defaults to 100.
+        """
+
+        if not isinstance(every, int) or every < 1:
+            raise digraph.DataError(6)
+        self.directory = directory
+        self.every = every
+        self.meta = None
+        self.names = None
+        self.count = None
+        self.state = None
+        self.log = None
+        self._saved = 0
+
+    def begin(self, engine, names, maxCount, logShape=None, logFile=None,
+              **settings):
+        """Prepares the directory for a new run.
+
+        The directory is created if needed, and any checkpoint of a
+        previous run in it is removed. When <logShape> is given, the
+        log array is created with that shape, filled with NaN.
+
+        Method Parameters:
+            - engine, the name of the engine running the simulation.
+            - names, the sequence of vertex names of the run.
+            - maxCount, the last step of the run.
+            - logShape, the shape of the log array, or None if the run
+              keeps no log, or keeps it in a log file.
+            - logFile, the name of the log file of the run's DataLog,
+              if it has one.
+            - settings, any further settings needed to resume the run;
+              they must be JSON-serializable.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        for name in (_stateName, _logName):
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+        self.names = list(names)
+        self.meta = {"format": formatName, "version": formatVersion,
+                     "engine": engine, "maxCount": maxCount,
+                     "every": self.every, "settings": settings,
+                     "logFile": (os.path.abspath(logFile)
+                                 if logFile is not None else None)}
+        if logShape is not None:
+            self.log = np.lib.format.open_memmap(
+                os.path.join(self.directory, _logName), mode="w+",
+                dtype=np.float64, shape=tuple(logShape))
+            self.log[:] = np.nan
+        self._saved = 0
+
+    @classmethod
+    def open(cls, directory):
+        """Returns the Checkpoint last saved in <directory>.
+
+        An InitError is raised if the directory holds no checkpoint of
+        a supported version.
+
+        Method Parameters:
+            - directory, the path of the checkpoint directory.
+        """
+
+        try:
+            with np.load(os.path.join(directory, _stateName)) as arrays:
+                meta = json.loads(str(arrays["meta"]))
+                names = arrays["names"].tolist()
+                state = {key: arrays[key] for key in arrays.files
+                         if key not in ("meta", "names")}
+        except (OSError, KeyError, ValueError):
+            raise digraph.InitError(3)
+        if (meta.get("format") != formatName
+                or meta.get("version") != formatVersion):
+            raise digraph.InitError(3)
+        checkpoint = cls(directory, meta["every"])
+        checkpoint.meta = meta
+        checkpoint.names = names
+        checkpoint.count = meta["count"]
+        checkpoint.state = state
+        logPath = os.path.join(directory, _logName)
+        if os.path.exists(logPath):
+            checkpoint.log = np.load(logPath, mmap_mode="r+")
+            checkpoint._saved = checkpoint.count + 2
+        return checkpoint
+
+    def due(self, count):
+        """Checks if step <count> should be saved."""
+        return count % self.every == 0 or count == self.meta["maxCount"]
+
+    def save(self, count, state, dataLog=None, rng=None):
+        """Saves the state of the run after step <count>.
+
+        The rows of <dataLog> not yet written are copied to the log
+        array, or flushed if <dataLog> is kept in a log file, and the
+        log is flushed to disk before the state is replaced.
+
+        Method Parameters:
+            - count, the step just completed.
+            - state, the dictionary of state arrays to save.
+            - dataLog, the DataLog of the run, if its rows are kept in
+              memory rather than directly in the log array.
+            - rng, the numpy.random.Generator drawn from by the run, if
+              any; the state of the random module is always saved.
+        """
+
+        if dataLog is not None and dataLog.filename is not None:
+            dataLog.flush()
+        elif dataLog is not None:
+            rows = dataLog.get_array()
+            self.log[self._saved:len(rows)] = rows[self._saved:]
+            self._saved = len(rows)
+        if self.log is not None:
+            self.log.flush()
+        version, internal, gauss = random.getstate()
+        meta = dict(self.meta, count=count,
+                    randomState=[version, list(internal), gauss],
+                    rngState=(rng.bit_generator.state
+                              if rng is not None else None))
+        path = os.path.join(self.directory, _stateName)
+        partial = path + ".partial"
+        with open(partial, "wb") as stateFile:
+            np.savez(stateFile, meta=np.array(json.dumps(meta)),
+                     names=np.array(self.names, dtype=str).reshape(
+                         len(self.names)),
+                     **state)
+            stateFile.flush()
+            os.fsync(stateFile.fileno())
+        os.replace(partial, path)
+        self.count = count
+
+    def get_log(self, names, vertices=None):
+        """Returns the DataLog of the run, up to the last step saved.
+
+        The rows are copied from the log array, with room for the rest
+        of the run, or the log file of the run is reopened for writing,
+        dropping any rows recorded after the checkpoint.
+
+        Method Parameters:
+            - names, the sequence of vertex names of the run.
+            - vertices, the optional sequence of vertices matching
+              <names>, used by DataLog.record_graph.
+        """
+
+        count = self.count + 2
+        if self.meta["logFile"] is None:
+            return datalog.DataLog.from_array(names, self.log[:count],
+                                              self.meta["maxCount"] + 2,
+                                              vertices)
+        dataLog = datalog.DataLog.open(self.meta["logFile"], True, vertices)
+        dataLog.truncate(count)
+        dataLog.names = list(names)
+        dataLog.index = {name: i for i, name in enumerate(dataLog.names)}
+        return dataLog
+
+    def check_names(self, names):
+        """Raises an InitError unless <names> are the run's names."""
+
+        if [str(name) for name in names] != self.names:
+            raise digraph.InitError(4)
+
+    def restore_random(self):
+        """Restores the random state saved with the last checkpoint.
+
+        The state of the random module is restored in place. Returns a
+        numpy.random.Generator in the saved state, or None if the run
+        did not draw from one.
+        """
+
+        version, internal, gauss = self.meta["randomState"]
+        random.setstate((version, tuple(internal), gauss))
+        if self.meta["rngState"] is None:
+            return None
+        rng = np.random.default_rng()
+        rng.bit_generator.state = self.meta["rngState"]
+        return rng
+
+
+def main():
+    """Test script for the checkpoints of this module.
+
+    The script runs a simulation with checkpoints, interrupts a second
+    run of it part of the way through, resumes that run from its last
+    checkpoint, and prints the largest difference between the data
+    logs of the two runs.
+    """
+
+    import tempfile
+
+    from DismalSim.deltagraph import deltacalc
+
+    class CrashSink:
+        def open(self, names):
+            self.rows = 0
+
+        def write_row(self, values):
+            self.rows += 1
+            if self.rows == 14:
+                raise RuntimeError("Simulated crash")
+
+        def close(self):
+            pass
+
+    def build():
+        aGraph = digraph.DiGraph()
+        aGraph + digraph.Vertex("A", 10)
+        aGraph + digraph.Vertex("B", 10, randomDeltaFlag=True,
+                                randomInfo=(0, 1))
+        aGraph + digraph.Vertex("C", 10, deltaInherent=2, percentFlag=True)
+        aGraph.add_edge("A", "B", "aa_lin", [0.5, 1])
+        aGraph.add_edge("B", "C", "aa_lin", [0.2])
+        aGraph.add_edge("C", "A", "aa_lin", [-0.1])
+        return aGraph
+
+    iDelta = {"A": 20}
+    with tempfile.TemporaryDirectory() as directory:
+        random.seed(1)
+        fullLog = deltacalc.gc_multicount_delta(build(), 20, iDelta)
+        random.seed(1)
+        try:
+            deltacalc.gc_multicount_delta(build(), 20, iDelta,
+                                          sinks=[CrashSink()],
+                                          checkpointDir=directory,
+                                          checkpointEvery=5)
+        except RuntimeError:
+            pass
+        random.seed(2)
+        resumedLog = deltacalc.gc_resume(build(), directory)
+        difference = np.abs(fullLog.get_array() - resumedLog.get_array())
+        print(difference.max())  # Should print 0.0
+
+
+if __name__ == '__main__':
+    main()
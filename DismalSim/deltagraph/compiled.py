@@ -0,0 +1,1326 @@
+"""Array-backed, compiled representation of a DiGraph.
+
+The Vertex and DiGraph classes of the digraph module are convenient to
+build and modify, but stepping them walks Python dictionaries vertex by
+vertex and edge by edge. The CompiledGraph class of this module freezes
+a DiGraph into flat NumPy arrays--a CSR-style edge list, grouped by
+child, together with the packed parameters of each edge's transform--
+and steps the whole graph at once, evaluating every edge of a given
+transform family in a single vectorized pass. The numbers produced are
+equal to those of the greedy-child loop in the deltacalc module, up to
+floating-point rounding.
+
+Graphs whose edges are all 'aa_lin' or 'pa_lin' are detected at
+compilation, and are stepped as a single sparse matrix-vector product,
+delta = A @ prevDelta + intercepts, followed by the inherent deltas.
+Many initial-delta vectors can also be stepped together, as columns of
+a state matrix, through batch_multicount_delta, and Monte Carlo
+ensembles of random vertices through ensemble_multicount_delta.
+
+By default, every vertex of a step reads the deltas of its parents
+from the previous step, as in the greedy-child loop. The CompiledGraph
+can also compute the strongly connected components of the graph, and
+step it in the topological order of those components instead, so that
+a change crosses every acyclic stretch of the graph in a single step,
+and only the edges inside a feedback loop keep the one-step lag. The
+components of each level of that order are independent of each other,
+and can be evaluated by parallel workers.
+
+The responses of an all-linear graph at arbitrary horizons can be
+computed in closed form with impulse_response, from powers of the
+matrix of a single step, instead of stepping the graph up to the
+furthest horizon.
+
+Classes:
+    - CompiledGraph
+    - ImpulseResponse
+"""
+
+import collections
+import concurrent.futures
+import copy
+import random
+
+import numpy as np
+
+from DismalSim.deltagraph import checkpoint
+from DismalSim.deltagraph import datalog
+from DismalSim.deltagraph import digraph
+from DismalSim.deltagraph import sparsemat
+from DismalSim.deltagraph import transforms
+
+
+ImpulseResponse = collections.namedtuple("ImpulseResponse",
+                                         ["names", "horizons", "values",
+                                          "method"])
+ImpulseResponse.__doc__ = """The result of CompiledGraph.impulse_response.
+
+Class Data:
+    - names, the list of vertex names, one per column of <values>.
+    - horizons, the list of horizons, one per row of <values>.
+    - values, the horizons x vertices array of vertex data after the
+      step of each horizon.
+    - method, the method actually used: 'eigen' or 'power' for the
+      closed forms, or 'step' if the response was stepped.
+"""
+
+impulseMethods = ("power", "eigen", "step")
+
+
+class _EdgeGroup:
+    """The incoming edges of a set of vertices of a CompiledGraph.
+
+    The edges are split into vectorizable transform families. The
+    transform keys are laid out so that <key> % 3 gives the family
+    (linear, exponential or polynomial), and (<key> // 3) % 2 gives the
+    output type (absolute or percent). For each family the group holds
+    the positions of its edges within the group, and their parameters
+    in the form used by the vectorized evaluation; the parameters are
+    in the canonical form of the transforms module, so linear and
+    exponential edges hold exactly two, and polynomial edges always end
+    with their constant. The edges keep the order of the CompiledGraph.
+
+    Class Data:
+        - self.vertices, the array of vertex indices of the group.
+        - self.parent, the array of parent indices of each edge.
+        - self.child, the array of child indices of each edge.
+        - self.localChild, the array of positions of the child of each
+          edge within <vertices>.
+    """
+
+    def __init__(self, aGraph, vertices):
+        counts = aGraph.childPtr[vertices + 1] - aGraph.childPtr[vertices]
+        offsets = np.repeat(np.cumsum(counts) - counts, counts)
+        edges = (np.repeat(aGraph.childPtr[vertices], counts)
+                 + (np.arange(offsets.size) - offsets))
+        self.vertices = vertices
+        self.parent = aGraph.edgeParent[edges]
+        self.child = aGraph.edgeChild[edges]
+        self.localChild = np.repeat(np.arange(len(vertices)), counts)
+
+        key = aGraph.edgeKey[edges]
+        family = key % 3
+        first = aGraph.paramPtr[edges]
+        last = aGraph.paramPtr[edges + 1] - 1
+        paramData = aGraph.paramData
+
+        self.pctEdges = np.flatnonzero((key // 3) % 2 == 1)
+
+        self.linEdges = np.flatnonzero(family == 0)
+        self.linGradient = paramData[first[self.linEdges]]
+        self.linIntercept = paramData[last[self.linEdges]]
+
+        self.expEdges = np.flatnonzero(family == 1)
+        self.expBase = paramData[first[self.expEdges]]
+        self.expConstant = paramData[last[self.expEdges]]
+
+        self.polyEdges = np.flatnonzero(family == 2)
+        polyStart = first[self.polyEdges]
+        nTerms = (last[self.polyEdges] - polyStart) // 2
+        self.termEdge = np.repeat(np.arange(len(self.polyEdges)), nTerms)
+        termOffset = np.repeat(np.cumsum(nTerms) - nTerms, nTerms)
+        termPos = (np.repeat(polyStart, nTerms)
+                   + 2 * (np.arange(len(self.termEdge)) - termOffset))
+        self.termCoef = paramData[termPos]
+        self.termExp = paramData[termPos + 1]
+        self.polyConstant = paramData[last[self.polyEdges]]
+
+    def values(self, pDelta):
+        """Evaluates the transform of every edge for parent deltas.
+
+        Method Parameters:
+            - pDelta, the array of parent deltas, with one row per edge,
+              and optionally one column per simulation.
+        """
+
+        def col(a):
+            return a if pDelta.ndim == 1 else a[:, None]
+
+        edgeVal = np.empty(pDelta.shape)
+        lin = self.linEdges
+        edgeVal[lin] = transforms.fast_linear(pDelta[lin],
+                                              col(self.linGradient),
+                                              col(self.linIntercept))
+        exp = self.expEdges
+        edgeVal[exp] = transforms.fast_exponential(pDelta[exp],
+                                                   col(self.expBase),
+                                                   col(self.expConstant))
+        if len(self.polyEdges) != 0:
+            termVal = col(self.termCoef) * (
+                pDelta[self.polyEdges][self.termEdge] ** col(self.termExp))
+            if pDelta.ndim == 1:
+                polyVal = np.bincount(self.termEdge, termVal,
+                                      minlength=len(self.polyEdges))
+            else:
+                polyVal = np.zeros((len(self.polyEdges), pDelta.shape[1]))
+                np.add.at(polyVal, self.termEdge, termVal)
+            edgeVal[self.polyEdges] = polyVal + col(self.polyConstant)
+        return edgeVal
+
+    def contributions(self, prevAbs, data):
+        """Returns the summed edge contributions to each vertex.
+
+        The contributions to each vertex are summed in edge order.
+
+        Method Parameters:
+            - prevAbs, the array of latest absolute deltas of every
+              vertex of the CompiledGraph, with one row per vertex, and
+              optionally one column per simulation.
+            - data, the array of vertex data, shaped like <prevAbs>.
+
+        Returns an array with one row per vertex of the group.
+        """
+
+        edgeVal = self.values(prevAbs[self.parent])
+        pct = self.pctEdges
+        edgeVal[pct] = (edgeVal[pct] / 100) * data[self.child[pct]]
+        if prevAbs.ndim == 1:
+            return np.bincount(self.localChild, edgeVal,
+                               minlength=len(self.vertices))
+        result = np.zeros((len(self.vertices),) + prevAbs.shape[1:])
+        np.add.at(result, self.localChild, edgeVal)
+        return result
+
+
+class CompiledGraph:
+    """A frozen, array-backed snapshot of a DiGraph.
+
+    The CompiledGraph copies the structure and the state of a DiGraph
+    at the time of compilation; subsequent changes to the DiGraph or
+    to its vertices are not reflected in the CompiledGraph, and
+    stepping the CompiledGraph does not modify the original vertices.
+
+    Edges are stored ordered by child, in the iteration order of the
+    DiGraph, and within a child in the insertion order of its parents.
+    This is the order in which Vertex.transform accumulates the
+    contributions of each edge, and preserving it keeps the results
+    as close as possible to those of the greedy-child loop; the
+    vectorized and sparse paths may still differ from it by
+    floating-point rounding.
+
+    Class Data:
+        - self.names, the list of vertex names, in DiGraph order.
+        - self.index, a dictionary of vertex indices, indexed by name.
+        - self.edgeParent, the array of parent indices of each edge.
+        - self.edgeChild, the array of child indices of each edge.
+        - self.edgeKey, the array of transform keys of each edge, as
+          defined by Vertex.transformKeyMap.
+        - self.paramPtr, the array of offsets into <paramData>; the
+          parameters of edge e are paramData[paramPtr[e]:paramPtr[e+1]].
+        - self.paramData, the packed parameters of all edges.
+        - self.childPtr, the CSR row pointer over the edges; the
+          incoming edges of vertex i are edges childPtr[i] through
+          childPtr[i+1] - 1.
+        - self.data, the array of vertex data.
+        - self.deltaPrevAbs, the array of latest absolute deltas.
+        - self.deltaPrevPer, the array of latest percent deltas.
+        - self.deltaFloat, the array of floating deltas.
+        - self.deltaInherent, the array of inherent deltas.
+        - self.percentFlag, the boolean array of percent flags.
+        - self.randomDeltaFlag, the boolean array of random delta
+          flags.
+        - self.randomValFlag, the boolean array of random value flags.
+        - self.randomLow, the array of lower random bounds.
+        - self.randomHigh, the array of upper random bounds.
+        - self.linearFlag, True if every edge is an 'aa_lin' or
+          'pa_lin' edge, in which case a step reduces to a sparse
+          matrix-vector product.
+
+    Public Methods:
+        - from_arrays
+        - copy
+        - get_data
+        - get_components
+        - get_levels
+        - manual_delta
+        - calc_delta
+        - apply_inherent_deltas
+        - apply_floating_deltas
+        - step
+        - ordered_step
+        - multicount_delta
+        - batch_multicount_delta
+        - ensemble_multicount_delta
+        - resume
+        - impulse_response
+    """
+
+    def __init__(self, aGraph, sparseFlag=True):
+        """Compiles <aGraph> into flat arrays.
+
+        The method raises a RetrievalError if any Vertex has None as
+        its data, and an EdgeError if a parent of any edge is not part
+        of <aGraph>. The parameters of each edge have already been
+        validated and normalized by Vertex.add_edge.
+
+        Method Parameters:
+            - aGraph, the DiGraph to compile.
+            - sparseFlag, whether to step all-linear graphs with a
+              sparse transition matrix; it defaults to True.
+        """
+
+        vertices = list(aGraph)
+        nVertices = len(vertices)
+        self.names = [vertex.name for vertex in vertices]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        idIndex = {id(vertex): i for i, vertex in enumerate(vertices)}
+
+        self.data = np.empty(nVertices)
+        self.deltaPrevAbs = np.empty(nVertices)
+        self.deltaPrevPer = np.empty(nVertices)
+        self.deltaFloat = np.empty(nVertices)
+        self.deltaInherent = np.empty(nVertices)
+        self.percentFlag = np.zeros(nVertices, dtype=bool)
+        self.randomDeltaFlag = np.zeros(nVertices, dtype=bool)
+        self.randomValFlag = np.zeros(nVertices, dtype=bool)
+        self.randomLow = np.full(nVertices, np.nan)
+        self.randomHigh = np.full(nVertices, np.nan)
+
+        edgeParent = []
+        edgeKey = []
+        paramPtr = [0]
+        paramData = []
+        childPtr = [0]
+        for i, vertex in enumerate(vertices):
+            if vertex.data is None:
+                raise digraph.RetrievalError(0)
+            self.data[i] = vertex.data
+            self.deltaPrevAbs[i] = vertex.get_abs_delta_prev()
+            self.deltaPrevPer[i] = vertex.get_per_delta_prev()
+            self.deltaFloat[i] = vertex.deltaFloat
+            self.deltaInherent[i] = vertex._deltaInherent
+            self.percentFlag[i] = vertex._percentFlag
+            self.randomDeltaFlag[i] = vertex._randomDeltaFlag
+            self.randomValFlag[i] = vertex._randomValFlag
+            if vertex._randomInfo is not None:
+                self.randomLow[i] = vertex._randomInfo[0]
+                self.randomHigh[i] = vertex._randomInfo[1]
+            for pVertex, edge in vertex._parents.items():
+                try:
+                    edgeParent.append(idIndex[id(pVertex)])
+                except KeyError:
+                    raise digraph.EdgeError(5)
+                edgeKey.append(edge.tKey)
+                paramData.extend(edge.parameters)
+                paramPtr.append(len(paramData))
+            childPtr.append(len(edgeParent))
+
+        self.childPtr = np.array(childPtr, dtype=np.int64)
+        self.edgeParent = np.array(edgeParent, dtype=np.int64)
+        self.edgeChild = np.repeat(np.arange(nVertices, dtype=np.int64),
+                                   np.diff(self.childPtr))
+        self.edgeKey = np.array(edgeKey, dtype=np.int64)
+        self.paramPtr = np.array(paramPtr, dtype=np.int64)
+        self.paramData = np.array(paramData, dtype=np.float64)
+        self._prepare(sparseFlag)
+
+    @classmethod
+    def from_arrays(cls, names, arrays, sparseFlag=True):
+        """Returns a CompiledGraph built directly from flat arrays.
+
+        The arrays are those of the Class Data of the same names, with
+        the edges ordered by child, as a binary model file holds them;
+        no DiGraph, Vertex or Edge object is created, the parameters
+        are trusted to be canonical, and arrays of the right type are
+        used without being copied. This is how
+        modelfile.load_graph loads a binary model file with
+        <compiledFlag> set.
+
+        Method Parameters:
+            - names, the sequence of vertex names.
+            - arrays, a dictionary of arrays, indexed by 'data',
+              'deltaPrevAbs', 'deltaPrevPer', 'deltaFloat',
+              'deltaInherent', 'percentFlag', 'randomDeltaFlag',
+              'randomValFlag', 'randomLow', 'randomHigh', 'edgeParent',
+              'edgeChild', 'edgeKey', 'paramPtr' and 'paramData'.
+            - sparseFlag
+        """
+
+        self = cls.__new__(cls)
+        self.names = list(names)
+        self.index = dict(zip(self.names, range(len(self.names))))
+        nVertices = len(self.names)
+        for name in ("data", "deltaPrevAbs", "deltaPrevPer", "deltaFloat",
+                     "deltaInherent", "randomLow", "randomHigh",
+                     "paramData"):
+            setattr(self, name, np.asarray(arrays[name], dtype=np.float64))
+        for name in ("percentFlag", "randomDeltaFlag", "randomValFlag"):
+            setattr(self, name, np.asarray(arrays[name], dtype=bool))
+        for name in ("edgeParent", "edgeChild", "edgeKey", "paramPtr"):
+            setattr(self, name, np.asarray(arrays[name], dtype=np.int64))
+        self.childPtr = np.zeros(nVertices + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.edgeChild, minlength=nVertices),
+                  out=self.childPtr[1:])
+        self._prepare(sparseFlag)
+        return self
+
+    def _prepare(self, sparseFlag):
+        """Builds the edge groups and indices derived from the arrays."""
+
+        nVertices = len(self.names)
+        self._edges = _EdgeGroup(self, np.arange(nVertices))
+        self._components = None
+        self._levelGroups = {}
+        self._randomDeltaIdx = np.flatnonzero(self.randomDeltaFlag)
+        self._randomValIdx = np.flatnonzero(self.randomValFlag)
+
+        self.linearFlag = bool(np.all(np.isin(self.edgeKey, (0, 6))))
+        self._transition = None
+        if sparseFlag and self.linearFlag:
+            self._transition = sparsemat.csr_matrix(
+                self._edges.linGradient, self.edgeChild, self.edgeParent,
+                (nVertices, nVertices))
+            self._interceptSum = np.bincount(self.edgeChild,
+                                             self._edges.linIntercept,
+                                             minlength=nVertices)
+
+    def __len__(self):
+        """Returns the number of vertices in the CompiledGraph."""
+        return len(self.names)
+
+    def __contains__(self, name):
+        """Checks if a vertex named <name> is in the CompiledGraph."""
+        return name in self.index
+
+    def copy(self):
+        """Returns a copy of the CompiledGraph, with a state of its own.
+
+        The arrays of the state modified by a run--the data, floating
+        deltas and latest deltas--are copied, and the arrays of the
+        structure of the graph, which no run modifies, are shared, so
+        that a copy is cheap even for very large graphs, and can be
+        stepped without changing the original.
+        """
+
+        aCopy = copy.copy(self)
+        for key, value in self._state().items():
+            setattr(aCopy, key, value.copy())
+        return aCopy
+
+    def get_data(self, name):
+        """Returns the current data of the vertex named <name>."""
+        return float(self.data[self.index[name]])
+
+    def get_components(self):
+        """Returns the strongly connected components of the graph.
+
+        The components are found with an iterative version of Tarjan's
+        algorithm, so that long chains don't exhaust the recursion
+        limit, and are computed once, on the first call. Each component
+        is an array of vertex indices, in ascending order, and the
+        components are listed in a topological order of the graph of
+        components: every edge between two components goes from an
+        earlier component to a later one.
+        """
+
+        if self._components is not None:
+            return self._components
+        nVertices = len(self.names)
+        order = np.argsort(self.edgeParent, kind="stable")
+        children = self.edgeChild[order].tolist()
+        parentPtr = np.zeros(nVertices + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.edgeParent, minlength=nVertices),
+                  out=parentPtr[1:])
+        parentPtr = parentPtr.tolist()
+
+        index = [-1] * nVertices
+        lowLink = [0] * nVertices
+        onStack = [False] * nVertices
+        stack = []
+        components = []
+        counter = 0
+        for root in range(nVertices):
+            if index[root] != -1:
+                continue
+            work = [(root, parentPtr[root])]
+            index[root] = lowLink[root] = counter
+            counter += 1
+            stack.append(root)
+            onStack[root] = True
+            while work:
+                vertex, edge = work[-1]
+                if edge < parentPtr[vertex + 1]:
+                    work[-1] = (vertex, edge + 1)
+                    child = children[edge]
+                    if index[child] == -1:
+                        index[child] = lowLink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        onStack[child] = True
+                        work.append((child, parentPtr[child]))
+                    elif onStack[child]:
+                        lowLink[vertex] = min(lowLink[vertex], index[child])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowLink[parent] = min(lowLink[parent], lowLink[vertex])
+                if lowLink[vertex] == index[vertex]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        onStack[member] = False
+                        component.append(member)
+                        if member == vertex:
+                            break
+                    components.append(np.sort(np.array(component,
+                                                       dtype=np.int64)))
+        components.reverse()
+        self._components = components
+        return components
+
+    def get_levels(self):
+        """Returns the vertices of each level of the component order.
+
+        The level of a component is one more than the highest level of
+        the components with an edge into it, and 0 if there are none,
+        so that the components of a level have no edges between them.
+        Returns a list of lists of components, one list per level, each
+        component being an array of vertex indices.
+        """
+
+        components = self.get_components()
+        compOf = np.empty(len(self.names), dtype=np.int64)
+        for c, component in enumerate(components):
+            compOf[component] = c
+        pComp = compOf[self.edgeParent]
+        cComp = compOf[self.edgeChild]
+        cross = pComp != cComp
+        compLevel = np.zeros(len(components), dtype=np.int64)
+        order = np.argsort(cComp[cross], kind="stable")
+        pSorted = pComp[cross][order].tolist()
+        cSorted = cComp[cross][order].tolist()
+        e = 0
+        for c in range(len(components)):
+            level = 0
+            while e < len(cSorted) and cSorted[e] == c:
+                level = max(level, compLevel[pSorted[e]] + 1)
+                e += 1
+            compLevel[c] = level
+        nLevels = int(compLevel.max()) + 1 if len(components) else 0
+        levels = [[] for _ in range(nLevels)]
+        for c, component in enumerate(components):
+            levels[compLevel[c]].append(component)
+        return levels
+
+    def _level_groups(self, workers):
+        """Returns the (vertices, edge groups) pairs of each level.
+
+        The components of a level are split between at most <workers>
+        edge groups, balanced by their number of edges, and are all
+        placed in a single group if <workers> is None or 1. The groups
+        are computed once per number of workers.
+        """
+
+        nGroups = workers if workers else 1
+        if nGroups in self._levelGroups:
+            return self._levelGroups[nGroups]
+        edgeCount = np.diff(self.childPtr)
+        levelGroups = []
+        for level in self.get_levels():
+            vertices = np.sort(np.concatenate(level))
+            if nGroups == 1 or len(level) == 1:
+                groups = [_EdgeGroup(self, vertices)]
+            else:
+                bins = [[] for _ in range(min(nGroups, len(level)))]
+                loads = [0] * len(bins)
+                weights = [int(edgeCount[component].sum())
+                           for component in level]
+                for k in sorted(range(len(level)), key=weights.__getitem__,
+                                reverse=True):
+                    b = min(range(len(bins)),
+                            key=lambda m: (loads[m], len(bins[m])))
+                    bins[b].append(level[k])
+                    loads[b] += weights[k]
+                groups = [_EdgeGroup(self, np.sort(np.concatenate(members)))
+                          for members in bins]
+            levelGroups.append((vertices, groups))
+        self._levelGroups[nGroups] = levelGroups
+        return levelGroups
+
+    def manual_delta(self, deltaDict):
+        """Sets floating deltas from a user-defined dictionary.
+
+        Names that are not present in the CompiledGraph are ignored,
+        matching deltacalc.manual_delta.
+
+        Method Parameters:
+            - deltaDict, a dictionary of deltas, indexed by vertex name.
+        """
+
+        for key in deltaDict:
+            if key in self.index:
+                self.deltaFloat[self.index[key]] = deltaDict[key]
+
+    def _edge_delta(self, prevAbs, data):
+        """Returns the summed edge contributions to each vertex.
+
+        Method Parameters:
+            - prevAbs, the array of latest absolute deltas, with one
+              row per vertex, and optionally one column per simulation.
+            - data, the array of vertex data, shaped like <prevAbs>.
+        """
+
+        if self._transition is not None:
+            intercept = self._interceptSum
+            if prevAbs.ndim != 1:
+                intercept = intercept[:, None]
+            return (self._transition @ prevAbs) + intercept
+        return self._edges.contributions(prevAbs, data)
+
+    def _inherent(self, deltaFloat, data, draws=None, vertices=None):
+        """Adds the inherent deltas to <deltaFloat>, in place.
+
+        Random deltas are drawn one at a time from the random module,
+        in vertex order, unless <draws> supplies them as an array with
+        one row per random-delta vertex, already scaled to the bounds
+        of each vertex. If <vertices> is given, <deltaFloat> and <data>
+        only hold the rows of those vertices.
+        """
+
+        deltaInherent = self.deltaInherent
+        flags = self.percentFlag
+        randomIdx = self._randomDeltaIdx
+        low = self.randomLow
+        high = self.randomHigh
+        if vertices is not None:
+            deltaInherent = deltaInherent[vertices]
+            flags = flags[vertices]
+            randomIdx = np.flatnonzero(self.randomDeltaFlag[vertices])
+            low = low[vertices]
+            high = high[vertices]
+        percentFlag = flags
+        if data.ndim != 1:
+            deltaInherent = deltaInherent[:, None]
+            percentFlag = percentFlag[:, None]
+        deltaFloat += np.where(percentFlag, (deltaInherent / 100) * data,
+                               deltaInherent)
+        if draws is not None:
+            idx = randomIdx
+            deltaFloat[idx] = np.where(percentFlag[idx],
+                                       deltaFloat[idx] + draws * data[idx],
+                                       draws)
+            return
+        for i in randomIdx:
+            for j in np.ndindex(data.shape[1:]):
+                multiplier = random.uniform(low[i], high[i])
+                if flags[i]:
+                    deltaFloat[(i,) + j] += multiplier * data[(i,) + j]
+                else:
+                    deltaFloat[(i,) + j] = multiplier
+
+    def _floating(self, data, deltaFloat, draws=None, vertices=None):
+        """Returns the data and deltas after applying <deltaFloat>.
+
+        Random values are drawn one at a time from the random module,
+        in vertex order, unless <draws> supplies them as an array with
+        one row per random-value vertex. If <vertices> is given,
+        <data> and <deltaFloat> only hold the rows of those vertices.
+        """
+
+        randomIdx = self._randomValIdx
+        low = self.randomLow
+        high = self.randomHigh
+        if vertices is not None:
+            randomIdx = np.flatnonzero(self.randomValFlag[vertices])
+            low = low[vertices]
+            high = high[vertices]
+
+        newData = data + deltaFloat
+        deltaAbs = deltaFloat.copy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            deltaPer = ((newData / data) - 1) * 100
+        if draws is not None:
+            idx = randomIdx
+            newData[idx] = draws
+            deltaAbs[idx] = data[idx] - draws
+            with np.errstate(divide="ignore", invalid="ignore"):
+                deltaPer[idx] = ((deltaAbs[idx] / data[idx]) - 1) * 100
+            return newData, deltaAbs, deltaPer
+        for i in randomIdx:
+            for j in np.ndindex(data.shape[1:]):
+                k = (i,) + j
+                newData[k] = random.uniform(low[i], high[i])
+                deltaAbs[k] = data[k] - newData[k]
+                deltaPer[k] = ((deltaAbs[k] / data[k]) - 1) * 100
+        return newData, deltaAbs, deltaPer
+
+    def calc_delta(self):
+        """Calculates floating deltas based on a greedy-child paradigm.
+
+        Every edge reads the latest absolute delta of its parent, as
+        Vertex.transform does, and the contributions of the edges are
+        summed into the floating delta of their children in edge order.
+        """
+
+        self.deltaFloat += self._edge_delta(self.deltaPrevAbs, self.data)
+
+    def apply_inherent_deltas(self):
+        """Adds the inherent deltas of all vertices to deltaFloat."""
+
+        self._inherent(self.deltaFloat, self.data)
+
+    def apply_floating_deltas(self):
+        """Adds the floating deltas of all vertices to their data."""
+
+        self.data, self.deltaPrevAbs, self.deltaPrevPer = self._floating(
+            self.data, self.deltaFloat)
+        self.deltaFloat = np.zeros(len(self.names))
+
+    def step(self):
+        """Performs one full step of the greedy-child simulation."""
+
+        self.calc_delta()
+        self.apply_inherent_deltas()
+        self.apply_floating_deltas()
+
+    def ordered_step(self, workers=None):
+        """Performs one step in the topological order of the components.
+
+        The levels of get_levels are stepped one after another: the
+        edges into the vertices of a level are evaluated, and their
+        inherent and floating deltas applied, before moving on to the
+        next level. A vertex therefore reads the deltas of this step
+        from parents in earlier components, and the deltas of the
+        previous step only from parents in its own component, so that
+        the one-step lag is kept inside feedback loops only. Random
+        deltas and values are drawn level by level, rather than in the
+        vertex order of step.
+
+        Method Parameters:
+            - workers, the number of threads to evaluate the components
+              of each level with; it defaults to None, for a single
+              thread.
+        """
+
+        if workers is None or workers <= 1:
+            self._ordered_step(self._level_groups(None), None)
+            return
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            self._ordered_step(self._level_groups(workers), executor)
+
+    def _ordered_step(self, levelGroups, executor):
+        """Steps every level of <levelGroups>, with an optional pool."""
+
+        for vertices, groups in levelGroups:
+            if executor is not None and len(groups) > 1:
+                parts = executor.map(self._group_contributions, groups)
+            else:
+                parts = map(self._group_contributions, groups)
+            for group, part in zip(groups, parts):
+                self.deltaFloat[group.vertices] += part
+            data = self.data[vertices]
+            deltaFloat = self.deltaFloat[vertices]
+            self._inherent(deltaFloat, data, vertices=vertices)
+            newData, deltaAbs, deltaPer = self._floating(
+                data, deltaFloat, vertices=vertices)
+            self.data[vertices] = newData
+            self.deltaPrevAbs[vertices] = deltaAbs
+            self.deltaPrevPer[vertices] = deltaPer
+            self.deltaFloat[vertices] = 0
+
+    def _group_contributions(self, group):
+        """Returns the edge contributions to the vertices of <group>."""
+        return group.contributions(self.deltaPrevAbs, self.data)
+
+    def multicount_delta(self, maxCount, initDeltaDict, sinks=(),
+                         logFlag=True, orderedFlag=False, workers=None,
+                         checkpointDir=None, checkpointEvery=100,
+                         logFile=None, profiler=None, exoSource=None):
+        """Runs the simulation for <maxCount> steps.
+
+        The method mirrors deltacalc.gc_multicount_delta, and returns
+        a DataLog, like the one produced by deltacalc.gen_data_log, or
+        None if <logFlag> is False. With <orderedFlag> set to True,
+        every step after the first is an ordered_step instead.
+
+        Method Parameters:
+            - maxCount, the number of steps to run after the initial
+              deltas have been applied.
+            - initDeltaDict, the dictionary of initial deltas, indexed
+              by vertex name.
+            - sinks, the output sinks to stream each step's data to;
+              they are opened and closed by the method.
+            - logFlag, whether to keep and return the data log.
+            - orderedFlag, whether to step the components of the graph
+              in topological order; it defaults to False, for the
+              one-step lag of the greedy-child loop.
+            - workers, the number of threads used by ordered_step.
+            - checkpointDir, the directory to save checkpoints of the
+              run to, every <checkpointEvery> steps and after the last
+              one; it defaults to None, for no checkpoints. The run
+              can be continued from its last checkpoint with resume.
+            - checkpointEvery, the number of steps between
+              checkpoints.
+            - logFile, the name of a file to keep the data log in,
+              rather than in memory; see datalog.DataLog.create.
+            - profiler, a profiling.StepProfiler to time the phases of
+              every step with; it defaults to None, for no timing.
+            - exoSource, an opened exogenous.ExoSource, whose rows
+              replace the deltas of their vertices, one row per step
+              after the first, as in deltacalc.gc_exovert_delta; it
+              defaults to None, for no exogenous deltas. A ValueError
+              is raised if it is combined with <orderedFlag>.
+        """
+
+        if exoSource is not None and orderedFlag:
+            raise ValueError("Exogenous deltas cannot be applied by"
+                             " ordered steps")
+        aCheckpoint = None
+        if checkpointDir is not None:
+            aCheckpoint = checkpoint.Checkpoint(checkpointDir,
+                                                checkpointEvery)
+            logShape = None
+            if logFlag and logFile is None:
+                logShape = (maxCount + 2, len(self.names))
+            aCheckpoint.begin("compiled", self.names, maxCount, logShape,
+                              logFile, logFlag=logFlag,
+                              orderedFlag=orderedFlag, workers=workers,
+                              exoFlag=exoSource is not None)
+        return self._multicount(maxCount, initDeltaDict, sinks, logFlag,
+                                orderedFlag, workers, logFile, aCheckpoint,
+                                profiler, exoSource)
+
+    def _multicount(self, maxCount, initDeltaDict, sinks, logFlag,
+                    orderedFlag, workers, logFile, aCheckpoint,
+                    profiler=None, exoSource=None):
+        """Runs multicount_delta, or resumes it from <aCheckpoint>.
+
+        A run is resumed, from the step after the last one saved, if
+        <aCheckpoint> was opened from the directory of an earlier run;
+        its state has then already been restored, and <exoSource>, if
+        any, advanced past the rows already applied. With a
+        <profiler>, each phase of the loop is wrapped by its timed
+        method.
+        """
+
+        manualDelta = self.manual_delta
+        calcDelta = self.calc_delta
+        applyInherent = self.apply_inherent_deltas
+        applyFloat = self.apply_floating_deltas
+        orderedStep = self._ordered_step
+        applyExo = self._apply_exo_row
+        writeRows = _write_rows
+        saveCheckpoint = aCheckpoint.save if aCheckpoint is not None else None
+        if profiler is not None:
+            manualDelta = profiler.timed("manual_delta", manualDelta)
+            calcDelta = profiler.timed("transform", calcDelta)
+            applyInherent = profiler.timed("apply_delta_inherent",
+                                           applyInherent)
+            applyFloat = profiler.timed("apply_delta_float", applyFloat)
+            orderedStep = profiler.timed("ordered_step", orderedStep)
+            applyExo = profiler.timed("exogenous", applyExo)
+            writeRows = profiler.timed("output", writeRows)
+            if saveCheckpoint is not None:
+                saveCheckpoint = profiler.timed("checkpoint", saveCheckpoint)
+
+        start = 0
+        resumeFlag = aCheckpoint is not None and aCheckpoint.count is not None
+        if resumeFlag:
+            start = aCheckpoint.count + 1
+        executor = None
+        if orderedFlag:
+            levelGroups = self._level_groups(workers)
+            if workers is not None and workers > 1:
+                executor = concurrent.futures.ThreadPoolExecutor(workers)
+        dataLog = None
+        if logFlag and resumeFlag:
+            dataLog = aCheckpoint.get_log(self.names)
+        elif logFlag and logFile is not None:
+            dataLog = datalog.DataLog.create(logFile, self.names,
+                                             maxCount + 2)
+        elif logFlag:
+            dataLog = datalog.DataLog(self.names, maxCount + 2)
+        if logFlag:
+            record = dataLog.record
+            if profiler is not None:
+                record = profiler.timed("logging", record)
+        if profiler is not None:
+            profiler.begin(self)
+        try:
+            for sink in sinks:
+                sink.open(self.names)
+            if sinks and not resumeFlag:
+                writeRows(sinks, self.data)
+            if logFlag and not resumeFlag:
+                dataLog.record(self.data)
+            for count in range(start, maxCount + 1):
+                if count == 0:
+                    manualDelta(initDeltaDict)
+                    applyFloat()
+                elif orderedFlag:
+                    orderedStep(levelGroups, executor)
+                else:
+                    calcDelta()
+                    applyInherent()
+                    if exoSource is not None:
+                        exoSource = applyExo(exoSource)
+                    applyFloat()
+                if logFlag:
+                    record(self.data)
+                if sinks:
+                    writeRows(sinks, self.data)
+                if aCheckpoint is not None and aCheckpoint.due(count):
+                    saveCheckpoint(count, self._state(), dataLog)
+        finally:
+            for sink in sinks:
+                sink.close()
+            if executor is not None:
+                executor.shutdown()
+            if profiler is not None:
+                profiler.end(self)
+        return dataLog
+
+    def _apply_exo_row(self, source):
+        """Applies the next row of <source>, as manual_delta does.
+
+        Returns <source>, or None once it has run out.
+        """
+
+        exoDelta = source.read_row()
+        if exoDelta is None:
+            return None
+        self.manual_delta(exoDelta)
+        return source
+
+    def _state(self):
+        """Returns the state arrays saved by a checkpoint."""
+
+        return {"data": self.data, "deltaFloat": self.deltaFloat,
+                "deltaPrevAbs": self.deltaPrevAbs,
+                "deltaPrevPer": self.deltaPrevPer}
+
+    def resume(self, aCheckpoint, sinks=(), exoSource=None):
+        """Continues a run from its last checkpoint.
+
+        The run may have been started by multicount_delta,
+        batch_multicount_delta or ensemble_multicount_delta, on a
+        CompiledGraph of the same graph; the method returns what that
+        call would have returned. The state of the random module, and
+        for a single run the state of the CompiledGraph, are restored
+        from the checkpoint first. An InitError is raised if the
+        checkpoint was taken from a graph with other vertices.
+
+        Method Parameters:
+            - aCheckpoint, the checkpoint.Checkpoint opened from the
+              directory of the run.
+            - sinks, the output sinks of a single run; they are opened
+              and closed by the method, and receive the data of the
+              steps after the checkpoint only.
+            - exoSource, the opened exogenous.ExoSource of a run with
+              exogenous deltas, advanced past the rows applied before
+              the checkpoint.
+        """
+
+        aCheckpoint.check_names(self.names)
+        rng = aCheckpoint.restore_random()
+        engine = aCheckpoint.meta["engine"]
+        maxCount = aCheckpoint.meta["maxCount"]
+        settings = aCheckpoint.meta["settings"]
+        if engine == "compiled":
+            for key, value in aCheckpoint.state.items():
+                setattr(self, key, value.copy())
+            return self._multicount(maxCount, {}, sinks, settings["logFlag"],
+                                    settings["orderedFlag"],
+                                    settings["workers"],
+                                    aCheckpoint.meta["logFile"], aCheckpoint,
+                                    exoSource=exoSource)
+        if engine not in ("batch", "ensemble"):
+            raise digraph.InitError(4)
+        rows = self._run_columns(None, None, maxCount, rng, aCheckpoint)
+        if engine == "ensemble":
+            return rows.transpose(2, 0, 1)
+        return [datalog.DataLog.from_array(self.names, rows[:, :, j])
+                for j in range(rows.shape[2])]
+
+    def _run_columns(self, data, deltaFloat, maxCount, rng=None,
+                     aCheckpoint=None):
+        """Steps a matrix of simulations, one simulation per column.
+
+        The initial deltas in <deltaFloat> are applied first, and the
+        data is then stepped <maxCount> times. When <rng> is a NumPy
+        Generator, all of the random deltas and values of a step are
+        drawn from it in a single call; otherwise they are drawn from
+        the random module. With <aCheckpoint>, the rows are written
+        straight to its log array, and the state of the columns is
+        saved with it; if it was opened from an earlier run, <data>
+        and <deltaFloat> are ignored, and the run continues from the
+        step after the last one saved.
+
+        Method Parameters:
+            - data, the (vertices x runs) array of starting data.
+            - deltaFloat, the (vertices x runs) array of initial deltas.
+            - maxCount, the number of steps to run.
+            - rng, an optional numpy.random.Generator.
+            - aCheckpoint, an optional checkpoint.Checkpoint.
+
+        Returns a (maxCount + 2) x vertices x runs array of the data
+        before and after each step.
+        """
+
+        nDelta = len(self._randomDeltaIdx)
+        idx = np.concatenate((self._randomDeltaIdx, self._randomValIdx))
+        low = self.randomLow[idx][:, None]
+        span = self.randomHigh[idx][:, None] - low
+
+        def draw():
+            if rng is None or len(idx) == 0:
+                return None, None
+            values = low + span * rng.random((len(idx), data.shape[1]))
+            return values[:nDelta], values[nDelta:]
+
+        def save(count):
+            if aCheckpoint is not None and aCheckpoint.due(count):
+                aCheckpoint.save(count, {"data": data,
+                                         "deltaPrevAbs": prevAbs}, rng=rng)
+
+        if aCheckpoint is not None and aCheckpoint.count is not None:
+            rows = aCheckpoint.log
+            data = aCheckpoint.state["data"]
+            prevAbs = aCheckpoint.state["deltaPrevAbs"]
+            start = aCheckpoint.count + 1
+        else:
+            if aCheckpoint is not None:
+                rows = aCheckpoint.log
+            else:
+                rows = np.empty((maxCount + 2,) + data.shape)
+            rows[0] = data
+            deltaDraws, valDraws = draw()
+            data, prevAbs, prevPer = self._floating(data, deltaFloat,
+                                                    valDraws)
+            rows[1] = data
+            save(0)
+            start = 1
+        for count in range(start, maxCount + 1):
+            deltaDraws, valDraws = draw()
+            deltaFloat = self._edge_delta(prevAbs, data)
+            self._inherent(deltaFloat, data, deltaDraws)
+            data, prevAbs, prevPer = self._floating(data, deltaFloat,
+                                                    valDraws)
+            rows[count + 1] = data
+            save(count)
+        return rows
+
+    def _column_checkpoint(self, engine, maxCount, nRuns, checkpointDir,
+                           checkpointEvery):
+        """Returns the Checkpoint of a batched run, or None."""
+
+        if checkpointDir is None:
+            return None
+        aCheckpoint = checkpoint.Checkpoint(checkpointDir, checkpointEvery)
+        aCheckpoint.begin(engine, self.names, maxCount,
+                          (maxCount + 2, len(self.names), nRuns))
+        return aCheckpoint
+
+    def batch_multicount_delta(self, maxCount, initDeltaDicts,
+                               checkpointDir=None, checkpointEvery=100):
+        """Runs one simulation per initial-delta dictionary, together.
+
+        The simulations share the current state of the CompiledGraph
+        as their starting point, and are stepped as the columns of a
+        single state matrix, so that an all-linear graph takes one
+        sparse matrix-matrix product per step. The state of the
+        CompiledGraph itself is not modified.
+
+        Method Parameters:
+            - maxCount, the number of steps to run after the initial
+              deltas have been applied.
+            - initDeltaDicts, the sequence of initial-delta
+              dictionaries, indexed by vertex name.
+            - checkpointDir, the directory to save checkpoints of the
+              runs to, as with multicount_delta.
+            - checkpointEvery, the number of steps between
+              checkpoints.
+
+        Returns a list of DataLogs, one per dictionary in
+        <initDeltaDicts>.
+        """
+
+        nRuns = len(initDeltaDicts)
+        data = np.repeat(self.data[:, None], nRuns, axis=1)
+        deltaFloat = np.repeat(self.deltaFloat[:, None], nRuns, axis=1)
+        for j, deltaDict in enumerate(initDeltaDicts):
+            for key in deltaDict:
+                if key in self.index:
+                    deltaFloat[self.index[key], j] = deltaDict[key]
+        aCheckpoint = self._column_checkpoint("batch", maxCount, nRuns,
+                                              checkpointDir, checkpointEvery)
+        rows = self._run_columns(data, deltaFloat, maxCount, None,
+                                 aCheckpoint)
+        return [datalog.DataLog.from_array(self.names, rows[:, :, j])
+                for j in range(nRuns)]
+
+    def ensemble_multicount_delta(self, maxCount, initDeltaDict, nRuns,
+                                  seed=None, checkpointDir=None,
+                                  checkpointEvery=100):
+        """Runs a Monte Carlo ensemble of <nRuns> simulations.
+
+        Every run starts from the current state of the CompiledGraph
+        and the same initial deltas, and differs only in the random
+        deltas and values of vertices created with 'randomDeltaFlag'
+        or 'randomValFlag'. The runs are stepped together, and the
+        random draws of all vertices and runs are made with a single
+        NumPy call per step, from a Generator seeded with <seed>. The
+        state of the CompiledGraph itself is not modified.
+
+        Method Parameters:
+            - maxCount, the number of steps to run after the initial
+              deltas have been applied.
+            - initDeltaDict, the dictionary of initial deltas, indexed
+              by vertex name.
+            - nRuns, the number of runs in the ensemble.
+            - seed, the seed of the random number generator; it
+              defaults to None, for a fresh, unpredictable seed.
+            - checkpointDir, the directory to save checkpoints of the
+              runs to, as with multicount_delta. The rows of the
+              ensemble are then stepped straight into the memory-mapped
+              log of the checkpoint, and the returned array is a view
+              of it.
+            - checkpointEvery, the number of steps between
+              checkpoints.
+
+        Returns an nRuns x (maxCount + 2) x vertices array; row 0 of
+        each run holds the data before the initial deltas, matching
+        the layout of the data log of gc_multicount_delta.
+        """
+
+        data = np.repeat(self.data[:, None], nRuns, axis=1)
+        deltaFloat = np.repeat(self.deltaFloat[:, None], nRuns, axis=1)
+        for key in initDeltaDict:
+            if key in self.index:
+                deltaFloat[self.index[key]] = initDeltaDict[key]
+        rng = np.random.default_rng(seed)
+        aCheckpoint = self._column_checkpoint("ensemble", maxCount, nRuns,
+                                              checkpointDir, checkpointEvery)
+        rows = self._run_columns(data, deltaFloat, maxCount, rng,
+                                 aCheckpoint)
+        return rows.transpose(2, 0, 1)
+
+    def _linear_parts(self):
+        """Returns the dense parts of one step of an all-linear graph.
+
+        The deltas of a step are transition @ prevAbs + constant +
+        percent * data: the edge contributions, the summed intercepts
+        and absolute inherent deltas, and the percent inherent deltas.
+        Returns the (transition, constant, percent) tuple of arrays.
+        """
+
+        nVertices = len(self.names)
+        edges = self._edges
+        transition = np.zeros((nVertices, nVertices))
+        np.add.at(transition, (edges.child[edges.linEdges],
+                               edges.parent[edges.linEdges]),
+                  edges.linGradient)
+        constant = np.bincount(edges.child[edges.linEdges],
+                               edges.linIntercept, minlength=nVertices)
+        constant += np.where(self.percentFlag, 0.0, self.deltaInherent)
+        percent = np.where(self.percentFlag, self.deltaInherent / 100, 0.0)
+        return transition, constant, percent
+
+    def _step_matrix(self, transition, constant, percent):
+        """Returns the dense matrix of one step of an all-linear graph.
+
+        The state of a step is the vector [prevAbs; data; 1], and the
+        matrix maps the state after one step to the state after the
+        next, from the parts returned by _linear_parts.
+        """
+
+        nVertices = len(self.names)
+        percent = np.diag(percent)
+        matrix = np.zeros((2 * nVertices + 1, 2 * nVertices + 1))
+        delta = slice(0, nVertices)
+        data = slice(nVertices, 2 * nVertices)
+        matrix[delta, delta] = transition
+        matrix[delta, data] = percent
+        matrix[delta, -1] = constant
+        matrix[data, delta] = transition
+        matrix[data, data] = np.eye(nVertices) + percent
+        matrix[data, -1] = constant
+        matrix[-1, -1] = 1.0
+        return matrix
+
+    def impulse_response(self, horizons, initDeltaDict, method="power",
+                         maxDense=2000):
+        """Returns the data of the vertices at each of <horizons>.
+
+        The response starts from the current state of the CompiledGraph,
+        with the deltas of <initDeltaDict> applied as the initial step;
+        horizon k is the data after k further steps, the row k + 1 of
+        the data log of multicount_delta. The state of the CompiledGraph
+        itself is not modified.
+
+        For all-linear graphs without random vertices, and with at most
+        <maxDense> vertices, the state after k steps is computed in
+        closed form, as the k-th power of the matrix of a single step
+        applied to the state after the initial step, either by
+        exponentiation by squaring, with <method> 'power', or from the
+        eigendecomposition of the matrix, with <method> 'eigen'. The
+        values then match those of multicount_delta up to rounding.
+        If the eigenvectors are too ill-conditioned, exponentiation by
+        squaring is used instead; any other graph, or <method> 'step',
+        is stepped up to the furthest horizon. The method actually used
+        is reported in the returned ImpulseResponse. A ValueError is
+        raised for a horizon that is negative or not a whole number,
+        and for any other <method>.
+
+        Method Parameters:
+            - horizons, the sequence of non-negative step counts.
+            - initDeltaDict, the dictionary of initial deltas, indexed
+              by vertex name.
+            - method, 'power', 'eigen' or 'step'; it defaults to
+              'power'.
+            - maxDense, the largest number of vertices for which the
+              dense matrix of a step is built.
+        """
+
+        if method not in impulseMethods:
+            raise ValueError("Unknown impulse response method: {0!r}".format(
+                method))
+        checked = []
+        for horizon in horizons:
+            if horizon != int(horizon) or horizon < 0:
+                raise ValueError("Invalid impulse response horizon: {0!r}"
+                                 .format(horizon))
+            checked.append(int(horizon))
+        horizons = checked
+        deltaFloat = self.deltaFloat.copy()
+        for key in initDeltaDict:
+            if key in self.index:
+                deltaFloat[self.index[key]] = initDeltaDict[key]
+        data, prevAbs, prevPer = self._floating(self.data, deltaFloat)
+        closedFlag = (self.linearFlag and method != "step"
+                      and len(self.names) <= maxDense
+                      and not np.any(self.randomDeltaFlag)
+                      and not np.any(self.randomValFlag))
+        values = None
+        if closedFlag:
+            parts = self._linear_parts()
+            if method == "eigen" and not np.any(parts[2]):
+                values = self._eigen_response(parts[0], parts[1], data,
+                                              prevAbs, horizons)
+            if values is None:
+                method = "power"
+                state = np.concatenate((prevAbs, data, [1.0]))
+                values = self._power_response(self._step_matrix(*parts),
+                                              state, horizons)
+        else:
+            method = "step"
+            values = self._stepped_response(data, prevAbs, horizons)
+        return ImpulseResponse(list(self.names), horizons, values, method)
+
+    def _eigen_response(self, transition, constant, data, prevAbs,
+                        horizons):
+        """Returns the data at <horizons> from an eigendecomposition.
+
+        With transition = V diag(w) V^-1, the deltas after k steps are
+        V (w^k c + (1 + w + . . . + w^(k-1)) b), where c and b are the
+        initial deltas and the constant deltas in the eigenbasis, and
+        the data is the initial data plus the sum of those deltas, both
+        sums being geometric series in each eigenvalue. Returns None if
+        the eigenvectors are too ill-conditioned for the result to be
+        trusted.
+        """
+
+        eigenvalues, vectors = np.linalg.eig(transition)
+        if np.linalg.cond(vectors) > 1e8:
+            return None
+        initial = np.linalg.solve(vectors, prevAbs)
+        constant = np.linalg.solve(vectors, constant)
+        unitFlag = np.abs(1 - eigenvalues) < 1e-12
+        gap = np.where(unitFlag, 1.0, 1 - eigenvalues)
+        values = np.empty((len(horizons), len(self.names)))
+        for row, horizon in enumerate(horizons):
+            powers = eigenvalues ** horizon
+            deltaSum = np.where(unitFlag, horizon,
+                                eigenvalues * (1 - powers) / gap)
+            seriesSum = np.where(unitFlag, horizon * (horizon + 1) / 2,
+                                 (horizon - deltaSum) / gap)
+            summed = vectors @ ((deltaSum * initial)
+                                + (seriesSum * constant))
+            values[row] = data + summed.real
+        return values
+
+    def _power_response(self, matrix, state, horizons):
+        """Returns the data at <horizons> by exponentiation by squaring.
+
+        The horizons are visited in ascending order, and the state is
+        advanced from one to the next by the matrix raised to their
+        difference.
+        """
+
+        nVertices = len(self.names)
+        values = np.empty((len(horizons), nVertices))
+        done = 0
+        for row in sorted(range(len(horizons)), key=horizons.__getitem__):
+            exponent = horizons[row] - done
+            power = matrix
+            while exponent:
+                if exponent & 1:
+                    state = power @ state
+                exponent >>= 1
+                if exponent:
+                    power = power @ power
+            done = horizons[row]
+            values[row] = state[nVertices:2 * nVertices]
+        return values
+
+    def _stepped_response(self, data, prevAbs, horizons):
+        """Returns the data at <horizons> by stepping the graph."""
+
+        values = np.empty((len(horizons), len(self.names)))
+        rows = {}
+        for row, horizon in enumerate(horizons):
+            rows.setdefault(horizon, []).append(row)
+        for count in range(max(horizons, default=0) + 1):
+            if count > 0:
+                deltaFloat = self._edge_delta(prevAbs, data)
+                self._inherent(deltaFloat, data)
+                data, prevAbs, prevPer = self._floating(data, deltaFloat)
+            for row in rows.get(count, ()):
+                values[row] = data
+        return values
+
+
+def _write_rows(sinks, row):
+    """Writes <row> to every sink of <sinks>."""
+
+    for sink in sinks:
+        sink.write_row(row)
+
+
+def main():
+    """Test script for the CompiledGraph class.
+
+    The script steps the same graph with the greedy-child loop of the
+    deltacalc module and with a CompiledGraph, and prints the largest
+    difference between the two data logs.
+    """
+
+    from DismalSim.deltagraph import deltacalc
+
+    def build():
+        aGraph = digraph.DiGraph()
+        aGraph + digraph.Vertex("A", 10)
+        aGraph + digraph.Vertex("B", 10, deltaInherent=1)
+        aGraph + digraph.Vertex("C", 10, deltaInherent=2, percentFlag=True)
+        aGraph + digraph.Vertex("D", 10)
+        aGraph.add_edge("A", "B", "aa_lin", [2, 2])
+        aGraph.add_edge("A", "C", "pp_lin", [10, 15])
+        aGraph.add_edge("B", "D", "aa_poly", [0.01, 2, 1])
+        aGraph.add_edge("C", "D", "aa_exp", [1.01])
+        aGraph.add_edge("D", "A", "aa_lin", [0.5])
+        return aGraph
+
+    iDelta = {"A": 20}
+    loopLog = deltacalc.gc_multicount_delta(build(), 5, iDelta)
+    arrayLog = build().compile().multicount_delta(5, iDelta)
+    worst = 0
+    for key in loopLog:
+        for a, b in zip(loopLog[key][1:], arrayLog[key][1:]):
+            worst = max(worst, abs(a - b))
+    print(worst)  # Should print 0
+    print(len(build().compile().get_components()))  # Should print 1
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""Columnar storage for the data recorded during a simulation.
+
+The data log of a simulation used to be a dict-of-lists, with one list
+of 'data' values per vertex, grown by a dictionary lookup and an append
+for every vertex at every step. The DataLog class of this module stores
+the same values in a preallocated two-dimensional array instead, with
+one row per step and one column per vertex, and records a step with a
+single vectorized copy. It remains usable as a read-only mapping in the
+old dict-of-lists format, so that it can be passed to functions such as
+deltacalc.output_spreadsheet unchanged.
+
+A DataLog can also keep its rows on disk rather than in memory, in a
+log file mapped with numpy.memmap, so that runs whose data would not
+fit in memory can still be logged; only the pages of the rows being
+written or read are resident at any time. A log file starts with a
+small header--a magic string, the step count, the capacity, and the
+vertex names as JSON--followed by the rows, as raw float64 values. The
+step count is updated in the mapped header as each row is recorded, so
+that a log file can be reopened with DataLog.open, without copying its
+rows, at any point during or after the run.
+
+Classes:
+    - DataLog
+"""
+
+from collections.abc import Mapping
+import json
+
+import numpy as np
+
+
+class DataLog(Mapping):
+    """A preallocated, columnar log of vertex data.
+
+    Indexing the DataLog by a vertex name returns a list in the format
+    of the old dict-of-lists data log: the name of the vertex, followed
+    by its data at every recorded step. The underlying array is
+    available through get_array.
+
+    Class Data:
+        - self.names, the list of vertex names, one per column.
+        - self.index, a dictionary of column indices, indexed by name.
+        - self.count, the number of rows recorded so far.
+        - self._array, the preallocated float64 array of rows.
+        - self._vertices, the list of vertices whose data record_graph
+          copies, resolved once from the graph.
+        - self.filename, the name of the log file holding the rows, or
+          None if they are held in memory.
+        - self._header, the memory-mapped header fields of the log
+          file, or None.
+
+    Public Methods:
+        - from_array
+        - create
+        - open
+        - record
+        - record_graph
+        - get_array
+        - truncate
+        - flush
+        - as_dict
+    """
+
+    magic = b"\x93DSMLOG\x01"
+    headerFields = 4
+
+    def __init__(self, names, capacity=None, vertices=None):
+        """Initializes an empty DataLog.
+
+        Method Parameters:
+            - names, the sequence of vertex names, one per column.
+            - capacity, the number of rows to preallocate. If it is
+              omitted or exceeded, the array grows by doubling.
+            - vertices, the optional sequence of vertices matching
+              <names>, used by record_graph.
+        """
+
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.count = 0
+        if capacity is None:
+            capacity = 16
+        self._array = np.empty((max(capacity, 1), len(self.names)))
+        self._vertices = list(vertices) if vertices is not None else None
+        self.filename = None
+        self._header = None
+
+    @classmethod
+    def from_array(cls, names, array, capacity=None, vertices=None):
+        """Returns a DataLog holding the rows of <array>.
+
+        Method Parameters:
+            - names, the sequence of vertex names, one per column.
+            - array, a steps x vertices array of data.
+            - capacity, the number of rows to preallocate, if more than
+              the rows of <array>.
+            - vertices, the optional sequence of vertices matching
+              <names>, used by record_graph.
+        """
+
+        dataLog = cls(names, max(len(array), capacity or 0), vertices)
+        dataLog._array[:len(array)] = array
+        dataLog.count = len(array)
+        return dataLog
+
+    @classmethod
+    def create(cls, filename, names, capacity=None, vertices=None):
+        """Returns an empty DataLog keeping its rows in a log file.
+
+        Any existing file named <filename> is overwritten. The file is
+        created with room for <capacity> rows, and grows by doubling
+        when they are exceeded; on most file systems the space of rows
+        not yet recorded is not allocated.
+
+        Method Parameters:
+            - filename, the name of the log file.
+            - names, the sequence of vertex names, one per column.
+            - capacity, the number of rows to make room for.
+            - vertices, the optional sequence of vertices matching
+              <names>, used by record_graph.
+        """
+
+        dataLog = cls.__new__(cls)
+        dataLog.names = list(names)
+        dataLog.index = {name: i for i, name in enumerate(dataLog.names)}
+        dataLog.count = 0
+        dataLog._vertices = list(vertices) if vertices is not None else None
+        dataLog.filename = filename
+        nameBytes = json.dumps(dataLog.names, default=str).encode("utf-8")
+        offset = cls._data_offset(len(nameBytes))
+        with open(filename, "wb") as logFile:
+            logFile.write(cls.magic)
+            logFile.write(np.zeros(cls.headerFields, dtype="<u8").tobytes())
+            logFile.write(nameBytes)
+            logFile.write(b" " * (offset - logFile.tell()))
+        dataLog._header = np.memmap(filename, dtype="<u8", mode="r+",
+                                    offset=len(cls.magic),
+                                    shape=(cls.headerFields,))
+        dataLog._header[2] = len(dataLog.names)
+        dataLog._header[3] = len(nameBytes)
+        dataLog._map_rows(max(capacity or 16, 1), "r+")
+        return dataLog
+
+    @classmethod
+    def open(cls, filename, writeFlag=False, vertices=None):
+        """Returns the DataLog of the log file <filename>.
+
+        The rows are mapped from the file, not read, so that a log of
+        any size opens instantly; get_array returns a view of them. A
+        ValueError is raised if the file is not a log file.
+
+        Method Parameters:
+            - filename, the name of the log file.
+            - writeFlag, whether further rows may be recorded to the
+              log; it defaults to False, for a read-only log.
+            - vertices, the optional sequence of vertices matching the
+              names of the log, used by record_graph.
+        """
+
+        with open(filename, "rb") as logFile:
+            if logFile.read(len(cls.magic)) != cls.magic:
+                raise ValueError("{0} is not a DataLog file".format(filename))
+            fields = np.frombuffer(logFile.read(8 * cls.headerFields),
+                                   dtype="<u8").tolist()
+            names = json.loads(logFile.read(fields[3]).decode("utf-8"))
+        mode = "r+" if writeFlag else "r"
+        dataLog = cls.__new__(cls)
+        dataLog.names = names
+        dataLog.index = {name: i for i, name in enumerate(names)}
+        dataLog.count = fields[0]
+        dataLog._vertices = list(vertices) if vertices is not None else None
+        dataLog.filename = filename
+        dataLog._header = np.memmap(filename, dtype="<u8", mode=mode,
+                                    offset=len(cls.magic),
+                                    shape=(cls.headerFields,))
+        dataLog._map_rows(fields[1], mode)
+        return dataLog
+
+    @classmethod
+    def _data_offset(cls, nameLength):
+        """Returns the offset of the rows, aligned to 64 bytes."""
+
+        size = len(cls.magic) + 8 * cls.headerFields + nameLength
+        return -(-size // 64) * 64
+
+    def _map_rows(self, capacity, mode):
+        """Maps <capacity> rows of the log file, extending it if needed."""
+
+        offset = self._data_offset(int(self._header[3]))
+        self._array = np.memmap(self.filename, dtype="<f8", mode=mode,
+                                offset=offset,
+                                shape=(capacity, len(self.names)))
+        if mode != "r":
+            self._header[1] = capacity
+
+    def __getstate__(self):
+        """Returns the names and recorded rows of the DataLog, to pickle.
+
+        The vertices resolved by record_graph are left out, so that a
+        pickled DataLog doesn't drag its whole graph along; they are
+        resolved again by the next call to record_graph. A log kept in
+        a log file is pickled as a copy of its rows, and unpickled as a
+        DataLog held in memory.
+        """
+        return {"names": self.names, "count": self.count,
+                "array": np.array(self._array[:self.count])}
+
+    def __setstate__(self, state):
+        """Restores a DataLog pickled by __getstate__."""
+
+        self.names = state["names"]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.count = state["count"]
+        self._array = state["array"]
+        if len(self._array) == 0:
+            self._array = np.empty((1, len(self.names)))
+        self._vertices = None
+        self.filename = None
+        self._header = None
+
+    def __getitem__(self, name):
+        """Returns [name, data at step 0, data at step 1, . . .]."""
+        column = self._array[:self.count, self.index[name]]
+        return [name] + column.tolist()
+
+    def __iter__(self):
+        """Returns an iterator over the vertex names."""
+        return iter(self.names)
+
+    def __len__(self):
+        """Returns the number of vertices in the DataLog."""
+        return len(self.names)
+
+    def __str__(self):
+        """Returns a string of the DataLog as a dict-of-lists."""
+        return str(self.as_dict())
+
+    def _grow(self):
+        """Doubles the number of preallocated rows."""
+
+        if self.filename is not None:
+            self._array.flush()
+            self._map_rows(2 * len(self._array), "r+")
+            return
+        array = np.empty((2 * len(self._array), len(self.names)))
+        array[:self.count] = self._array[:self.count]
+        self._array = array
+
+    def record(self, values):
+        """Records a row of vertex data.
+
+        Method Parameters:
+            - values, the sequence or array of vertex data, in column
+              order.
+        """
+
+        if self.count == len(self._array):
+            self._grow()
+        self._array[self.count] = values
+        self.count += 1
+        if self._header is not None:
+            self._header[0] = self.count
+
+    def record_graph(self, aGraph=None):
+        """Records the current data of the DataLog's vertices.
+
+        The vertices are resolved from <aGraph> by name the first time
+        the method is called, and reused afterwards.
+
+        Method Parameters:
+            - aGraph, the DiGraph to record; it may be omitted if the
+              vertices were passed to the constructor.
+        """
+
+        if self._vertices is None:
+            self._vertices = [aGraph[name] for name in self.names]
+        self.record([vertex.data for vertex in self._vertices])
+
+    def get_array(self):
+        """Returns a steps x vertices view of the recorded rows."""
+        return self._array[:self.count]
+
+    def truncate(self, count):
+        """Discards the rows recorded after the first <count>."""
+
+        self.count = min(count, self.count)
+        if self._header is not None:
+            self._header[0] = self.count
+
+    def flush(self):
+        """Writes the rows of a log file to disk.
+
+        Rows recorded to a log file reach the disk on their own, as the
+        operating system writes back the mapped pages; flush forces
+        them out, for example before a checkpoint. It does nothing for
+        a DataLog held in memory.
+        """
+
+        if self.filename is not None:
+            self._array.flush()
+            self._header.flush()
+
+    def as_dict(self):
+        """Returns the DataLog as a plain dict-of-lists."""
+        return {name: self[name] for name in self.names}
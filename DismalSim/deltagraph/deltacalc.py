@@ -1,7 +1,3 @@
-from openpyxl import Workbook
-
-from DismalSim.deltagraph import digraph
-
 """Algorithms for calculating changes in dynamic graphs.
 
 Functions:
@@ -10,41 +6,146 @@ Functions:
     - manual_delta
     - gc_calc_delta
     - gp_calc_delta
+    - gen_push_sources
+    - gen_sparse_plan
+    - gc_sparse_calc_delta
     - multicount_delta
+    - gp_multicount_delta
+    - resume
+    - until_converged
+    - impulse_response
+    - iter_steps
+    - batch_multicount_delta
+    - ensemble
+    - run_scenarios
     - exovert_delta
+
+Classes:
+    - StepSnapshot
+    - ScenarioResult
+    - SparsePlan
+    - ConvergenceResult
+"""
+
+import collections
+import concurrent.futures
+import functools
+import itertools
+
+import numpy as np
+
+from DismalSim.deltagraph import checkpoint
+from DismalSim.deltagraph import compiled
+from DismalSim.deltagraph import datalog
+from DismalSim.deltagraph import digraph
+from DismalSim.deltagraph import exogenous
+from DismalSim.deltagraph import output
+
+
+class StepSnapshot(collections.namedtuple("StepSnapshot",
+                                          ["count", "names", "values"])):
+    """The state of a graph after one step of gc_iter_steps.
+
+    Class Data:
+        - count, the step count; 0 is the step applying the initial
+          deltas.
+        - names, the sequence of vertex names, shared by all snapshots
+          of a run.
+        - values, the data of the vertices after the step, in the
+          order of <names>.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self):
+        """Returns the snapshot's data, indexed by vertex name."""
+        return dict(zip(self.names, self.values))
+
+
+ScenarioResult = collections.namedtuple("ScenarioResult",
+                                        ["key", "dataLog", "error"])
+ScenarioResult.__doc__ = """The outcome of one scenario of run_scenarios.
+
+Class Data:
+    - key, the key of the scenario: its key in the scenario dictionary,
+      or its position in the scenario sequence.
+    - dataLog, the data log of the scenario, or None if it failed.
+    - error, the exception raised by the scenario, or None if it
+      succeeded.
 """
 
+SparsePlan = collections.namedtuple("SparsePlan",
+                                    ["baselines", "alwaysActive"])
+SparsePlan.__doc__ = """The precomputed plan of gc_sparse_calc_delta.
 
-def gen_data_log(aGraph):
-    """Creates a dict-of-lists to record data from delta calculations.
+Class Data:
+    - baselines, a dictionary of the baseline contributions to each
+      vertex of the graph, indexed by vertex: the tuple of the nonzero
+      contributions of its edges when all of its parents have a zero
+      delta, in the order of its parents. Vertices with parents but no
+      nonzero contributions have the single contribution 0.0.
+    - alwaysActive, the frozenset of the vertices whose contributions
+      depend on more than the deltas of their parents, through a
+      percent-output edge with a nonzero value at zero, or through a
+      parent outside the graph, and which are therefore evaluated at
+      every step.
+"""
 
-    The function creates a new dictionary, in which to store the 'data'
-    attributes of _vertices at each step in an iterative simulation. The
-    dictionary entries are indexed by Vertex, and the associated values
-    are lists of the _vertices 'data' attribute, intended to be written
-    to after each cycle of the simulation.
+ConvergenceResult = collections.namedtuple("ConvergenceResult",
+                                           ["dataLog", "count",
+                                            "converged"])
+ConvergenceResult.__doc__ = """The outcome of gc_until_converged.
+
+Class Data:
+    - dataLog, the DataLog of the run, or None if no log was kept.
+    - count, the number of steps run after the initial deltas.
+    - converged, True if the run stopped because the deltas fell below
+      the tolerance, and False if it stopped at <maxCount>.
+"""
+
+_scenarioGraph = None
+
+
+def gen_data_log(aGraph, maxCount=None, logFile=None):
+    """Creates a DataLog to record data from delta calculations.
+
+    The function creates a new DataLog, in which to store the 'data'
+    attributes of _vertices at each step in an iterative simulation,
+    and records the current data of <aGraph> as its first row. The
+    vertices are resolved once, and room is preallocated for the
+    initial deltas and <maxCount> further steps. Indexed by vertex
+    name, the DataLog returns the same lists as the dict-of-lists it
+    replaces. With <logFile>, the rows are kept on disk, in a log file
+    of that name, rather than in memory.
 
     Function Arguments:
         - aGraph
+        - maxCount
+        - logFile
     """
 
-    vDataDict = {}
-    for vertex in aGraph:
-        vName = vertex.name
-        vData = [vName, vertex.data]
-        vDataDict[vName] = vData
-    return vDataDict
-
+    vertices = list(aGraph)
+    names = [vertex.name for vertex in vertices]
+    capacity = maxCount + 2 if maxCount is not None else None
+    if logFile is not None:
+        dataLog = datalog.DataLog.create(logFile, names, capacity, vertices)
+    else:
+        dataLog = datalog.DataLog(names, capacity, vertices)
+    dataLog.record_graph()
+    return dataLog
 
 
 def log_data(aGraph, dataLog):
-    """Writes data from a graph into a dict-of-lists.
+    """Writes data from a graph into a DataLog or a dict-of-lists.
 
     Function Arguments:
         - aGraph
         - dataLog
     """
 
+    if isinstance(dataLog, datalog.DataLog):
+        dataLog.record_graph(aGraph)
+        return
     for key in dataLog:
         dataList = dataLog[key]
         vertex = aGraph[key]
@@ -55,11 +156,16 @@ def log_data(aGraph, dataLog):
 def manual_delta(aGraph, deltaDict):
     """Applies predetermined deltas from a user-defined dictionary.
 
+    <aGraph> may be either a DiGraph or a CompiledGraph.
+
     Function Arguments:
         - aGraph
         - deltaDict
     """
 
+    if isinstance(aGraph, compiled.CompiledGraph):
+        aGraph.manual_delta(deltaDict)
+        return
     for key in deltaDict:
         if key in aGraph:
             vTarget = aGraph[key]
@@ -70,17 +176,624 @@ def manual_delta(aGraph, deltaDict):
 def gc_calc_delta(aGraph):
     """Calculates delta values using a greedy-child paradigm.
 
+    <aGraph> may be either a DiGraph or a CompiledGraph.
+
     Function Arguments:
         - aGraph
     """
 
+    if isinstance(aGraph, compiled.CompiledGraph):
+        aGraph.calc_delta()
+        return
     for vertex in aGraph:
         vertex.transform()
 
 
-def gc_multicount_delta(aGraph, maxCount, initDeltaDict):
-    dataLog = gen_data_log(aGraph)
-    for count in range(maxCount + 1):
+def gp_calc_delta(aGraph, sources=None):
+    """Calculates delta values using a generous-parent paradigm.
+
+    Each parent pushes its contribution to its children, through their
+    shared edges, instead of each vertex pulling the contributions of
+    its parents. The pushes are limited to the vertices of <aGraph>,
+    and parents outside <aGraph> push to their children in it, so that
+    exactly the contributions added by gc_calc_delta are added. The
+    deltas are the same as those of gc_calc_delta, except for the order
+    in which the contributions to each vertex are summed: gc_calc_delta
+    adds them in the order of the vertex's parents, and gp_calc_delta
+    in the order of <sources>, so that the results may differ in the
+    last bits. The push traversal only visits vertices with children,
+    which is cheaper for graphs with many more sinks than sources.
+    <aGraph> may be either a DiGraph or a CompiledGraph; the latter
+    has a single, vectorized traversal.
+
+    Function Arguments:
+        - aGraph
+        - sources, the push sources of <aGraph>, as returned by
+          gen_push_sources; they are generated if omitted.
+    """
+
+    if isinstance(aGraph, compiled.CompiledGraph):
+        aGraph.calc_delta()
+        return
+    if sources is None:
+        sources = gen_push_sources(aGraph)
+    for vertex, children in sources:
+        vertex.gp_transform(children)
+
+
+def gen_push_sources(aGraph):
+    """Returns the push sources of <aGraph> for gp_calc_delta.
+
+    The sources are (vertex, children) pairs: the vertices of <aGraph>
+    with children, in the order of <aGraph>, followed by the parents
+    outside <aGraph> of its vertices. <children> is None for a vertex
+    whose children are all in <aGraph>, and the frozenset of those
+    that are otherwise. Like a SparsePlan, the sources depend only on
+    the edges of <aGraph>, and must be regenerated if they change.
+
+    Function Arguments:
+        - aGraph
+    """
+
+    members = set(aGraph)
+    sources = []
+    outsiders = {}
+    for vertex in aGraph:
+        if vertex._children:
+            inside = [cVertex for cVertex in vertex._children
+                      if cVertex in members]
+            if len(inside) == len(vertex._children):
+                sources.append((vertex, None))
+            elif inside:
+                sources.append((vertex, frozenset(inside)))
+        for pVertex in vertex._parents:
+            if pVertex not in members:
+                outsiders.setdefault(pVertex, set()).add(vertex)
+    for pVertex, children in outsiders.items():
+        sources.append((pVertex, frozenset(children)))
+    return tuple(sources)
+
+
+def gen_sparse_plan(aGraph):
+    """Returns the SparsePlan of <aGraph> for gc_sparse_calc_delta.
+
+    The plan depends only on the edges of <aGraph>, and must be
+    regenerated if they change.
+
+    Function Arguments:
+        - aGraph
+    """
+
+    baselines = {}
+    alwaysActive = set()
+    members = set(aGraph)
+    for vertex in aGraph:
+        terms = []
+        for pVertex, edge in vertex._parents.items():
+            if pVertex not in members:
+                alwaysActive.add(vertex)
+                continue
+            try:
+                if (edge.tKey // 3) % 2:
+                    if edge.contribution(0, 1.0) != 0:
+                        alwaysActive.add(vertex)
+                    continue
+                term = edge.contribution(0, vertex.data)
+            except (ArithmeticError, TypeError):
+                alwaysActive.add(vertex)
+                continue
+            if term != 0:
+                terms.append(term)
+        if vertex._parents and not terms:
+            terms.append(0.0)
+        baselines[vertex] = tuple(terms)
+    return SparsePlan(baselines, frozenset(alwaysActive))
+
+
+def gc_sparse_calc_delta(aGraph, plan=None):
+    """Calculates greedy-child delta values, only where they changed.
+
+    Only the vertices with a parent whose latest absolute delta is
+    nonzero, the frontier of the previous step, have their edges
+    evaluated by Vertex.transform. Every other vertex instead has the
+    baseline contributions of its <plan> added to its 'deltaFloat', in
+    the same order as the transform would have added them, so that the
+    deltas are identical to those of gc_calc_delta. When a shock has
+    only reached a few vertices, most edges are then never evaluated.
+    <aGraph> may be either a DiGraph or a CompiledGraph; the latter
+    always uses its dense, vectorized step.
+
+    Function Arguments:
+        - aGraph
+        - plan, the SparsePlan of <aGraph>; it is generated if omitted.
+    """
+
+    if isinstance(aGraph, compiled.CompiledGraph):
+        aGraph.calc_delta()
+        return
+    if plan is None:
+        plan = gen_sparse_plan(aGraph)
+    baselines = plan.baselines
+    active = set(plan.alwaysActive)
+    for vertex in baselines:
+        if vertex._deltaPrevAbs.latest and vertex._children:
+            active.update(vertex._children)
+    for vertex, terms in baselines.items():
+        if vertex in active:
+            vertex.transform()
+        else:
+            for term in terms:
+                vertex.deltaFloat += term
+
+
+def gc_multicount_delta(aGraph, maxCount, initDeltaDict, sinks=(),
+                        logFlag=True, sparseFlag=False, checkpointDir=None,
+                        checkpointEvery=100, logFile=None, profiler=None):
+    """Runs a greedy-child simulation for <maxCount> steps.
+
+    <aGraph> may be either a DiGraph or a CompiledGraph; in the latter
+    case the vectorized stepping of the CompiledGraph is used, and the
+    original vertices are left untouched.
+
+    Any output sinks in <sinks> are opened before the first step,
+    receive one row of vertex data per step as the simulation
+    progresses, and are closed at the end of the run. With <logFlag>
+    set to False, no data log is kept in memory, and the function
+    returns None; the results then only go to the sinks.
+
+    With <sparseFlag> set to True, the deltas of each step are
+    calculated by gc_sparse_calc_delta, which only evaluates the edges
+    of vertices reached by a change in the previous step; the results
+    are identical. The CompiledGraph ignores <sparseFlag>.
+
+    With <checkpointDir> set to the path of a directory, the state of
+    the simulation and the rows of its data log are saved there by a
+    checkpoint.Checkpoint every <checkpointEvery> steps, and after the
+    last one. An interrupted run can then be continued from its last
+    checkpoint with gc_resume.
+
+    With <logFile> set to the name of a file, the data log is kept on
+    disk, in that file, rather than in memory, so that runs with more
+    rows than fit in memory can still be logged; see
+    datalog.DataLog.create. The log can be reopened later with
+    datalog.DataLog.open.
+
+    With <profiler> set to a profiling.StepProfiler, the phases of
+    every step, and the edges of a DiGraph, are timed by the profiler
+    as the run goes; see the profiling module. The results are the
+    same. Without it, nothing is timed.
+
+    Function Arguments:
+        - aGraph
+        - maxCount
+        - initDeltaDict
+        - sinks
+        - logFlag
+        - sparseFlag
+        - checkpointDir
+        - checkpointEvery
+        - logFile
+        - profiler
+    """
+
+    calc = "sparse" if sparseFlag else "gc"
+    if isinstance(aGraph, compiled.CompiledGraph):
+        return aGraph.multicount_delta(maxCount, initDeltaDict, sinks,
+                                       logFlag, checkpointDir=checkpointDir,
+                                       checkpointEvery=checkpointEvery,
+                                       logFile=logFile, profiler=profiler)
+    return _multicount_delta(aGraph, maxCount, initDeltaDict, sinks,
+                             logFlag, calc, logFile, _begin_checkpoint(
+                                 aGraph, maxCount, logFlag, calc, logFile,
+                                 checkpointDir, checkpointEvery), profiler)
+
+
+def gp_multicount_delta(aGraph, maxCount, initDeltaDict, sinks=(),
+                        logFlag=True, checkpointDir=None,
+                        checkpointEvery=100, logFile=None, profiler=None):
+    """Runs a generous-parent simulation for <maxCount> steps.
+
+    The function is the same as gc_multicount_delta, except that the
+    deltas of each step are calculated by gp_calc_delta.
+
+    Function Arguments:
+        - aGraph
+        - maxCount
+        - initDeltaDict
+        - sinks
+        - logFlag
+        - checkpointDir
+        - checkpointEvery
+        - logFile
+        - profiler
+    """
+
+    if isinstance(aGraph, compiled.CompiledGraph):
+        return aGraph.multicount_delta(maxCount, initDeltaDict, sinks,
+                                       logFlag, checkpointDir=checkpointDir,
+                                       checkpointEvery=checkpointEvery,
+                                       logFile=logFile, profiler=profiler)
+    return _multicount_delta(aGraph, maxCount, initDeltaDict, sinks,
+                             logFlag, "gp", logFile, _begin_checkpoint(
+                                 aGraph, maxCount, logFlag, "gp", logFile,
+                                 checkpointDir, checkpointEvery), profiler)
+
+
+def _begin_checkpoint(aGraph, maxCount, logFlag, calc, logFile,
+                      checkpointDir, checkpointEvery, exoFlag=False):
+    """Returns the Checkpoint of a new DiGraph run, or None.
+
+    A data log kept in a log file is not copied to the checkpoint,
+    which records the name of the file instead.
+    """
+
+    if checkpointDir is None:
+        return None
+    aCheckpoint = checkpoint.Checkpoint(checkpointDir, checkpointEvery)
+    names = [vertex.name for vertex in aGraph]
+    logShape = None
+    if logFlag and logFile is None:
+        logShape = (maxCount + 2, len(names))
+    aCheckpoint.begin("digraph", names, maxCount, logShape, logFile,
+                      logFlag=logFlag, calc=calc, exoFlag=exoFlag)
+    return aCheckpoint
+
+
+def _multicount_delta(aGraph, maxCount, initDeltaDict, sinks, logFlag,
+                      calc, logFile=None, aCheckpoint=None, profiler=None,
+                      exoSource=None):
+    """Steps a DiGraph for <maxCount> steps.
+
+    The deltas of each step are calculated by gc_calc_delta,
+    gp_calc_delta or gc_sparse_calc_delta, for a <calc> of 'gc', 'gp'
+    or 'sparse'. If <aCheckpoint> was opened from the directory of an
+    earlier run, whose state has already been restored, the run
+    continues from the step after the last one saved. With a
+    <profiler>, each phase of the loop is wrapped by its timed method,
+    and its edges are timed for the duration of the run. With an
+    opened <exoSource>, a row of exogenous deltas is applied after the
+    inherent deltas of every step but the first, until it runs out.
+    """
+
+    timed = _untimed if profiler is None else profiler.timed
+    if calc == "sparse":
+        calcDelta = functools.partial(
+            gc_sparse_calc_delta,
+            plan=timed("sparse_plan", gen_sparse_plan)(aGraph))
+    elif calc == "gp":
+        calcDelta = functools.partial(
+            gp_calc_delta,
+            sources=timed("push_sources", gen_push_sources)(aGraph))
+    else:
+        calcDelta = gc_calc_delta
+    calcDelta = timed("transform", calcDelta)
+    manualDelta = timed("manual_delta", manual_delta)
+    applyInherent = timed("apply_delta_inherent",
+                          aGraph.apply_inherent_deltas)
+    applyFloat = timed("apply_delta_float", aGraph.apply_floating_deltas)
+    logData = timed("logging", log_data)
+    applyExo = timed("exogenous", _apply_exo_row)
+    writeRows = timed("output", _write_rows)
+    vertices = list(aGraph)
+    names = [vertex.name for vertex in vertices]
+    start = 0
+    resumeFlag = aCheckpoint is not None and aCheckpoint.count is not None
+    if resumeFlag:
+        start = aCheckpoint.count + 1
+        dataLog = None
+        if logFlag:
+            dataLog = aCheckpoint.get_log(names, vertices)
+    elif logFlag:
+        dataLog = timed("logging", gen_data_log)(aGraph, maxCount, logFile)
+    else:
+        dataLog = None
+    if aCheckpoint is not None:
+        saveCheckpoint = timed("checkpoint", aCheckpoint.save)
+    if profiler is not None:
+        profiler.begin(aGraph)
+    try:
+        for sink in sinks:
+            sink.open(names)
+        if sinks and not resumeFlag:
+            writeRows(sinks, vertices)
+        for count in range(start, maxCount + 1):
+            if count == 0:
+                manualDelta(aGraph, initDeltaDict)
+                applyFloat()
+            else:
+                calcDelta(aGraph)
+                applyInherent()
+                if exoSource is not None:
+                    exoSource = applyExo(aGraph, exoSource)
+                applyFloat()
+            if logFlag:
+                logData(aGraph, dataLog)
+            if sinks:
+                writeRows(sinks, vertices)
+            if aCheckpoint is not None and aCheckpoint.due(count):
+                saveCheckpoint(count, checkpoint.get_vertex_state(vertices),
+                               dataLog)
+    finally:
+        for sink in sinks:
+            sink.close()
+        if profiler is not None:
+            profiler.end(aGraph)
+    return dataLog
+
+
+def _untimed(name, function):
+    """Returns <function> itself, for a run without a profiler."""
+    return function
+
+
+def _apply_exo_row(aGraph, source):
+    """Applies the next row of <source>, as manual_delta does.
+
+    Returns <source>, or None once it has run out.
+    """
+
+    exoDelta = source.read_row()
+    if exoDelta is None:
+        return None
+    manual_delta(aGraph, exoDelta)
+    return source
+
+
+def _open_exo_source(aGraph, exoDeltas, count=0):
+    """Returns the opened ExoSource of <exoDeltas>, past <count> rows.
+
+    A RetrievalError is raised if the source names a vertex that is not
+    in <aGraph>. The rows skipped are those already applied by the
+    steps before a checkpoint.
+    """
+
+    source = exogenous.open_source(exoDeltas)
+    names = source.open()
+    members = aGraph
+    if isinstance(aGraph, compiled.CompiledGraph):
+        members = aGraph.index
+    try:
+        for name in names:
+            if name not in members:
+                raise digraph.RetrievalError(1)
+        for i in range(count):
+            if source.read_row() is None:
+                break
+    except Exception:
+        source.close()
+        raise
+    return source
+
+
+def _write_rows(sinks, vertices):
+    """Writes the current data of <vertices> to every sink of <sinks>."""
+
+    row = [vertex.data for vertex in vertices]
+    for sink in sinks:
+        sink.write_row(row)
+
+
+def gc_resume(aGraph, checkpointDir, sinks=(), exoDeltas=None):
+    """Continues an interrupted simulation from its last checkpoint.
+
+    The simulation must have been started with a <checkpointDir> by
+    gc_multicount_delta, gp_multicount_delta, gc_batch_multicount_delta
+    or gc_ensemble, and <aGraph> must be the graph it was started on,
+    rebuilt or reloaded in the same state. The state of the vertices,
+    of the random module and of any NumPy Generator are restored from
+    the checkpoint, the remaining steps are run, with further
+    checkpoints saved to the same directory, and the function returns
+    what the interrupted call would have returned; the results are
+    identical to those of an uninterrupted run.
+
+    A DiGraph simulation must be resumed on a DiGraph, which is
+    modified in place; the other engines accept a DiGraph, which is
+    compiled first, or a CompiledGraph. An InitError is raised if
+    <checkpointDir> holds no checkpoint, or one of another graph.
+
+    Function Arguments:
+        - aGraph
+        - checkpointDir
+        - sinks, the output sinks of a single run; they receive the
+          data of the steps after the checkpoint only.
+        - exoDeltas, the series of exogenous deltas of a run started by
+          gc_exovert_delta, as passed to it; an InitError is raised if
+          it is omitted for such a run.
+    """
+
+    aCheckpoint = checkpoint.Checkpoint.open(checkpointDir)
+    settings = aCheckpoint.meta["settings"]
+    if settings.get("exoFlag") and exoDeltas is None:
+        raise digraph.InitError(5)
+    engine = aCheckpoint.meta["engine"]
+    if engine != "digraph":
+        if not isinstance(aGraph, compiled.CompiledGraph):
+            aGraph = aGraph.compile()
+    elif isinstance(aGraph, compiled.CompiledGraph):
+        raise digraph.InitError(4)
+    source = None
+    if settings.get("exoFlag"):
+        source = _open_exo_source(aGraph, exoDeltas, aCheckpoint.count)
+    try:
+        if engine != "digraph":
+            return aGraph.resume(aCheckpoint, sinks, source)
+        vertices = list(aGraph)
+        aCheckpoint.check_names([vertex.name for vertex in vertices])
+        checkpoint.set_vertex_state(vertices, aCheckpoint.state)
+        aCheckpoint.restore_random()
+        return _multicount_delta(aGraph, aCheckpoint.meta["maxCount"], {},
+                                 sinks, settings["logFlag"], settings["calc"],
+                                 aCheckpoint.meta["logFile"], aCheckpoint,
+                                 exoSource=source)
+    finally:
+        if source is not None:
+            source.close()
+
+
+def _get_state(aGraph, vertices):
+    """Returns the data and latest absolute deltas as one array."""
+
+    if vertices is None:
+        return np.concatenate((aGraph.data, aGraph.deltaPrevAbs))
+    return np.array([vertex.data for vertex in vertices]
+                    + [vertex._deltaPrevAbs.latest for vertex in vertices],
+                    dtype=np.float64)
+
+
+def _set_state(aGraph, vertices, state):
+    """Sets the data and latest absolute deltas from one array."""
+
+    if vertices is None:
+        nVertices = len(aGraph)
+        aGraph.data = state[:nVertices].copy()
+        aGraph.deltaPrevAbs = state[nVertices:].copy()
+        return
+    nVertices = len(vertices)
+    for vertex, data, delta in zip(vertices, state[:nVertices].tolist(),
+                                   state[nVertices:].tolist()):
+        vertex.data = data
+        vertex._deltaPrevAbs.set_latest(delta)
+
+
+def gc_until_converged(aGraph, initDeltaDict, tol, maxCount,
+                       relativeFlag=False, accelDepth=0, logFlag=True):
+    """Runs a greedy-child simulation until the deltas settle.
+
+    The initial deltas are applied, and the graph is stepped until the
+    largest absolute delta of a step, or the largest delta relative to
+    the data before the step if <relativeFlag> is True, falls below
+    <tol>, or until <maxCount> steps have been run. <aGraph> may be
+    either a DiGraph or a CompiledGraph.
+
+    With <accelDepth> greater than 0, the run is accelerated towards
+    its fixed point by Anderson mixing: the state of the graph, its
+    data together with its latest absolute deltas, is replaced after
+    each step by the combination of the last <accelDepth> + 1 stepped
+    states that best cancels their residuals, in the least-squares
+    sense. The intermediate states then no longer follow the plain
+    simulation, and only the fixed point is shared with it; mixing is
+    not meaningful for graphs with random vertices.
+
+    Function Arguments:
+        - aGraph
+        - initDeltaDict
+        - tol
+        - maxCount
+        - relativeFlag
+        - accelDepth
+        - logFlag
+
+    Returns a ConvergenceResult.
+    """
+
+    compiledFlag = isinstance(aGraph, compiled.CompiledGraph)
+    vertices = None if compiledFlag else list(aGraph)
+    nVertices = len(aGraph)
+    dataLog = None
+    if logFlag:
+        if compiledFlag:
+            dataLog = datalog.DataLog(aGraph.names)
+            dataLog.record(aGraph.data)
+        else:
+            dataLog = gen_data_log(aGraph)
+    manual_delta(aGraph, initDeltaDict)
+    aGraph.apply_floating_deltas()
+    if logFlag:
+        dataLog.record(_get_state(aGraph, vertices)[:nVertices])
+    history = collections.deque(maxlen=accelDepth + 1)
+    count = 0
+    converged = False
+    while count < maxCount:
+        state = _get_state(aGraph, vertices)
+        gc_calc_delta(aGraph)
+        aGraph.apply_inherent_deltas()
+        aGraph.apply_floating_deltas()
+        count += 1
+        stepped = _get_state(aGraph, vertices)
+        residual = stepped - state
+        change = np.abs(residual[:nVertices])
+        if relativeFlag:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                change = np.where(change == 0, 0.0,
+                                  change / np.abs(state[:nVertices]))
+        if accelDepth > 0:
+            history.append((stepped, residual))
+            if len(history) > 1:
+                mixed = _anderson_mix(history)
+                if np.all(np.isfinite(mixed)):
+                    _set_state(aGraph, vertices, mixed)
+        if logFlag:
+            dataLog.record(_get_state(aGraph, vertices)[:nVertices])
+        if np.max(change, initial=0.0) < tol:
+            converged = True
+            break
+    return ConvergenceResult(dataLog, count, converged)
+
+
+def _anderson_mix(history):
+    """Returns the Anderson-mixed state of a history of steps.
+
+    <history> holds (stepped state, residual) pairs, oldest first. The
+    mixing coefficients minimize the norm of the combined residual,
+    through a least-squares fit on the differences between successive
+    residuals.
+    """
+
+    stepped = np.array([pair[0] for pair in history]).T
+    residuals = np.array([pair[1] for pair in history]).T
+    dResidual = np.diff(residuals, axis=1)
+    dStepped = np.diff(stepped, axis=1)
+    gamma = np.linalg.lstsq(dResidual, residuals[:, -1], rcond=None)[0]
+    return stepped[:, -1] - (dStepped @ gamma)
+
+
+def gc_impulse_response(aGraph, horizons, initDeltaDict, method="power"):
+    """Returns the data of a greedy-child simulation at <horizons>.
+
+    A DiGraph is compiled first, and left untouched. For all-linear
+    graphs the response is computed in closed form rather than by
+    stepping; see CompiledGraph.impulse_response, and the 'method'
+    field of the returned ImpulseResponse for the method actually used.
+
+    Function Arguments:
+        - aGraph
+        - horizons
+        - initDeltaDict
+        - method
+    """
+
+    if not isinstance(aGraph, compiled.CompiledGraph):
+        aGraph = aGraph.compile()
+    return aGraph.impulse_response(horizons, initDeltaDict, method)
+
+
+def gc_iter_steps(aGraph, initDeltaDict, maxCount=None):
+    """Steps a greedy-child simulation lazily, one step per iteration.
+
+    The function is a generator: it applies the initial deltas, and
+    yields a StepSnapshot after that and after every subsequent step,
+    up to and including step <maxCount>, or indefinitely if <maxCount>
+    is None. The caller may stop consuming it at any point. A
+    dictionary of deltas passed to the generator's send method is
+    applied with manual_delta before the next step, as a shock on top
+    of the deltas calculated by that step. <aGraph> may be either a
+    DiGraph, which is modified in place as with gc_multicount_delta,
+    or a CompiledGraph.
+
+    Function Arguments:
+        - aGraph
+        - initDeltaDict
+        - maxCount
+    """
+
+    compiledFlag = isinstance(aGraph, compiled.CompiledGraph)
+    if compiledFlag:
+        names = tuple(aGraph.names)
+    else:
+        vertices = list(aGraph)
+        names = tuple(vertex.name for vertex in vertices)
+    count = 0
+    while maxCount is None or count <= maxCount:
         if count == 0:
             manual_delta(aGraph, initDeltaDict)
             aGraph.apply_floating_deltas()
@@ -88,29 +801,241 @@ def gc_multicount_delta(aGraph, maxCount, initDeltaDict):
             gc_calc_delta(aGraph)
             aGraph.apply_inherent_deltas()
             aGraph.apply_floating_deltas()
-        log_data(aGraph, dataLog)
-    return dataLog
+        if compiledFlag:
+            values = aGraph.data.copy()
+        else:
+            values = tuple(vertex.data for vertex in vertices)
+        shock = yield StepSnapshot(count, names, values)
+        if shock is not None:
+            manual_delta(aGraph, shock)
+        count += 1
+
+
+def gc_batch_multicount_delta(aGraph, maxCount, initDeltaDicts,
+                              checkpointDir=None, checkpointEvery=100):
+    """Runs one greedy-child simulation per initial-delta dictionary.
+
+    The simulations are stepped together by a CompiledGraph; if
+    <aGraph> is a DiGraph, it is compiled first, and left untouched.
+    For all-linear graphs, each step is a single sparse matrix-matrix
+    product across all of the simulations. Checkpoints are saved to
+    <checkpointDir> as with gc_multicount_delta.
+
+    Function Arguments:
+        - aGraph
+        - maxCount
+        - initDeltaDicts
+        - checkpointDir
+        - checkpointEvery
+    """
+
+    if not isinstance(aGraph, compiled.CompiledGraph):
+        aGraph = aGraph.compile()
+    return aGraph.batch_multicount_delta(maxCount, initDeltaDicts,
+                                         checkpointDir, checkpointEvery)
 
 
-def gc_exovert_delta(aGraph, maxCount, exoDeltaDict):
-    return NotImplemented
+def gc_ensemble(aGraph, maxCount, initDeltaDict, nRuns, seed=None,
+                checkpointDir=None, checkpointEvery=100):
+    """Runs a vectorized Monte Carlo ensemble of simulations.
+
+    Every run applies the same initial deltas, and the runs differ only
+    in the random deltas and values of vertices created with the
+    'randomDeltaFlag' or 'randomValFlag' keyword arguments. All runs
+    are stepped together by a CompiledGraph; if <aGraph> is a DiGraph,
+    it is compiled first, and left untouched. The random draws of each
+    step are made with a single NumPy call, from a Generator seeded
+    with <seed>, so the same seed reproduces the same ensemble.
+    Checkpoints are saved to <checkpointDir> as with
+    gc_multicount_delta, and the returned array is then a view of the
+    memory-mapped log of the checkpoint.
+
+    Function Arguments:
+        - aGraph
+        - maxCount
+        - initDeltaDict
+        - nRuns
+        - seed
+        - checkpointDir
+        - checkpointEvery
+
+    Returns an nRuns x (maxCount + 2) x vertices array, laid out like
+    the data log of gc_multicount_delta, with the vertices in the
+    iteration order of <aGraph>.
+    """
+
+    if not isinstance(aGraph, compiled.CompiledGraph):
+        aGraph = aGraph.compile()
+    return aGraph.ensemble_multicount_delta(maxCount, initDeltaDict, nRuns,
+                                            seed, checkpointDir,
+                                            checkpointEvery)
+
+
+def _init_scenario_worker(aGraph):
+    """Stores the CompiledGraph shipped to a worker of run_scenarios."""
+
+    global _scenarioGraph
+    _scenarioGraph = aGraph
+
+
+def _run_scenario(key, initDeltaDict, maxCount):
+    """Runs one scenario on a copy of the worker's CompiledGraph.
+
+    Any exception raised by the scenario is captured in the returned
+    ScenarioResult rather than propagated, so that a bad scenario does
+    not stop the others.
+    """
+
+    try:
+        aGraph = _scenarioGraph.copy()
+        dataLog = gc_multicount_delta(aGraph, maxCount, initDeltaDict)
+        return ScenarioResult(key, dataLog, None)
+    except Exception as error:
+        return ScenarioResult(key, None, error)
+
+
+def run_scenarios(aGraph, scenarios, maxCount, workers=None):
+    """Runs many initial-delta scenarios on a pool of worker processes.
+
+    A DiGraph <aGraph> is compiled once, before any scenario is run,
+    and the CompiledGraph is shipped once to each worker process of a
+    ProcessPoolExecutor; every scenario is then run on a copy of its
+    state arrays, made by CompiledGraph.copy, so that the scenarios
+    don't interfere with each other or modify <aGraph>. Pickling and
+    copying flat arrays take the same time however the vertices are
+    linked, unlike copying a DiGraph, which recurses through the
+    dictionaries of linked vertices and can exceed the recursion limit
+    on long chains. The results are therefore those of the compiled
+    engine, equal to those of gc_multicount_delta up to floating-point
+    rounding. Results are yielded as a generator of ScenarioResult, in
+    the order of <scenarios> regardless of the order in which the
+    workers finish them. A scenario that raises an exception yields a
+    ScenarioResult holding the exception instead of a data log, and the
+    remaining scenarios carry on. The compilation errors of a DiGraph,
+    such as a RetrievalError for a Vertex with no data, are raised
+    before any scenario is run.
+
+    Function Arguments:
+        - aGraph
+        - scenarios, either a dictionary of initial-delta dictionaries,
+          indexed by scenario key, or a sequence of them, in which case
+          the key of each scenario is its position.
+        - maxCount
+        - workers, the number of worker processes; it defaults to None,
+          for one per processor. With a single worker, the scenarios
+          are run in the calling process.
+    """
+
+    if not isinstance(aGraph, compiled.CompiledGraph):
+        aGraph = aGraph.compile()
+    if isinstance(scenarios, dict):
+        items = list(scenarios.items())
+    else:
+        items = list(enumerate(scenarios))
+    if workers == 1:
+        _init_scenario_worker(aGraph)
+        for key, initDeltaDict in items:
+            yield _run_scenario(key, initDeltaDict, maxCount)
+        return
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_scenario_worker,
+            initargs=(aGraph,)) as executor:
+        futures = [executor.submit(_run_scenario, key, initDeltaDict,
+                                   maxCount)
+                   for key, initDeltaDict in items]
+        for (key, initDeltaDict), future in zip(items, futures):
+            try:
+                yield future.result()
+            except Exception as error:
+                yield ScenarioResult(key, None, error)
+
+
+def gc_exovert_delta(aGraph, maxCount, initDeltaDict, exoDeltas, sinks=(),
+                     logFlag=True, sparseFlag=False, logFile=None,
+                     checkpointDir=None, checkpointEvery=100, profiler=None):
+    """Runs a greedy-child simulation with exogenous vertices.
+
+    The simulation is that of gc_multicount_delta, except that the
+    deltas of some vertices are driven from outside the graph, by a
+    series such as a forecast path of government spending. The series
+    is read from <exoDeltas> one row per step, as the simulation
+    progresses, and is never held in memory as a whole, so that it may
+    run for as many steps as its source holds. Row i of the series
+    gives the deltas of step i + 1; the first step applies
+    <initDeltaDict>, as usual. In each step, the deltas of the series
+    replace those calculated for their vertices, including inherent
+    deltas, the way manual_delta replaces them; a missing value leaves
+    its vertex to the graph for that step. Once the series runs out,
+    the remaining steps are run without exogenous deltas.
+
+    The steps are run by the same loop as those of
+    gc_multicount_delta, so that logging, sinks, checkpoints and
+    profiling work as they do there. A run checkpointed to
+    <checkpointDir> is resumed with gc_resume, given the same series
+    again, which is read past the rows already applied.
+
+    A RetrievalError is raised, before the simulation starts, if the
+    series names a vertex that is not in <aGraph>, and a DataError if
+    it holds a value that is not a number. <aGraph> may be either a
+    DiGraph or a CompiledGraph, which ignores <sparseFlag>.
+
+    Function Arguments:
+        - aGraph
+        - maxCount
+        - initDeltaDict
+        - exoDeltas, the source of the series: an exogenous.ExoSource,
+          the name of a '.csv' or '.xlsx' file with a header row of
+          vertex names, or a dictionary of iterables, such as lists,
+          arrays or generators, indexed by vertex name; see
+          exogenous.open_source.
+        - sinks
+        - logFlag
+        - sparseFlag
+        - logFile
+        - checkpointDir
+        - checkpointEvery
+        - profiler
+    """
+
+    calc = "sparse" if sparseFlag else "gc"
+    with _open_exo_source(aGraph, exoDeltas) as source:
+        if isinstance(aGraph, compiled.CompiledGraph):
+            return aGraph.multicount_delta(
+                maxCount, initDeltaDict, sinks, logFlag,
+                checkpointDir=checkpointDir, checkpointEvery=checkpointEvery,
+                logFile=logFile, profiler=profiler, exoSource=source)
+        return _multicount_delta(aGraph, maxCount, initDeltaDict, sinks,
+                                 logFlag, calc, logFile, _begin_checkpoint(
+                                     aGraph, maxCount, logFlag, calc, logFile,
+                                     checkpointDir, checkpointEvery, True),
+                                 profiler, source)
 
 
 def output_spreadsheet(filename, dataDict):
-    filename += ".xlsx"
-    dataBook = Workbook()
-    dataSheet = dataBook.active
-
-    colCount = 1
-    rowCount = 1
-    for sublist in dataDict.values():
-        for item in sublist:
-            cell = dataSheet.cell(column=colCount, row=rowCount)
-            cell.value = item
-            rowCount += 1
-        rowCount = 1
-        colCount += 1
-    dataBook.save(filename)
+    """Writes a dict-of-lists data log to the spreadsheet <filename>.
+
+    Each list of the data log is written to a column of its own; a
+    DataLog is written directly from its array of rows. The
+    spreadsheet is written row by row by an output.SpreadsheetSink, in
+    openpyxl write-only mode.
+
+    Function Arguments:
+        - filename, the name of the spreadsheet, without the '.xlsx'
+          extension.
+        - dataDict
+    """
+
+    if isinstance(dataDict, datalog.DataLog):
+        with output.SpreadsheetSink(filename) as sink:
+            sink.open(dataDict.names)
+            for row in dataDict.get_array():
+                sink.write_row(row)
+        return
+    rows = itertools.zip_longest(*dataDict.values())
+    with output.SpreadsheetSink(filename) as sink:
+        sink.open(next(rows, ()))
+        for row in rows:
+            sink.write_row(list(row))
 
 
 def main():
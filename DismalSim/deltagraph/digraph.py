@@ -1,6 +1,3 @@
-from DismalSim.deltagraph import transforms
-import random
-
 """Non-standard graph implementation, intended for use in modeling.
 
 While initially developed with macroeconomic modeling in mind, the
@@ -8,6 +5,14 @@ graph implementation of the DismalSim package is designed to also be
 useful for modeling other linked dynamic systems.
 
 Classes:
+    - DeltaHistory
+    - Edge
+    - LinearEdge
+    - PercentLinearEdge
+    - ExponentialEdge
+    - PercentExponentialEdge
+    - PolynomialEdge
+    - PercentPolynomialEdge
     - Vertex
     - DiGraph
 
@@ -19,6 +24,328 @@ Exceptions:
     - RetrievalError
 """
 
+from DismalSim.deltagraph import transforms
+import abc
+import math
+import random
+import warnings
+
+
+class DeltaHistory:
+    """A fixed-size ring buffer of previous delta values.
+
+    The DeltaHistory keeps the most recent <depth> values pushed into
+    it, and discards older values as new ones arrive, so that pushing a
+    value is constant time and the memory used is bounded regardless of
+    the length of a simulation. Values are indexed latest-first, like
+    the lists they replace: history[0] is the most recent value, and
+    history[1] the one before it. A history of depth 1, the default,
+    holds its single value in <latest> and allocates no buffer at all.
+
+    Class Data:
+        - self.latest, the most recently pushed value. It is kept as
+          plain attribute, so that the transform loop can read it
+          without a method call.
+        - self._buffer, the preallocated list holding the values, or
+          None for a history of depth 1.
+        - self._head, the position of the latest value in the buffer.
+        - self._size, the number of values currently held.
+
+    Public Methods:
+        - push
+        - set_latest
+        - get_depth
+        - set_depth
+    """
+
+    __slots__ = ("latest", "_buffer", "_head", "_size")
+
+    def __init__(self, depth=1, initial=0):
+        """Initializes the buffer, holding only the value <initial>.
+
+        Method Parameters:
+            - depth, the number of values to keep; it defaults to 1.
+            - initial, the value the history starts with; it defaults
+              to 0.
+        """
+
+        if not isinstance(depth, int) or depth < 1:
+            raise DataError(3)
+        self._buffer = [initial] * depth if depth > 1 else None
+        self._head = 0
+        self._size = 1
+        self.latest = initial
+
+    def __len__(self):
+        """Returns the number of values held in the history."""
+        return self._size
+
+    def __getitem__(self, index):
+        """Returns the value pushed <index> pushes ago.
+
+        Negative indices count from the oldest value held. An
+        IndexError is raised for indices outside of the history.
+        """
+
+        if index < 0:
+            index += self._size
+        if index < 0 or index >= self._size:
+            raise IndexError("DeltaHistory index out of range")
+        if self._buffer is None:
+            return self.latest
+        return self._buffer[(self._head - index) % len(self._buffer)]
+
+    def __iter__(self):
+        """Returns an iterator over the values, latest first."""
+        for index in range(self._size):
+            yield self[index]
+
+    def push(self, value):
+        """Adds <value> as the latest value of the history."""
+
+        self.latest = value
+        if self._buffer is None:
+            return
+        depth = len(self._buffer)
+        self._head = (self._head + 1) % depth
+        self._buffer[self._head] = value
+        if self._size < depth:
+            self._size += 1
+
+    def set_latest(self, value):
+        """Replaces the latest value of the history with <value>."""
+
+        if self._buffer is not None:
+            self._buffer[self._head] = value
+        self.latest = value
+
+    def get_depth(self):
+        """Returns the number of values the history can hold."""
+        return len(self._buffer) if self._buffer is not None else 1
+
+    def set_depth(self, depth):
+        """Resizes the history, keeping its most recent values.
+
+        Method Parameters:
+            - depth, the new number of values to keep.
+        """
+
+        if not isinstance(depth, int) or depth < 1:
+            raise DataError(3)
+        if depth == self.get_depth():
+            return
+        values = list(self)[:depth]
+        self._size = len(values)
+        if depth == 1:
+            self._buffer = None
+            self._head = 0
+            return
+        values.reverse()
+        self._buffer = values + [0] * (depth - len(values))
+        self._head = len(values) - 1
+
+
+class Edge(abc.ABC):
+    """Abstract base class of the slotted records of directed edges.
+
+    An Edge is created by Vertex.add_edge, through Edge.create, and
+    stored as the value of the 'parent' Vertex's entry in the 'child'
+    Vertex's <_parents> dictionary. There is one subclass of Edge per
+    transform family and output type; each holds the parameters of its
+    transform as pre-extracted floats in a few slots, and computes the
+    contribution of the edge with a single method call, without
+    unpacking parameters or selecting a transform. Parameters are
+    validated once, when the Edge is created, by the normalize
+    functions of the transforms module.
+
+    Memory Budget (CPython 3.11, 64-bit, measured with tracemalloc):
+        - a linear or exponential Edge record takes 56 bytes, plus 24
+          bytes for each of its two floats that isn't shared with
+          another object.
+        - a polynomial Edge record takes 56 bytes, plus its tuple of
+          terms.
+        - the entries in the 'child' Vertex's <_parents> dictionary
+          and the 'parent' Vertex's <_children> dictionary add about
+          55 bytes each per edge, so that a typical linear edge costs
+          165 to 215 bytes in total.
+
+    Class Data:
+        - self.tKey, the integer transform key, from
+          Vertex.transformKeyMap.
+        - self.parameters, the canonical tuple of transform
+          parameters, rebuilt from the slots on access.
+
+    Public Methods:
+        - create
+        - restore
+        - contribution
+    """
+
+    __slots__ = ("tKey",)
+
+    @staticmethod
+    def create(tKey, parameters):
+        """Returns an Edge of the right subclass for <tKey>.
+
+        The transform keys are laid out so that <tKey> % 3 selects the
+        family of the transform, and (<tKey> // 3) % 2 whether it
+        returns a percentage change. A ParameterError is raised if
+        <parameters> are invalid for the transform.
+
+        Method Parameters:
+            - tKey, the integer transform key.
+            - parameters, the sequence of transform parameters.
+        """
+
+        percentFlag = (tKey // 3) % 2
+        edgeClass = edgeClasses[tKey % 3][percentFlag]
+        return edgeClass(tKey, parameters)
+
+    @staticmethod
+    def restore(tKey, canonical):
+        """Returns an Edge for <tKey> from canonical parameters.
+
+        Unlike create, the method doesn't validate or normalize the
+        parameters, which must already be in the canonical form of the
+        transforms module, as returned by the 'parameters' property of
+        an Edge; it is meant for loading saved graphs in bulk.
+
+        Method Parameters:
+            - tKey, the integer transform key.
+            - canonical, the canonical tuple of transform parameters.
+        """
+
+        edgeClass = edgeClasses[tKey % 3][(tKey // 3) % 2]
+        return edgeClass.from_canonical(tKey, canonical)
+
+    @abc.abstractmethod
+    def contribution(self, value, data):
+        """Returns the edge's contribution to the child's deltaFloat.
+
+        Method Parameters:
+            - value, the latest absolute delta of the 'parent' Vertex.
+            - data, the data of the 'child' Vertex, used by transforms
+              returning a percentage change.
+        """
+
+
+class LinearEdge(Edge):
+    """An edge with an absolute-output linear transform."""
+
+    __slots__ = ("gradient", "intercept")
+
+    def __init__(self, tKey, parameters):
+        self.tKey = tKey
+        self.gradient, self.intercept = transforms.normalize_linear(
+            parameters)
+
+    @classmethod
+    def from_canonical(cls, tKey, canonical):
+        edge = cls.__new__(cls)
+        edge.tKey = tKey
+        edge.gradient, edge.intercept = canonical
+        return edge
+
+    @property
+    def parameters(self):
+        return self.gradient, self.intercept
+
+    def contribution(self, value, data):
+        return (self.gradient * value) + self.intercept
+
+
+class PercentLinearEdge(LinearEdge):
+    """An edge with a percentage-output linear transform."""
+
+    __slots__ = ()
+
+    def contribution(self, value, data):
+        return (((self.gradient * value) + self.intercept) / 100) * data
+
+
+class ExponentialEdge(Edge):
+    """An edge with an absolute-output exponential transform."""
+
+    __slots__ = ("base", "constant")
+
+    def __init__(self, tKey, parameters):
+        self.tKey = tKey
+        self.base, self.constant = transforms.normalize_exponential(
+            parameters)
+
+    @classmethod
+    def from_canonical(cls, tKey, canonical):
+        edge = cls.__new__(cls)
+        edge.tKey = tKey
+        edge.base, edge.constant = canonical
+        return edge
+
+    @property
+    def parameters(self):
+        return self.base, self.constant
+
+    def contribution(self, value, data):
+        return (self.base ** value) + self.constant
+
+
+class PercentExponentialEdge(ExponentialEdge):
+    """An edge with a percentage-output exponential transform."""
+
+    __slots__ = ()
+
+    def contribution(self, value, data):
+        return (((self.base ** value) + self.constant) / 100) * data
+
+
+class PolynomialEdge(Edge):
+    """An edge with an absolute-output polynomial transform.
+
+    The coefficient-exponent pairs are held as a tuple of terms.
+    """
+
+    __slots__ = ("terms", "constant")
+
+    def __init__(self, tKey, parameters):
+        self.tKey = tKey
+        canonical = transforms.normalize_polynomial(parameters)
+        self.terms = tuple((canonical[2 * k], canonical[(2 * k) + 1])
+                           for k in range(len(canonical) // 2))
+        self.constant = canonical[-1]
+
+    @classmethod
+    def from_canonical(cls, tKey, canonical):
+        edge = cls.__new__(cls)
+        edge.tKey = tKey
+        edge.terms = tuple(zip(canonical[0:-1:2], canonical[1:-1:2]))
+        edge.constant = canonical[-1]
+        return edge
+
+    @property
+    def parameters(self):
+        flat = []
+        for term in self.terms:
+            flat.extend(term)
+        flat.append(self.constant)
+        return tuple(flat)
+
+    def contribution(self, value, data):
+        return transforms.fast_polynomial(value, self.terms, self.constant)
+
+
+class PercentPolynomialEdge(PolynomialEdge):
+    """An edge with a percentage-output polynomial transform."""
+
+    __slots__ = ()
+
+    def contribution(self, value, data):
+        newVal = transforms.fast_polynomial(value, self.terms, self.constant)
+        return (newVal / 100) * data
+
+
+edgeClasses = ((LinearEdge, PercentLinearEdge),
+               (ExponentialEdge, PercentExponentialEdge),
+               (PolynomialEdge, PercentPolynomialEdge))
+
 
 class Vertex:
     """The Vertex class, intended for use in a DiGraph.
@@ -38,6 +365,20 @@ class Vertex:
     extent enable the DiGraph to be considered both directed and
     undirected.
 
+    The Vertex uses __slots__, and so has no instance __dict__; with a
+    history depth of 1, its delta histories allocate no buffers.
+
+    Memory Budget (CPython 3.11, 64-bit, measured with tracemalloc):
+        - 128 bytes for the Vertex itself.
+        - 128 bytes for its two DeltaHistory objects.
+        - 128 bytes for its empty <_parents> and <_children>
+          dictionaries.
+        - its name and data, unless shared with other objects.
+      This comes to about 390 bytes per Vertex before any edges (see
+      the Edge class for the per-edge budget), so that a graph of a
+      million vertices with three edges each fits in about a
+      gigabyte.
+
     Supported Transform Types:
         - Proportional (Absolute-Edge, Percent-Edge)
         - Linear (Absolute-Edge, Percent-Edge)
@@ -60,24 +401,29 @@ class Vertex:
           When the Vertex is instantiated, the dictionary is empty.
           When edges are added to the Vertex, the parent Vertex is used
           as the key for the dictionary; the value in the key-value
-          pair is a Tuple containing a value that corresponds to a
-          specific transform function, as well as the parameters for
-          that transform function.
+          pair is an Edge record of the subclass for a specific
+          transform, holding the key of the transform and its
+          parameters, and computing the edge's contribution with its
+          contribution method.
         - self._children, the dictionary containing the child _vertices.
           When the Vertex is instantiated, the dictionary is empty.
-          When edges are added to the Vertex, the child Vertex is used
-          as the key for the dictionary; the value in the key-value
-          pair is a Tuple containing a value that corresponds to a
-          specific transform function, and the parameters for that
-          transform function.
-        - self._deltaPrevAbs, the list of previous absolute delta
-          values. These are used for modeling changes to the vertex in
-          a linked system--the previous absolute delta values are used
-          to calculate the floating delta of the Vertex's _children.
-        - self._deltaPrevPer, the list of previous percent delta values.
-          These are used for modeling changes to the vertex in a
-          linked system--the previous absolute delta values are used to
-          calculate the floating delta of the Vertex's _children.
+          When an edge is added to a child of the Vertex, the child
+          Vertex is used as the key for the dictionary; the value in
+          the key-value pair is the same Edge that the child holds in
+          its <_parents> dictionary. The dictionary is maintained by
+          the add_edge and remove_edge methods of the child.
+        - self._deltaPrevAbs, the DeltaHistory of previous absolute
+          delta values, latest first. These are used for modeling
+          changes to the vertex in a linked system--the previous
+          absolute delta values are used to calculate the floating
+          delta of the Vertex's _children.
+        - self._deltaPrevPer, the DeltaHistory of previous percent
+          delta values, latest first. These are used for modeling
+          changes to the vertex in a linked system--the previous
+          absolute delta values are used to calculate the floating
+          delta of the Vertex's _children. Both histories only keep
+          the most recent <historyDepth> values, which defaults to the
+          single value the transforms read.
         - self.deltaFloat, the absolute floating delta value. This
           value is what edge and self transforms modify, and, as it
           does not modify the Vertex's data until explicitly applied,
@@ -94,6 +440,8 @@ class Vertex:
         - set_per_delta_prev
         - get_delta_float
         - set_delta_float
+        - get_history_depth
+        - set_history_depth
         - get_parent_vertices
         - check_parent
         - add_parent
@@ -108,6 +456,11 @@ class Vertex:
         - gp_transform
     """
 
+    __slots__ = ("name", "data", "_parents", "_children", "_deltaPrevAbs",
+                 "_deltaPrevPer", "deltaFloat", "_deltaInherent",
+                 "_percentFlag", "_randomDeltaFlag", "_randomValFlag",
+                 "_randomInfo")
+
     transformKeyMap = {"aa_lin": 0, "aa_exp": 1, "aa_poly": 2, "ap_lin": 3,
                        "ap_exp": 4, "ap_poly": 5, "pa_lin": 6, "pa_exp": 7,
                        "pa_poly": 8, "pp_lin": 9, "pp_exp": 10, "pp_poly": 11}
@@ -127,6 +480,9 @@ class Vertex:
             required.
             - data, the data for the method with which to instantiate
             the Vertex; it defaults to None.
+            - historyDepth, an optional keyword argument, the number of
+            previous deltas to keep; it defaults to 1. When the Vertex
+            is added to a DiGraph, the DiGraph's depth is used instead.
         """
 
         if data is not None and not isinstance(data, (int, float)):
@@ -135,8 +491,9 @@ class Vertex:
         self.name = str(name)
         self.data = data
         self._parents = {}
-        self._deltaPrevAbs = [0]
-        self._deltaPrevPer = [0]
+        self._children = {}
+        self._deltaPrevAbs = DeltaHistory(kwargs.get("historyDepth", 1))
+        self._deltaPrevPer = DeltaHistory(kwargs.get("historyDepth", 1))
         self.deltaFloat = 0
 
         if kwargs is not None:
@@ -172,11 +529,37 @@ class Vertex:
 
     def __contains__(self, item):
         """Checks if the Vertex is linked by any edge to <item>."""
-        if item in self._parents:
+        if item in self._parents or item in self._children:
             return True
         else:
             return False
 
+    def __getstate__(self):
+        """Returns the state of the Vertex, without its <_children>.
+
+        The <_children> dictionaries are rebuilt from the <_parents>
+        dictionaries by __setstate__, so that each edge is pickled only
+        once. Pickling or copying a Vertex still recurses through its
+        <_parents>, one Vertex at a time, so that a long chain of
+        parents can exceed the recursion limit; large graphs are better
+        saved as model files, or compiled, whose arrays are flat.
+        """
+
+        return {slot: getattr(self, slot) for slot in self.__slots__
+                if slot != "_children"}
+
+    def __setstate__(self, state):
+        """Restores the Vertex, and re-registers it with its parents."""
+
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        if not hasattr(self, "_children"):
+            self._children = {}
+        for pVertex, edge in self._parents.items():
+            if not hasattr(pVertex, "_children"):
+                pVertex._children = {}
+            pVertex._children[self] = edge
+
     def apply_delta_inherent(self):
         """Placeholder."""
         if self._percentFlag:
@@ -199,8 +582,8 @@ class Vertex:
 
         if not self._randomValFlag:
             newData = self.data + self.deltaFloat
-            self._deltaPrevAbs.insert(0, self.deltaFloat)
-            self._deltaPrevPer.insert(0, (((newData / self.data) - 1) * 100))
+            self._deltaPrevAbs.push(self.deltaFloat)
+            self._deltaPrevPer.push(((newData / self.data) - 1) * 100)
             self.data += self.deltaFloat
             self.deltaFloat = 0
         else:
@@ -208,53 +591,103 @@ class Vertex:
             b = self._randomInfo[1]
             newData = random.uniform(a, b)
             delta = self.data - newData
-            self._deltaPrevAbs.insert(0, delta)
-            self._deltaPrevPer.insert(0, (((delta / self.data) - 1) * 100))
+            self._deltaPrevAbs.push(delta)
+            self._deltaPrevPer.push(((delta / self.data) - 1) * 100)
             self.deltaFloat = 0
             self.data = newData
 
-    def add_edge(self, pVertex, tName, tParameters):
-        """Adds a directed edge between the Vertex and <cVertex>.
+    def get_abs_delta_prev(self, index=0):
+        """Returns the absolute delta from <index> steps ago.
+
+        Index 0, the default, is the latest delta. An IndexError is
+        raised if the delta is older than the history depth.
+        """
+        return self._deltaPrevAbs[index]
+
+    def set_abs_delta_prev(self, newDelta):
+        """Replaces the latest absolute delta with <newDelta>."""
+
+        if not isinstance(newDelta, (int, float)):
+            raise DataError(1)
+        self._deltaPrevAbs.set_latest(newDelta)
 
-        The method serves primarily as a wrapper for the add_parent and
-        add_child methods of the Vertex class, using them for the
-        actual creation of the edge. It does, however, perform the
-        transform lookup, pulling the integer transform key, used
-        for cleaner transform selection statements, from the
-        TransformKeyMap dictionary.
+    def get_per_delta_prev(self, index=0):
+        """Returns the percent delta from <index> steps ago.
+
+        Index 0, the default, is the latest delta. An IndexError is
+        raised if the delta is older than the history depth.
+        """
+        return self._deltaPrevPer[index]
+
+    def set_per_delta_prev(self, newDelta):
+        """Replaces the latest percent delta with <newDelta>."""
+
+        if not isinstance(newDelta, (int, float)):
+            raise DataError(4)
+        self._deltaPrevPer.set_latest(newDelta)
+
+    def get_history_depth(self):
+        """Returns the number of previous deltas the Vertex keeps."""
+        return self._deltaPrevAbs.get_depth()
+
+    def set_history_depth(self, depth):
+        """Sets the number of previous deltas the Vertex keeps.
+
+        The most recent deltas are kept when the depth is reduced.
+        A DataError is raised if <depth> is not a positive integer.
+        """
+
+        self._deltaPrevAbs.set_depth(depth)
+        self._deltaPrevPer.set_depth(depth)
+
+    def add_edge(self, pVertex, tName, tParameters):
+        """Adds a directed edge between <pVertex> and the Vertex.
+
+        The method performs the transform lookup, pulling the integer
+        transform key from the TransformKeyMap dictionary, and creates
+        an Edge record of the subclass for that transform, through
+        Edge.create, with <tParameters> validated and stored as floats
+        once, here, so that the transform method doesn't have to
+        select a transform or unpack its parameters on every step.
+        The Edge is stored both in the Vertex's <_parents> dictionary
+        and in the <_children> dictionary of <pVertex>, replacing any
+        existing edge between the two.
 
         Method Parameters:
-            - cVertex, the 'child' vertex of the edge.
+            - pVertex, the 'parent' vertex of the edge.
             - tName, the name of the transform that the edge
               represents.
             - tParameters, the list of parameters for the transform
-              function.
+              function. They are validated here, and a ParameterError
+              is raised if they are invalid.
         """
 
         try:
             tKey = self.transformKeyMap[str(tName.lower())]
         except KeyError:
             raise EdgeError(0)
-        tData = [tKey]
-        tData.extend(tParameters)
-        tDataTuple = tuple(tData)
-        self._parents[pVertex] = tDataTuple
-
+        if not isinstance(pVertex, Vertex):
+            raise EdgeError(6)
+        edge = Edge.create(tKey, tParameters)
+        self._parents[pVertex] = edge
+        pVertex._children[self] = edge
 
     def remove_edge(self, pVertex):
-        """Removes a directed edge between the Vertex and <cVertex>.
+        """Removes a directed edge between <pVertex> and the Vertex.
 
-        The method function as a wrapper function for the remove_child
-        and remove_parent methods of the Vertex.
+        The Edge is removed from both the Vertex's <_parents>
+        dictionary and the <_children> dictionary of <pVertex>. An
+        EdgeError is raised if <pVertex> is not a parent of the Vertex.
 
         Method Parameters:
-            - cVertex, the 'child' vertex of the edge to be removed.
+            - pVertex, the 'parent' vertex of the edge to be removed.
         """
 
         try:
             del self._parents[pVertex]
-        except AttributeError:
-            raise EdgeError(3)
+        except KeyError:
+            raise EdgeError(2)
+        del pVertex._children[self]
 
     def transform(self):
         """Calculates 'deltaFloat' based on a greedy-child paradigm.
@@ -263,44 +696,34 @@ class Vertex:
         calculated by pulling relevant data from the parent nodes.
         """
 
-        for pVertex in self._parents:
-            tData = self._parents[pVertex]
-            tKey = tData[0]
-            tData = tData[1:]
-            if tKey >= 0 and tKey <= 5:
-                pDelta = pVertex._deltaPrevAbs[0]
-            elif tKey >= 6 and tKey <= 11:
-                pDelta = pVertex._deltaPrevAbs[0]
-            if tKey == 0:
-                nDelta = transforms.AA_linear(pDelta, tData)
-            elif tKey == 1:
-                nDelta = transforms.AA_exponential(pDelta, tData)
-            elif tKey == 2:
-                nDelta = transforms.AA_polynomial(pDelta, tData)
-            elif tKey == 3:
-                nDelta = transforms.AP_linear(pDelta, tData)
-            elif tKey == 4:
-                nDelta = transforms.AP_exponential(pDelta, tData)
-            elif tKey == 5:
-                nDelta = transforms.AP_polynomial(pDelta, tData)
-            elif tKey == 6:
-                nDelta = transforms.PA_linear(pDelta, tData)
-            elif tKey == 7:
-                nDelta = transforms.PA_exponential(pDelta, tData)
-            elif tKey == 8:
-                nDelta = transforms.PA_polynomial(pDelta, tData)
-            elif tKey == 9:
-                nDelta = transforms.PP_linear(pDelta, tData)
-            elif tKey == 10:
-                nDelta = transforms.PP_exponential(pDelta, tData)
-            elif tKey == 11:
-                nDelta = transforms.PP_polynomial(pDelta, tData)
-            if tKey in (0, 1, 2, 6, 7, 8):
-                # Applies absolute changes
-                self.deltaFloat += nDelta
-            elif tKey in (3, 4, 5, 9, 10, 11):
-                # Applies percentage changes
-                self.deltaFloat += nDelta * self.data
+        for pVertex, edge in self._parents.items():
+            self.deltaFloat += edge.contribution(pVertex._deltaPrevAbs.latest,
+                                                 self.data)
+
+    def gp_transform(self, children=None):
+        """Adds to 'deltaFloat' of the children, as a generous parent.
+
+        When using the generous-parent transform paradigm, each Vertex
+        pushes the contribution of its latest absolute delta to the
+        'deltaFloat' of every child, through the <_children> dictionary.
+        Calling gp_transform on every parent of the vertices of a
+        DiGraph, limited to the children in the DiGraph, gives the same
+        deltas as calling transform on every Vertex, except that the
+        contributions to each child may be summed in a different order.
+
+        Method Parameters:
+            - children, the collection of the children to push to; it
+              defaults to None, for every child.
+        """
+
+        value = self._deltaPrevAbs.latest
+        if children is None:
+            for cVertex, edge in self._children.items():
+                cVertex.deltaFloat += edge.contribution(value, cVertex.data)
+            return
+        for cVertex, edge in self._children.items():
+            if cVertex in children:
+                cVertex.deltaFloat += edge.contribution(value, cVertex.data)
 
 
 class DiGraph:
@@ -318,16 +741,38 @@ class DiGraph:
           DiGraph, indexed by the name of the Vertex. They take their
           initial value, if any, from the <*vertices> argument of the
           __init__ method.
+        - _historyDepth, the number of previous deltas kept by each
+          Vertex of the DiGraph. It takes its value from the
+          <historyDepth> keyword argument of the __init__ method, and
+          is applied to every Vertex added to the DiGraph.
+        - _ids, a dictionary of the number of keys each Vertex is
+          stored under, indexed by the id of the Vertex. It is
+          maintained alongside _vertices, so that checking whether a
+          Vertex object is in the DiGraph takes constant time instead
+          of a scan of _vertices; a Vertex stored under several keys
+          remains in the DiGraph until the last of them is removed.
+        - _positions, a dictionary of the position of each Vertex in
+          the iteration order of the DiGraph, indexed by the id of the
+          Vertex. It is built on demand by get_index, kept up to date
+          as vertices are appended, and discarded whenever a Vertex is
+          removed or replaced.
 
     Public Methods:
         - get_all_vertices
         - get_vertex
         - add_vertex
         - add_existing_vertex
+        - get_index
         - apply_floating_deltas
+        - get_history_depth
+        - set_history_depth
+        - compile
+        - long_run_multiplier
+        - save
+        - load
     """
 
-    def __init__(self, *vertices):
+    def __init__(self, *vertices, historyDepth=1):
         """Initializes class data for the DiGraph.
 
         When the DiGraph is instantiated, it defaults to an empty state.
@@ -341,18 +786,71 @@ class DiGraph:
         Method Parameters:
             - *vertices, the list of optional arguments--presumed to be
               vertices to be included in the DiGraph at instantiation.
+            - historyDepth, the number of previous deltas each Vertex
+              keeps; it defaults to 1, the single value read by the
+              transforms.
         """
 
+        if not isinstance(historyDepth, int) or historyDepth < 1:
+            raise DataError(3)
         self._vertices = {}
+        self._ids = {}
+        self._positions = None
+        self._historyDepth = historyDepth
         if len(vertices) != 0:
             try:
                 for vertex in vertices:
                     vName = vertex.name
-                    self._vertices[vName] = vertex
+                    vertex.set_history_depth(historyDepth)
+                    self._insert(vName, vertex)
             except AttributeError:
                 del self
                 raise InitError(1)
 
+    def _insert(self, key, vertex):
+        """Stores <vertex> under <key>, keeping the indices current.
+
+        The positions are discarded, to be rebuilt on demand, when a
+        Vertex is replaced, or stored under a second key, since it then
+        appears twice in the iteration order.
+        """
+
+        oldVertex = self._vertices.get(key)
+        if oldVertex is not None:
+            self._forget(oldVertex)
+            self._positions = None
+        elif id(vertex) in self._ids:
+            self._positions = None
+        elif self._positions is not None:
+            self._positions[id(vertex)] = len(self._vertices)
+        self._vertices[key] = vertex
+        self._ids[id(vertex)] = self._ids.get(id(vertex), 0) + 1
+
+    def _forget(self, vertex):
+        """Drops one key of <vertex> from _ids, and its id with the last."""
+
+        count = self._ids[id(vertex)] - 1
+        if count:
+            self._ids[id(vertex)] = count
+        else:
+            del self._ids[id(vertex)]
+
+    def __getstate__(self):
+        """Returns the state of the DiGraph, without its id indices."""
+
+        state = self.__dict__.copy()
+        del state["_ids"]
+        state["_positions"] = None
+        return state
+
+    def __setstate__(self, state):
+        """Restores the DiGraph, re-indexing the ids of its vertices."""
+
+        self.__dict__.update(state)
+        self._ids = {}
+        for vertex in self._vertices.values():
+            self._ids[id(vertex)] = self._ids.get(id(vertex), 0) + 1
+
     def __str__(self):
         """Returns a string describing the DiGraph."""
         vList = []
@@ -374,12 +872,9 @@ class DiGraph:
             or a string corresponding to a Vertex's name.
         """
 
-        if isinstance(aVertex, str) and aVertex in self._vertices.keys():
-            return True
-        elif aVertex in self._vertices.values():
-            return True
-        else:
-            return False
+        if isinstance(aVertex, str):
+            return aVertex in self._vertices
+        return id(aVertex) in self._ids
 
     def __len__(self):
         """Returns the number of _vertices in the DiGraph."""
@@ -399,11 +894,12 @@ class DiGraph:
         as equal to anything other than another graph.
         """
 
+        if not isinstance(other, DiGraph) or len(self) != len(other):
+            return False
         for vert in self:
-            if vert not in other:
+            if id(vert) not in other._ids:
                 return False
-        if len(self) == len(other):
-            return True
+        return True
 
     def __add__(self, vertex):
         """Adds a vertex to the DiGraph.
@@ -414,7 +910,8 @@ class DiGraph:
 
         if isinstance(vertex, Vertex):
             vName = vertex.name
-            self._vertices[vName] = vertex
+            vertex.set_history_depth(self._historyDepth)
+            self._insert(vName, vertex)
 
     def __getitem__(self, key):
         """Retrieves a vertex from the graph, using its name as a key.
@@ -430,7 +927,8 @@ class DiGraph:
     def __setitem__(self, key, vertex):
         """Adds a vertex to the graph, indexed by <key>."""
 
-        self._vertices[key] = vertex
+        vertex.set_history_depth(self._historyDepth)
+        self._insert(key, vertex)
 
     def __delitem__(self, key):
         """Removes the vertex indexed by <key> from the DiGraph.
@@ -439,7 +937,37 @@ class DiGraph:
         then a KeyError is raised.
         """
 
-        del self._vertices[key]
+        vertex = self._vertices.pop(key)
+        self._forget(vertex)
+        self._positions = None
+
+    def get_index(self, aVertex):
+        """Returns the position of <aVertex> in the DiGraph.
+
+        The position is the index of the Vertex in the iteration order
+        of the DiGraph, which is the order of the rows and columns used
+        by the compiled module and by the data log. The positions of all
+        vertices are computed together the first time they are needed,
+        so that resolving vertices to positions while building large
+        graphs takes constant time per Vertex.
+
+        Method Parameters:
+            - aVertex, a reference to an instance of the Vertex class,
+              or a string corresponding to a Vertex's key.
+        """
+
+        if isinstance(aVertex, str):
+            try:
+                aVertex = self._vertices[aVertex]
+            except KeyError:
+                raise RetrievalError(1)
+        if self._positions is None:
+            self._positions = {id(vertex): i
+                               for i, vertex in enumerate(self)}
+        try:
+            return self._positions[id(aVertex)]
+        except KeyError:
+            raise RetrievalError(2)
 
     def add_edge(self, pVertex, cVertex, tName, tParameters):
         """Adds a directed edge to the DiGraph.
@@ -482,6 +1010,26 @@ class DiGraph:
         except AttributeError:
             raise EdgeError(4)
 
+    def get_history_depth(self):
+        """Returns the number of previous deltas each Vertex keeps."""
+        return self._historyDepth
+
+    def set_history_depth(self, depth):
+        """Sets the number of previous deltas each Vertex keeps.
+
+        The depth is applied to every Vertex currently in the DiGraph,
+        and to every Vertex added afterwards.
+
+        Method Parameters:
+            - depth, the new history depth, a positive integer.
+        """
+
+        if not isinstance(depth, int) or depth < 1:
+            raise DataError(3)
+        for vert in self:
+            vert.set_history_depth(depth)
+        self._historyDepth = depth
+
     def apply_floating_deltas(self):
         for vert in self:
             vert.apply_delta_float()
@@ -490,6 +1038,136 @@ class DiGraph:
         for vert in self:
             vert.apply_delta_inherent()
 
+    def compile(self, sparseFlag=True):
+        """Returns an array-backed CompiledGraph of the DiGraph.
+
+        The CompiledGraph is a frozen snapshot of the structure and the
+        state of the DiGraph; it can be passed to the functions of the
+        deltacalc module in place of the DiGraph, and steps all edges
+        of each transform family in a single vectorized pass. See the
+        compiled module for details.
+
+        Method Parameters:
+            - sparseFlag, whether to step all-linear graphs with a
+              sparse transition matrix; it defaults to True.
+        """
+
+        from DismalSim.deltagraph import compiled
+        return compiled.CompiledGraph(self, sparseFlag)
+
+    def save(self, filename, binaryFlag=False):
+        """Saves the DiGraph to a model file.
+
+        The model file holds the vertices, with their data, inherent
+        deltas, flags and latest deltas, and the edges of the DiGraph,
+        and can be read back with DiGraph.load. By default, it is a
+        human-readable JSON file, with the '.json' extension added to
+        <filename>; with <binaryFlag> set to True, it is a compact NumPy
+        .npz archive of packed arrays instead. See the modelfile module
+        for details.
+
+        Method Parameters:
+            - filename, the name of the file, without extension.
+            - binaryFlag, whether to write the binary format.
+
+        Returns the name of the file written, including its extension.
+        """
+
+        from DismalSim.deltagraph import modelfile
+        return modelfile.save_graph(self, filename, binaryFlag)
+
+    @staticmethod
+    def load(filename, compiledFlag=False, sparseFlag=True):
+        """Returns the DiGraph saved in the model file <filename>.
+
+        The format is chosen by the extension of <filename>, '.json' or
+        '.npz', and the vertices and edges are constructed in bulk. An
+        InitError is raised if the file is not a DismalSim model file.
+
+        Building a DiGraph still creates a Vertex and an Edge object for
+        every vertex and edge, so that loading a model of a million
+        edges takes several seconds, even from a binary file. A model
+        that is only to be simulated should be loaded with
+        <compiledFlag> set to True instead: a binary model file is then
+        read straight into the arrays of a CompiledGraph, without
+        creating any of these objects, in well under a second for the
+        same million edges.
+
+        Method Parameters:
+            - filename, the name of the file, including its extension.
+            - compiledFlag, whether to return a compiled.CompiledGraph
+              instead of a DiGraph; it defaults to False.
+            - sparseFlag, passed on to the CompiledGraph constructor
+              when <compiledFlag> is set; it defaults to True.
+        """
+
+        from DismalSim.deltagraph import modelfile
+        return modelfile.load_graph(filename, compiledFlag, sparseFlag)
+
+    def long_run_multiplier(self, shockDict):
+        """Returns the long-run effect of a shock on every Vertex.
+
+        In a DiGraph whose edges are all 'aa_lin' or 'pa_lin' edges,
+        the deltas of a step are A @ prevDelta plus constants, where A
+        holds the gradient of each edge. The total change in the data
+        of the vertices caused by a one-time delta b, summed over all
+        subsequent steps, is then the solution x of (I - A) x = b,
+        which is also the steady delta per step reached under a delta
+        b added at every step. The method solves this system directly,
+        by sparse LU factorization, instead of stepping the DiGraph
+        until the deltas die out; intercepts and inherent deltas do
+        not affect it.
+
+        The solution is only the limit of the simulation if the
+        spectral radius of A is below 1. Otherwise the simulation
+        diverges, and a RuntimeWarning is issued. An EdgeError is
+        raised if the DiGraph has any other kind of edge, and a
+        DataError if I - A is singular.
+
+        Method Parameters:
+            - shockDict, the dictionary of deltas b, indexed by the key
+              of each Vertex in the DiGraph.
+
+        Returns a dictionary of the multipliers x, indexed by Vertex
+        name.
+        """
+
+        from DismalSim.deltagraph import sparsemat
+        nVertices = len(self)
+        rows = []
+        cols = []
+        values = []
+        for i, vertex in enumerate(self):
+            for pVertex, edge in vertex._parents.items():
+                if edge.tKey not in (0, 6):
+                    raise EdgeError(7)
+                rows.append(i)
+                cols.append(self.get_index(pVertex))
+                values.append(edge.gradient)
+        rhs = [0.0] * nVertices
+        for key, delta in shockDict.items():
+            rhs[self.get_index(key)] = delta
+
+        radius = sparsemat.spectral_radius(values, rows, cols,
+                                           (nVertices, nVertices))
+        if radius >= 1:
+            warnings.warn("The spectral radius of the DiGraph's transition"
+                          " matrix is {0:.6g}; the simulation diverges, and"
+                          " the long-run multipliers are not its limit."
+                          .format(radius), RuntimeWarning, stacklevel=2)
+        diagonal = list(range(nVertices))
+        try:
+            solution = sparsemat.solve([1.0] * nVertices
+                                       + [-value for value in values],
+                                       diagonal + rows, diagonal + cols,
+                                       (nVertices, nVertices), rhs)
+        except ValueError:
+            raise DataError(5)
+        solution = solution.tolist()
+        if not all(math.isfinite(value) for value in solution):
+            raise DataError(5)
+        return {vertex.name: value for vertex, value in zip(self, solution)}
+
 
 class GraphError(Exception):
     """Base class for exceptions defined by this module.
@@ -533,7 +1211,17 @@ class InitError(GraphError):
                 " Unable to initialize Vertex.",
                 1: "Invalid argument for DiGraph constructor arguments. All"
                    " arguments must be instances of the Vertex class. Unable to"
-                   " initialize DiGraph."}
+                   " initialize DiGraph.",
+                2: "The file is not a DismalSim model file, or is of an"
+                   " unsupported version. Unable to load DiGraph.",
+                3: "The directory does not hold a DismalSim checkpoint, or"
+                   " holds one of an unsupported version. Unable to resume"
+                   " simulation.",
+                4: "The checkpoint was not taken from a simulation of this"
+                   " graph. Unable to resume simulation.",
+                5: "The checkpoint was taken from a simulation with"
+                   " exogenous deltas, which must be passed again. Unable to"
+                   " resume simulation."}
 
 
 class EdgeError(GraphError):
@@ -561,7 +1249,14 @@ class EdgeError(GraphError):
                    " 'child'",
                 4: "object passed in as <pVertex> argument is not an instance"
                    " of the Vertex class. Unable to remove edges from fake"
-                   " _vertices."}
+                   " _vertices.",
+                5: "The 'parent' Vertex of an edge is not present in the"
+                   " DiGraph. Unable to compile the DiGraph.",
+                6: "Object passed in as <pVertex> argument invalid. Object"
+                   " must be an instance of Vertex class. Unable to create"
+                   " edge.",
+                7: "The DiGraph has an edge that is neither an 'aa_lin' nor"
+                   " a 'pa_lin' edge. Unable to build its linear system."}
 
 
 class DataError(GraphError):
@@ -579,7 +1274,15 @@ class DataError(GraphError):
                 1: "Invalid value for Vertex '_deltaPrevAbs' attribute, unable"
                    " to set '_deltaPrevAbs' to <newDelta>",
                 2: "Invalid value for Vertex 'deltaFloat' attribute, unable to"
-                   " set 'deltaFloat' to <newDelta>"}
+                   " set 'deltaFloat' to <newDelta>",
+                3: "Invalid history depth. The depth must be a positive"
+                   " integer. Unable to resize the delta history.",
+                4: "Invalid value for Vertex '_deltaPrevPer' attribute, unable"
+                   " to set '_deltaPrevPer' to <newDelta>",
+                5: "The linear system of the DiGraph is singular. Unable to"
+                   " compute its long-run multipliers.",
+                6: "Invalid checkpoint interval. The interval must be a"
+                   " positive integer. Unable to checkpoint simulation."}
 
 
 class RetrievalError(GraphError):
@@ -596,7 +1299,9 @@ class RetrievalError(GraphError):
     messages = {0: "Vertex data is None. Conventional operations on this data"
                    " are not recommended.",
                 1: "Vertex name not present in DiGraph '_vertices' dictionary."
-                   " Unable to retrieve vertex."}
+                   " Unable to retrieve vertex.",
+                2: "Vertex not present in DiGraph. Unable to retrieve its"
+                   " position."}
 
 
 def main():
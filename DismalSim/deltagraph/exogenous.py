@@ -0,0 +1,333 @@
+"""Streaming sources of exogenous deltas for simulations.
+
+An exogenous source is the input counterpart of the output sinks of the
+output module: it supplies the deltas of chosen vertices one step at a
+time, as a simulation progresses, reading them from an iterator, an
+array or a file only as they are needed, so that the memory used stays
+flat regardless of the length of the series. Sources are attached to a
+run through the <exoDeltas> argument of deltacalc.gc_exovert_delta,
+which opens and closes them.
+
+Every row of a source holds the deltas of a single step, for the
+vertices named when it is opened. A missing value--None, an empty
+string or nan--leaves its vertex to the graph for that step.
+
+Functions:
+    - open_source
+
+Classes:
+    - ExoSource
+    - ColumnSource
+    - RowSource
+    - CSVSource
+    - SpreadsheetSource
+"""
+
+import abc
+import collections.abc
+import csv
+import math
+import os
+import tempfile
+
+import numpy as np
+from openpyxl import load_workbook
+
+from DismalSim.deltagraph import digraph
+from DismalSim.deltagraph import output
+
+
+def _delta(value):
+    """Returns <value> as a float delta, or None if it is missing."""
+
+    if value is None or value == "":
+        return None
+    try:
+        delta = float(value)
+    except (TypeError, ValueError):
+        raise digraph.DataError(2)
+    if math.isnan(delta):
+        return None
+    return delta
+
+
+class ExoSource(abc.ABC):
+    """Abstract base class for the exogenous sources of this module.
+
+    The ExoSource base class defines the interface shared by all
+    sources; it is intended only to be subclassed. Sources may also be
+    used as context managers, in which case they are closed on exit.
+
+    Public Methods:
+        - open
+        - read_row
+        - close
+    """
+
+    @abc.abstractmethod
+    def open(self):
+        """Prepares the source for reading, and returns the vertex names.
+
+        The names are those of the vertices whose deltas the source
+        supplies, in the order of the values of its rows.
+        """
+
+    @abc.abstractmethod
+    def read_row(self):
+        """Returns the deltas of the next step, or None past the last.
+
+        The deltas are returned as a dictionary indexed by vertex name,
+        holding only the values that are not missing.
+        """
+
+    @abc.abstractmethod
+    def close(self):
+        """Finishes reading, and releases any open files."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _row(self, columns, values):
+        """Returns the dictionary of the values that are not missing.
+
+        Method Parameters:
+            - columns, the sequence of (position, vertex name) pairs of
+              the columns to read.
+            - values, the sequence of values of the row; positions past
+              its end are missing.
+        """
+
+        row = {}
+        for position, name in columns:
+            if position < len(values):
+                delta = _delta(values[position])
+                if delta is not None:
+                    row[name] = delta
+        return row
+
+    def _columns(self, header):
+        """Returns the (position, name) pairs of the named header cells.
+
+        Cells left blank, as None or an empty string, name no vertex;
+        their columns are skipped, without shifting the others.
+        """
+        return [(i, name) for i, name in enumerate(header)
+                if name is not None and name != ""]
+
+
+class ColumnSource(ExoSource):
+    """Reads the series of each vertex from an iterable of its own.
+
+    The columns may be lists, one-dimensional arrays, generators or any
+    other iterables; a single value is drawn from each per step. A
+    column that runs out leaves its vertex to the graph from then on,
+    and the source ends when every column has run out.
+
+    Class Data:
+        - self.columns, the dictionary of iterables, indexed by vertex
+          name.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._iterators = None
+
+    def open(self):
+        self._iterators = {name: iter(column)
+                           for name, column in self.columns.items()}
+        return list(self.columns)
+
+    def read_row(self):
+        row = {}
+        for name in list(self._iterators):
+            try:
+                delta = _delta(next(self._iterators[name]))
+            except StopIteration:
+                del self._iterators[name]
+                continue
+            if delta is not None:
+                row[name] = delta
+        if not self._iterators:
+            return None
+        return row
+
+    def close(self):
+        self._iterators = None
+
+
+class RowSource(ExoSource):
+    """Reads the deltas of every step from an iterable of rows.
+
+    The rows may be sequences, or the rows of a two-dimensional array,
+    including a memory-mapped one, such as returned by numpy.load with
+    <mmap_mode>, whose rows are then only read from disk as they are
+    needed.
+
+    Class Data:
+        - self.names, the sequence of vertex names of the columns.
+        - self.rows, the iterable of rows.
+    """
+
+    def __init__(self, names, rows):
+        self.names = list(names)
+        self.rows = rows
+        self._iterator = None
+        self._header = list(enumerate(self.names))
+
+    def open(self):
+        self._iterator = iter(self.rows)
+        return self.names
+
+    def read_row(self):
+        values = next(self._iterator, None)
+        if values is None:
+            return None
+        return self._row(self._header, values)
+
+    def close(self):
+        self._iterator = None
+
+
+class CSVSource(ExoSource):
+    """Reads rows lazily from a comma-separated values file.
+
+    The file is laid out like those of output.CSVSink: a header row of
+    vertex names, followed by one row of deltas per step. Columns with
+    a blank header cell are skipped.
+
+    Class Data:
+        - self.filename, the name of the file, including its extension.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = None
+        self._reader = None
+        self._header = None
+
+    def open(self):
+        self._file = open(self.filename, newline="")
+        self._reader = csv.reader(self._file)
+        self._header = self._columns(next(self._reader, []))
+        return [name for _, name in self._header]
+
+    def read_row(self):
+        values = next(self._reader, None)
+        if values is None:
+            return None
+        return self._row(self._header, values)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._reader = None
+
+
+class SpreadsheetSource(ExoSource):
+    """Reads rows lazily from an .xlsx spreadsheet, in read-only mode.
+
+    In read-only mode, openpyxl parses the rows of the worksheet as
+    they are iterated over, instead of loading every cell of the
+    workbook into memory. The worksheet is laid out like those of
+    output.SpreadsheetSink; columns with a blank header cell are
+    skipped.
+
+    Class Data:
+        - self.filename, the name of the spreadsheet, including its
+          extension.
+        - self.sheetName, the name of the worksheet to read, or None
+          for the active worksheet.
+    """
+
+    def __init__(self, filename, sheetName=None):
+        self.filename = filename
+        self.sheetName = sheetName
+        self._book = None
+        self._rows = None
+        self._header = None
+
+    def open(self):
+        self._book = load_workbook(self.filename, read_only=True,
+                                   data_only=True)
+        if self.sheetName is None:
+            sheet = self._book.active
+        else:
+            sheet = self._book[self.sheetName]
+        self._rows = sheet.iter_rows(values_only=True)
+        self._header = self._columns(next(self._rows, ()))
+        return [name for _, name in self._header]
+
+    def read_row(self):
+        values = next(self._rows, None)
+        if values is None:
+            return None
+        return self._row(self._header, values)
+
+    def close(self):
+        if self._book is not None:
+            self._book.close()
+            self._book = None
+            self._rows = None
+
+
+def open_source(exoDeltas):
+    """Returns the ExoSource of <exoDeltas>.
+
+    Function Arguments:
+        - exoDeltas, an ExoSource, which is returned as is; the name of
+          a '.csv' or '.xlsx' file, read by a CSVSource or a
+          SpreadsheetSource; or a dictionary of iterables, indexed by
+          vertex name, read by a ColumnSource. A ValueError is raised
+          for a file of any other extension.
+    """
+
+    if isinstance(exoDeltas, ExoSource):
+        return exoDeltas
+    if isinstance(exoDeltas, (str, os.PathLike)):
+        extension = os.path.splitext(exoDeltas)[1].lower()
+        if extension == ".csv":
+            return CSVSource(exoDeltas)
+        if extension == ".xlsx":
+            return SpreadsheetSource(exoDeltas)
+        raise ValueError("Unsupported exogenous delta file: {0}".format(
+            exoDeltas))
+    if isinstance(exoDeltas, collections.abc.Mapping):
+        return ColumnSource(exoDeltas)
+    raise TypeError("Unsupported exogenous deltas: {0!r}".format(
+        type(exoDeltas)))
+
+
+def main():
+    """Test script for the sources of this module.
+
+    The script writes the same series to a CSV file and a spreadsheet,
+    through the sinks of the output module, and prints the rows read
+    back from each, and from a ColumnSource.
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        base = os.path.join(directory, "exo")
+        for sink in (output.CSVSink(base), output.SpreadsheetSink(base)):
+            with sink:
+                sink.open(["G", "M2"])
+                sink.write_row([1.5, 10])
+                sink.write_row([2.5, None])
+        for filename in (base + ".csv", base + ".xlsx"):
+            with open_source(filename) as source:
+                print(source.open())  # Should print ['G', 'M2']
+                print(source.read_row())  # Should print {'G': 1.5, 'M2': 10.0}
+                print(source.read_row())  # Should print {'G': 2.5}
+                print(source.read_row())  # Should print None
+    with open_source({"G": np.array([1.0, 2.0]), "M2": iter([5.0])}) as source:
+        source.open()
+        print(source.read_row())  # Should print {'G': 1.0, 'M2': 5.0}
+        print(source.read_row())  # Should print {'G': 2.0}
+        print(source.read_row())  # Should print None
+
+
+if __name__ == '__main__':
+    main()
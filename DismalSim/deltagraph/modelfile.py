@@ -0,0 +1,408 @@
+"""Model files for saving and loading DiGraphs.
+
+A model file holds the vertices of a DiGraph--their keys, names, data,
+inherent deltas, flags, random bounds and latest deltas--and its edges,
+as transform names and canonical parameters. Two formats are supported.
+The JSON format is human-readable, with one vertex or edge per line,
+and settings left at their defaults omitted; it can be written or
+edited by hand, and its edges are validated like those of add_edge.
+The binary format is a NumPy .npz archive of packed arrays, with the
+edges in the CSR-style layout of the compiled module; it is loaded
+without revalidating the parameters it was saved with.
+
+In both cases the vertices and edges are constructed in bulk, in one
+pass, without the keyword handling of the Vertex constructor or the
+name lookups of add_edge. Building millions of Vertex and Edge objects
+still takes seconds, however; when the model is only to be simulated,
+a binary model file can instead be loaded straight into a
+compiled.CompiledGraph, from its arrays, without creating any of them,
+in a fraction of a second even for millions of edges.
+
+Functions:
+    - save_graph
+    - load_graph
+"""
+
+import gc
+import json
+import os
+
+import numpy as np
+
+from DismalSim.deltagraph import compiled
+from DismalSim.deltagraph import digraph
+
+
+formatName = "DismalSim-DiGraph"
+formatVersion = 1
+
+_transformNames = {tKey: tName for tName, tKey
+                   in digraph.Vertex.transformKeyMap.items()}
+
+_vertexDefaults = (("deltaInherent", 0), ("percentFlag", False),
+                   ("randomDeltaFlag", False), ("randomValFlag", False),
+                   ("randomInfo", None), ("deltaPrevAbs", 0),
+                   ("deltaPrevPer", 0), ("deltaFloat", 0))
+
+
+def _vertex_record(key, vertex):
+    """Returns the JSON record of <vertex>, omitting default values."""
+
+    record = {"name": vertex.name, "data": vertex.data}
+    if key != vertex.name:
+        record["key"] = key
+    values = (vertex._deltaInherent, vertex._percentFlag,
+              vertex._randomDeltaFlag, vertex._randomValFlag,
+              vertex._randomInfo, vertex._deltaPrevAbs.latest,
+              vertex._deltaPrevPer.latest, vertex.deltaFloat)
+    for (field, default), value in zip(_vertexDefaults, values):
+        if value != default:
+            record[field] = list(value) if field == "randomInfo" else value
+    return record
+
+
+def _edge_list(aGraph):
+    """Returns the (parent, child, tKey, parameters) tuples of <aGraph>.
+
+    Parents and children are given by their position in <aGraph>; the
+    edges are ordered by child, and by parent insertion order within
+    each child.
+    """
+
+    edges = []
+    for i, vertex in enumerate(aGraph):
+        for pVertex, edge in vertex._parents.items():
+            edges.append((aGraph.get_index(pVertex), i, edge.tKey,
+                          edge.parameters))
+    return edges
+
+
+def save_graph(aGraph, filename, binaryFlag=False):
+    """Saves <aGraph> to a JSON or binary model file.
+
+    Function Arguments:
+        - aGraph
+        - filename, the name or path of the file, without extension;
+          '.json' or '.npz' is added.
+        - binaryFlag
+
+    Returns the name of the file written.
+    """
+
+    filename = os.fspath(filename)
+    keys = list(aGraph._vertices)
+    vertices = list(aGraph)
+    edges = _edge_list(aGraph)
+    if binaryFlag:
+        filename += ".npz"
+        _save_binary(aGraph, filename, keys, vertices, edges)
+        return filename
+    filename += ".json"
+    with open(filename, "w") as modelFile:
+        modelFile.write('{{"format": {0}, "version": {1}, "historyDepth": {2},'
+                        '\n "vertices": ['.format(json.dumps(formatName),
+                                                   formatVersion,
+                                                   aGraph.get_history_depth()))
+        separator = "\n  "
+        for key, vertex in zip(keys, vertices):
+            modelFile.write(separator)
+            modelFile.write(json.dumps(_vertex_record(key, vertex)))
+            separator = ",\n  "
+        modelFile.write('],\n "edges": [')
+        separator = "\n  "
+        for parent, child, tKey, parameters in edges:
+            modelFile.write(separator)
+            modelFile.write(json.dumps([keys[parent], keys[child],
+                                        _transformNames[tKey],
+                                        list(parameters)]))
+            separator = ",\n  "
+        modelFile.write("]}\n")
+    return filename
+
+
+def _save_binary(aGraph, filename, keys, vertices, edges):
+    """Writes the packed arrays of a binary model file."""
+
+    nVertices = len(vertices)
+    data = np.array([np.nan if vertex.data is None else vertex.data
+                     for vertex in vertices], dtype=np.float64)
+    randomInfo = [vertex._randomInfo for vertex in vertices]
+    paramPtr = [0]
+    paramData = []
+    for edge in edges:
+        paramData.extend(edge[3])
+        paramPtr.append(len(paramData))
+    edgeArray = np.array([edge[:3] for edge in edges],
+                         dtype=np.int64).reshape(len(edges), 3)
+    np.savez(
+        filename,
+        format=np.array(formatName), version=np.array(formatVersion),
+        historyDepth=np.array(aGraph.get_history_depth()),
+        keys=np.array(keys, dtype=str).reshape(nVertices),
+        names=np.array([vertex.name for vertex in vertices],
+                       dtype=str).reshape(nVertices),
+        data=data,
+        dataNone=np.array([vertex.data is None for vertex in vertices],
+                          dtype=bool),
+        deltaInherent=np.array([vertex._deltaInherent
+                                for vertex in vertices], dtype=np.float64),
+        percentFlag=np.array([vertex._percentFlag for vertex in vertices],
+                             dtype=bool),
+        randomDeltaFlag=np.array([vertex._randomDeltaFlag
+                                  for vertex in vertices], dtype=bool),
+        randomValFlag=np.array([vertex._randomValFlag
+                                for vertex in vertices], dtype=bool),
+        randomInfoFlag=np.array([info is not None for info in randomInfo],
+                                dtype=bool),
+        randomInfo=np.array([info if info is not None else (np.nan, np.nan)
+                             for info in randomInfo],
+                            dtype=np.float64).reshape(nVertices, 2),
+        deltaPrevAbs=np.array([vertex._deltaPrevAbs.latest
+                               for vertex in vertices], dtype=np.float64),
+        deltaPrevPer=np.array([vertex._deltaPrevPer.latest
+                               for vertex in vertices], dtype=np.float64),
+        deltaFloat=np.array([vertex.deltaFloat for vertex in vertices],
+                            dtype=np.float64),
+        edgeParent=edgeArray[:, 0], edgeChild=edgeArray[:, 1],
+        edgeKey=edgeArray[:, 2].astype(np.int8),
+        paramPtr=np.array(paramPtr, dtype=np.int64),
+        paramData=np.array(paramData, dtype=np.float64))
+
+
+def _new_vertex(name, data, historyDepth, deltaInherent, percentFlag,
+                randomDeltaFlag, randomValFlag, randomInfo, deltaPrevAbs,
+                deltaPrevPer, deltaFloat):
+    """Returns a Vertex with its slots set directly, without edges."""
+
+    vertex = digraph.Vertex.__new__(digraph.Vertex)
+    vertex.name = name
+    vertex.data = data
+    vertex._parents = {}
+    vertex._children = {}
+    vertex._deltaPrevAbs = digraph.DeltaHistory(historyDepth, deltaPrevAbs)
+    vertex._deltaPrevPer = digraph.DeltaHistory(historyDepth, deltaPrevPer)
+    vertex.deltaFloat = deltaFloat
+    vertex._deltaInherent = deltaInherent
+    vertex._percentFlag = percentFlag
+    vertex._randomDeltaFlag = randomDeltaFlag
+    vertex._randomValFlag = randomValFlag
+    vertex._randomInfo = randomInfo
+    return vertex
+
+
+def _new_graph(keys, vertices, historyDepth):
+    """Returns a DiGraph holding <vertices>, indexed by <keys>."""
+
+    aGraph = digraph.DiGraph(historyDepth=historyDepth)
+    for key, vertex in zip(keys, vertices):
+        aGraph._insert(key, vertex)
+    return aGraph
+
+
+def load_graph(filename, compiledFlag=False, sparseFlag=True):
+    """Returns the DiGraph saved in the model file <filename>.
+
+    An InitError is raised if the file is not a model file of a
+    supported version.
+
+    Function Arguments:
+        - filename, the name or path of the file, ending in '.json' or
+          '.npz'.
+        - compiledFlag, whether to return a compiled.CompiledGraph
+          instead. A binary model file is then loaded directly into
+          the arrays of the CompiledGraph, without building the
+          DiGraph, which is much faster; a JSON model file is loaded
+          as a DiGraph and compiled. A RetrievalError is raised if a
+          vertex has no data.
+        - sparseFlag, passed on to the CompiledGraph constructor.
+    """
+
+    filename = os.fspath(filename)
+    if filename.endswith(".npz"):
+        if compiledFlag:
+            return _compile_binary(filename, sparseFlag)
+        return _load_binary(filename)
+    if filename.endswith(".json"):
+        aGraph = _load_json(filename)
+        if compiledFlag:
+            return compiled.CompiledGraph(aGraph, sparseFlag)
+        return aGraph
+    raise digraph.InitError(2)
+
+
+def _load_json(filename):
+    """Loads a JSON model file, validating its edges."""
+
+    with open(filename) as modelFile:
+        model = json.load(modelFile)
+    if (not isinstance(model, dict) or model.get("format") != formatName
+            or model.get("version") != formatVersion):
+        raise digraph.InitError(2)
+    historyDepth = model.get("historyDepth", 1)
+    keys = []
+    vertices = []
+    for record in model["vertices"]:
+        name = str(record["name"])
+        data = record.get("data")
+        if data is not None and not isinstance(data, (int, float)):
+            raise digraph.InitError(0)
+        settings = [record.get(field, default)
+                    for field, default in _vertexDefaults]
+        if settings[4] is not None:
+            settings[4] = tuple(settings[4])
+        keys.append(record.get("key", name))
+        vertices.append(_new_vertex(name, data, historyDepth, *settings))
+    aGraph = _new_graph(keys, vertices, historyDepth)
+    for pKey, cKey, tName, parameters in model["edges"]:
+        aGraph[cKey].add_edge(aGraph[pKey], tName, parameters)
+    return aGraph
+
+
+def _read_binary(filename):
+    """Returns the dictionary of the arrays of a binary model file."""
+
+    with np.load(filename) as archive:
+        if ("format" not in archive.files
+                or str(archive["format"]) != formatName
+                or int(archive["version"]) != formatVersion):
+            raise digraph.InitError(2)
+        return {name: archive[name] for name in archive.files}
+
+
+def _compile_binary(filename, sparseFlag):
+    """Loads a binary model file into a CompiledGraph, from its arrays."""
+
+    arrays = _read_binary(filename)
+    if arrays["dataNone"].any():
+        raise digraph.RetrievalError(0)
+    edgeChild = arrays["edgeChild"]
+    if np.any(edgeChild[1:] < edgeChild[:-1]):
+        raise digraph.InitError(2)
+    arrays["randomLow"] = arrays["randomInfo"][:, 0]
+    arrays["randomHigh"] = arrays["randomInfo"][:, 1]
+    return compiled.CompiledGraph.from_arrays(arrays["names"].tolist(),
+                                              arrays, sparseFlag)
+
+
+def _load_binary(filename):
+    """Loads a binary model file, trusting its canonical parameters.
+
+    The cyclic garbage collector is paused while the graph is built,
+    since the millions of objects created by a large model would
+    otherwise trigger repeated full collections.
+    """
+
+    arrays = _read_binary(filename)
+    gcFlag = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_binary(arrays)
+    finally:
+        if gcFlag:
+            gc.enable()
+
+
+def _build_binary(arrays):
+    """Builds the DiGraph of the arrays of a binary model file."""
+
+    historyDepth = int(arrays["historyDepth"])
+    keys = arrays["keys"].tolist()
+    data = [None if none else value for value, none
+            in zip(arrays["data"].tolist(), arrays["dataNone"].tolist())]
+    randomInfo = [tuple(info) if flag else None for info, flag
+                  in zip(arrays["randomInfo"].tolist(),
+                         arrays["randomInfoFlag"].tolist())]
+    vertices = list(map(
+        _new_vertex, arrays["names"].tolist(), data,
+        [historyDepth] * len(keys), arrays["deltaInherent"].tolist(),
+        arrays["percentFlag"].tolist(), arrays["randomDeltaFlag"].tolist(),
+        arrays["randomValFlag"].tolist(), randomInfo,
+        arrays["deltaPrevAbs"].tolist(), arrays["deltaPrevPer"].tolist(),
+        arrays["deltaFloat"].tolist()))
+    aGraph = _new_graph(keys, vertices, historyDepth)
+
+    edgeKey = arrays["edgeKey"].astype(np.int64)
+    paramPtr = arrays["paramPtr"]
+    paramData = arrays["paramData"]
+    edges = [None] * len(edgeKey)
+    for tKey in np.unique(edgeKey).tolist():
+        positions = np.flatnonzero(edgeKey == tKey)
+        edgeClass = digraph.edgeClasses[tKey % 3][(tKey // 3) % 2]
+        if tKey % 3 == 2:
+            for e in positions.tolist():
+                edges[e] = edgeClass.from_canonical(
+                    tKey, paramData[paramPtr[e]:paramPtr[e + 1]].tolist())
+            continue
+        first = paramData[paramPtr[positions]].tolist()
+        second = paramData[paramPtr[positions] + 1].tolist()
+        new = edgeClass.__new__
+        for e, a, b in zip(positions.tolist(), first, second):
+            edge = new(edgeClass)
+            edge.tKey = tKey
+            if tKey % 3 == 0:
+                edge.gradient = a
+                edge.intercept = b
+            else:
+                edge.base = a
+                edge.constant = b
+            edges[e] = edge
+
+    edgeParent = arrays["edgeParent"]
+    edgeChild = arrays["edgeChild"]
+    _fill(vertices, "_parents", edgeChild, edgeParent, edges)
+    _fill(vertices, "_children", edgeParent, edgeChild, edges)
+    return aGraph
+
+
+def _fill(vertices, slot, owners, others, edges):
+    """Sets the edge dictionaries <slot> of <vertices> in bulk.
+
+    The edges are grouped by their owning vertex, keeping their order
+    within each group, and each dictionary is built in a single call.
+
+    Function Arguments:
+        - vertices
+        - slot, '_parents' or '_children'.
+        - owners, the array of indices of the vertex owning each edge.
+        - others, the array of indices of the vertex each edge links
+          its owner to, used as the dictionary keys.
+        - edges
+    """
+
+    order = np.argsort(owners, kind="stable")
+    linked = list(map(vertices.__getitem__, others[order].tolist()))
+    edges = list(map(edges.__getitem__, order.tolist()))
+    ptr = np.zeros(len(vertices) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners, minlength=len(vertices)), out=ptr[1:])
+    ptr = ptr.tolist()
+    for i in np.flatnonzero(np.diff(ptr)).tolist():
+        setattr(vertices[i], slot, dict(zip(linked[ptr[i]:ptr[i + 1]],
+                                            edges[ptr[i]:ptr[i + 1]])))
+
+
+def main():
+    """Test script for the model files of this module.
+
+    The script saves a small DiGraph in both formats, loads it back,
+    and prints the loaded graphs, and the data of the binary model file
+    loaded as a CompiledGraph.
+    """
+
+    aGraph = digraph.DiGraph()
+    aGraph + digraph.Vertex("A", 10)
+    aGraph + digraph.Vertex("B", 10, deltaInherent=1)
+    aGraph + digraph.Vertex("C", 10, randomDeltaFlag=True,
+                            randomInfo=(0, 1))
+    aGraph.add_edge("A", "B", "aa_lin", [2, 2])
+    aGraph.add_edge("B", "C", "pp_poly", [0.01, 2, 1])
+    aGraph.add_edge("C", "A", "aa_exp", [1.01])
+    for binaryFlag in (False, True):
+        loaded = digraph.DiGraph.load(aGraph.save("model_test", binaryFlag))
+        for vertex in loaded:
+            print(vertex)
+    aCompiled = load_graph("model_test.npz", compiledFlag=True)
+    print(aCompiled.get_data("B"))  # Should print 10.0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""Streaming output sinks for simulation results.
+
+An output sink receives the results of a simulation one row at a time,
+as the simulation progresses, and writes them straight to disk, so that
+the memory used stays flat regardless of the number of steps. The rows
+are laid out like the spreadsheets of deltacalc.output_spreadsheet: a
+header row of vertex names, followed by one row of vertex data per
+step. Sinks are attached to a run through the <sinks> argument of
+deltacalc.gc_multicount_delta, which opens and closes them.
+
+Classes:
+    - OutputSink
+    - SpreadsheetSink
+    - CSVSink
+    - NumpySink
+"""
+
+import abc
+import csv
+import os
+import struct
+import zipfile
+
+import numpy as np
+from openpyxl import Workbook
+
+
+class OutputSink(abc.ABC):
+    """Abstract base class for the output sinks of this module.
+
+    The OutputSink base class defines the interface shared by all
+    sinks; it is intended only to be subclassed. Sinks may also be used
+    as context managers, in which case they are closed on exit.
+
+    Public Methods:
+        - open
+        - write_row
+        - close
+    """
+
+    @abc.abstractmethod
+    def open(self, names):
+        """Prepares the sink for writing, and writes the header.
+
+        Method Parameters:
+            - names, the sequence of vertex names, in the order the
+              values of each row will be written in.
+        """
+
+    @abc.abstractmethod
+    def write_row(self, values):
+        """Writes the data of a single step.
+
+        Method Parameters:
+            - values, the sequence of vertex data, in the order of the
+              names passed to open.
+        """
+
+    @abc.abstractmethod
+    def close(self):
+        """Finishes writing, and releases any open files."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+class SpreadsheetSink(OutputSink):
+    """Writes rows to an .xlsx spreadsheet, in openpyxl write-only mode.
+
+    In write-only mode, openpyxl streams appended rows to a temporary
+    file instead of holding every cell of the workbook in memory.
+
+    Class Data:
+        - self.filename, the name of the spreadsheet, including the
+          '.xlsx' extension added to the <filename> argument.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename + ".xlsx"
+        self._book = None
+        self._sheet = None
+
+    def open(self, names):
+        self._book = Workbook(write_only=True)
+        self._sheet = self._book.create_sheet()
+        self._sheet.append(list(names))
+
+    def write_row(self, values):
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        self._sheet.append(values)
+
+    def close(self):
+        if self._book is not None:
+            self._book.save(self.filename)
+            self._book = None
+            self._sheet = None
+
+
+class CSVSink(OutputSink):
+    """Writes rows to a plain comma-separated values file.
+
+    Class Data:
+        - self.filename, the name of the file, including the '.csv'
+          extension added to the <filename> argument.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename + ".csv"
+        self._file = None
+        self._writer = None
+
+    def open(self, names):
+        self._file = open(self.filename, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(names)
+
+    def write_row(self, values):
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        self._writer.writerow(values)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+
+class NumpySink(OutputSink):
+    """Writes rows to a NumPy .npz archive, or a bare .npy file.
+
+    The rows are streamed as float64 values into a .npy file whose
+    header is rewritten with the final number of rows on close. By
+    default, the .npy file is then stored in an .npz archive, as the
+    array 'data', alongside the array 'names' of vertex names, so that
+    the archive can be read back with numpy.load. With <archiveFlag>
+    set to False, only the bare .npy file of data is kept.
+
+    Class Data:
+        - self.filename, the name of the output file, including the
+          '.npz' or '.npy' extension added to the <filename> argument.
+    """
+
+    headerSize = 128
+
+    def __init__(self, filename, archiveFlag=True):
+        self._archiveFlag = archiveFlag
+        if archiveFlag:
+            self.filename = filename + ".npz"
+            self._dataFilename = filename + ".data.npy"
+        else:
+            self.filename = filename + ".npy"
+            self._dataFilename = self.filename
+        self._file = None
+        self._names = None
+        self._rowCount = 0
+
+    def _write_header(self):
+        """Writes a fixed-size .npy header for the rows written so far."""
+
+        header = ("{{'descr': '<f8', 'fortran_order': False, 'shape': "
+                  "({0}, {1}), }}".format(self._rowCount, len(self._names)))
+        header = header.ljust(self.headerSize - 11) + "\n"
+        self._file.seek(0)
+        self._file.write(b"\x93NUMPY\x01\x00")
+        self._file.write(struct.pack("<H", len(header)))
+        self._file.write(header.encode("latin1"))
+
+    def open(self, names):
+        self._names = [str(name) for name in names]
+        self._rowCount = 0
+        self._file = open(self._dataFilename, "wb")
+        self._write_header()
+
+    def write_row(self, values):
+        self._file.write(np.asarray(values, dtype="<f8").tobytes())
+        self._rowCount += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        self._write_header()
+        self._file.close()
+        self._file = None
+        if self._archiveFlag:
+            with zipfile.ZipFile(self.filename, "w") as archive:
+                archive.write(self._dataFilename, "data.npy")
+                with archive.open("names.npy", "w") as nameFile:
+                    np.save(nameFile, np.array(self._names))
+            os.remove(self._dataFilename)
+
+
+def main():
+    """Test script for the sinks of this module.
+
+    The script writes the same rows through every sink, and reads the
+    NumPy output back.
+    """
+
+    names = ["A", "B"]
+    rows = [[1.0, 2.0], [1.5, 2.5], [2.0, 3.0]]
+    for sink in (SpreadsheetSink("sink_test"), CSVSink("sink_test"),
+                 NumpySink("sink_test")):
+        with sink:
+            sink.open(names)
+            for row in rows:
+                sink.write_row(row)
+        print(sink.filename)
+    archive = np.load("sink_test.npz")
+    print(archive["names"], archive["data"])  # Should print the rows
+
+
+if __name__ == '__main__':
+    main()
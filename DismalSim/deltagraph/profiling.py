@@ -0,0 +1,278 @@
+"""Instrumented simulation runs, for finding where the time goes.
+
+Passing a StepProfiler as the <profiler> argument of
+deltacalc.gc_multicount_delta or deltacalc.gp_multicount_delta times
+the run as it goes. The loop of the run is the usual one: each of its
+phases--the calculation of the deltas, their application, logging,
+output and checkpoints--is wrapped once, before the first step, by the
+timed method of the profiler, and, for a DiGraph, every edge is
+replaced for the duration of the run by a proxy timing its
+contribution, so that the time of every edge evaluation is also
+charged to its transform and to its child vertex. Without a profiler,
+the phases are called directly, and nothing is timed.
+
+The timings include the overhead of the timer calls themselves, which
+is significant next to the evaluation of a single edge; they are meant
+for comparing phases, transforms and vertices with each other, not as
+absolute costs.
+
+Classes:
+    - StepProfiler
+    - ProfileReport
+"""
+
+import collections
+import json
+import time
+
+from DismalSim.deltagraph import deltacalc
+from DismalSim.deltagraph import digraph
+
+
+_transformNames = {tKey: tName for tName, tKey
+                   in digraph.Vertex.transformKeyMap.items()}
+
+
+class ProfileReport(collections.namedtuple("ProfileReport",
+                                           ["steps", "totalTime", "phases",
+                                            "transforms", "vertices"])):
+    """The timings collected by a StepProfiler.
+
+    All times are in seconds.
+
+    Class Data:
+        - steps, the number of steps profiled, counting the steps
+          applying the initial deltas.
+        - totalTime, the total time of the profiled runs.
+        - phases, a dictionary of the 'calls' and 'seconds' of each
+          phase of the runs, indexed by phase name. The phases are
+          'sparse_plan', 'push_sources', 'manual_delta', 'transform',
+          'ordered_step', 'apply_delta_inherent', 'exogenous',
+          'apply_delta_float', 'logging', 'output' and 'checkpoint';
+          only those the runs went through are present.
+        - transforms, a dictionary of the 'calls' and 'seconds' of the
+          edge evaluations of each transform, indexed by transform
+          name. It is empty for the runs of a CompiledGraph, whose
+          edges are evaluated in vectorized passes.
+        - vertices, the list of the most expensive vertices, most
+          expensive first, as dictionaries of their 'name' and of the
+          'seconds' spent evaluating the edges into them.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self):
+        """Returns the report as a dictionary of plain values."""
+        return self._asdict()
+
+    def dump(self, filename):
+        """Writes the report to the JSON file <filename>."""
+
+        with open(filename, "w") as reportFile:
+            json.dump(self.as_dict(), reportFile, indent=1, default=str)
+
+
+class _TimedEdge:
+    """Stands in for an edge during a profiled run, timing each call.
+
+    Class Data:
+        - self.edge, the edge record it stands in for.
+        - self.tKey, the transform key of the edge.
+        - self.child, the child vertex of the edge.
+        - self.profiler, the StepProfiler the timings go to.
+    """
+
+    __slots__ = ("edge", "tKey", "child", "profiler")
+
+    def __init__(self, edge, child, profiler):
+        self.edge = edge
+        self.tKey = edge.tKey
+        self.child = child
+        self.profiler = profiler
+
+    def contribution(self, value, data):
+        """Returns the contribution of the edge, timing its evaluation."""
+
+        start = time.perf_counter()
+        result = self.edge.contribution(value, data)
+        self.profiler._edge(self, time.perf_counter() - start)
+        return result
+
+
+class StepProfiler:
+    """Collects the timings of instrumented simulation runs.
+
+    A StepProfiler accumulates timings over every run it is passed to,
+    until it is reset. Runs of a DiGraph are timed phase by phase and
+    edge by edge; runs of a CompiledGraph, whose phases are single
+    vectorized operations, are timed phase by phase only.
+
+    Class Data:
+        - self.topN, the number of vertices listed in the report.
+        - self.phases, a dictionary of [calls, seconds] lists, indexed
+          by phase name.
+        - self.transforms, a dictionary of [calls, seconds] lists,
+          indexed by transform key.
+        - self.vertices, a dictionary of seconds, indexed by vertex.
+        - self.steps, the number of steps profiled.
+        - self.totalTime, the total time of the profiled runs.
+        - self._runStart, the starting time of the current run, or
+          None between runs.
+
+    Public Methods:
+        - reset
+        - add_phase
+        - timed
+        - begin
+        - end
+        - report
+    """
+
+    def __init__(self, topN=10):
+        """Initializes an empty StepProfiler.
+
+        Method Parameters:
+            - topN, the number of most expensive vertices to report; it
+              defaults to 10.
+        """
+
+        self.topN = topN
+        self._runStart = None
+        self.reset()
+
+    def reset(self):
+        """Discards all of the timings collected so far."""
+
+        self.phases = {}
+        self.transforms = {}
+        self.vertices = collections.defaultdict(float)
+        self.steps = 0
+        self.totalTime = 0.0
+
+    def add_phase(self, name, seconds, calls=1):
+        """Adds <calls> calls taking <seconds> in all to phase <name>."""
+
+        record = self.phases.get(name)
+        if record is None:
+            self.phases[name] = [calls, seconds]
+        else:
+            record[0] += calls
+            record[1] += seconds
+
+    def timed(self, name, function):
+        """Returns <function>, wrapped to time each call as phase <name>.
+
+        The phase 'apply_delta_float' ends every step, and its calls
+        are also counted as steps.
+        """
+
+        stepFlag = name == "apply_delta_float"
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add_phase(name, time.perf_counter() - start)
+                if stepFlag:
+                    self.steps += 1
+
+        return wrapper
+
+    def begin(self, aGraph):
+        """Starts timing a run of <aGraph>.
+
+        The edges of a DiGraph are replaced by timing proxies, in both
+        the parent and the child dictionaries of their vertices, until
+        end is called.
+
+        Method Parameters:
+            - aGraph, a DiGraph or a CompiledGraph.
+        """
+
+        self._runStart = time.perf_counter()
+        if not isinstance(aGraph, digraph.DiGraph):
+            return
+        proxies = {}
+        for vertex in aGraph:
+            for pVertex, edge in vertex._parents.items():
+                proxy = _TimedEdge(edge, vertex, self)
+                proxies[id(edge)] = proxy
+                vertex._parents[pVertex] = proxy
+        for vertex in aGraph:
+            for cVertex, edge in vertex._children.items():
+                if id(edge) in proxies:
+                    vertex._children[cVertex] = proxies[id(edge)]
+
+    def end(self, aGraph):
+        """Finishes timing a run of <aGraph>, restoring its edges."""
+
+        if isinstance(aGraph, digraph.DiGraph):
+            for vertex in aGraph:
+                for edges in (vertex._parents, vertex._children):
+                    for other, edge in edges.items():
+                        if isinstance(edge, _TimedEdge):
+                            edges[other] = edge.edge
+        if self._runStart is not None:
+            self.totalTime += time.perf_counter() - self._runStart
+            self._runStart = None
+
+    def _edge(self, proxy, seconds):
+        """Adds an edge evaluation taking <seconds> to <proxy>'s totals."""
+
+        record = self.transforms.get(proxy.tKey)
+        if record is None:
+            self.transforms[proxy.tKey] = [1, seconds]
+        else:
+            record[0] += 1
+            record[1] += seconds
+        self.vertices[proxy.child] += seconds
+
+    def report(self):
+        """Returns a ProfileReport of the timings collected so far."""
+
+        phases = {name: {"calls": calls, "seconds": seconds}
+                  for name, (calls, seconds) in self.phases.items()}
+        transforms = {_transformNames[tKey]: {"calls": calls,
+                                              "seconds": seconds}
+                      for tKey, (calls, seconds)
+                      in sorted(self.transforms.items())}
+        ranked = sorted(self.vertices.items(), key=lambda item: item[1],
+                        reverse=True)[:self.topN]
+        vertices = [{"name": vertex.name, "seconds": seconds}
+                    for vertex, seconds in ranked]
+        return ProfileReport(self.steps, self.totalTime, phases, transforms,
+                             vertices)
+
+
+def main():
+    """Test script for the StepProfiler class.
+
+    The script runs the same graph with and without a profiler, prints
+    whether the two data logs are identical, and prints the report.
+    """
+
+    def build():
+        aGraph = digraph.DiGraph()
+        aGraph + digraph.Vertex("A", 10)
+        aGraph + digraph.Vertex("B", 10, deltaInherent=1)
+        aGraph + digraph.Vertex("C", 10, deltaInherent=2, percentFlag=True)
+        aGraph + digraph.Vertex("D", 10)
+        aGraph.add_edge("A", "B", "aa_lin", [2, 2])
+        aGraph.add_edge("A", "C", "pp_lin", [10, 15])
+        aGraph.add_edge("B", "D", "aa_poly", [0.01, 2, 1])
+        aGraph.add_edge("C", "D", "aa_exp", [1.01])
+        aGraph.add_edge("D", "A", "aa_lin", [0.5])
+        return aGraph
+
+    iDelta = {"A": 20}
+    profiler = StepProfiler(topN=3)
+    plainLog = deltacalc.gc_multicount_delta(build(), 5, iDelta)
+    profiledLog = deltacalc.gc_multicount_delta(build(), 5, iDelta,
+                                                profiler=profiler)
+    print(plainLog == profiledLog)  # Should print True
+    print(json.dumps(profiler.report().as_dict(), indent=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Sparse matrices for the array-backed simulation engine.
+
+The compiled module represents all-linear graphs as a sparse transition
+matrix. When SciPy is installed, the matrices built by this module are
+scipy.sparse CSR matrices; otherwise a minimal pure-NumPy CSR matrix is
+used instead, supporting the matrix-vector and matrix-matrix products
+that the engine needs.
+
+The module also solves the sparse linear systems, and estimates the
+spectral radii, used by the long-run multipliers of the digraph module,
+with SciPy's sparse LU factorization and ARPACK eigensolver when they
+are available, and with dense NumPy routines or power iteration
+otherwise.
+
+Classes:
+    - CSRMatrix
+
+Functions:
+    - csr_matrix
+    - solve
+    - spectral_radius
+"""
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from scipy.sparse import linalg as sparselinalg
+except ImportError:
+    sparse = None
+    sparselinalg = None
+
+
+class CSRMatrix:
+    """A minimal compressed-sparse-row matrix built on NumPy.
+
+    The class is a fallback for scipy.sparse.csr_matrix, and only
+    supports right-multiplication by a dense vector or matrix through
+    the @ operator.
+
+    Class Data:
+        - self.shape, the (rows, columns) shape of the matrix.
+        - self.data, the array of nonzero values, ordered by row.
+        - self.indices, the array of column indices of the values.
+        - self.indptr, the row pointer; the values of row i are
+          data[indptr[i]:indptr[i+1]].
+    """
+
+    def __init__(self, values, rows, cols, shape):
+        """Initializes the matrix from coordinate-format entries.
+
+        Entries with the same row are kept in the order they are given
+        in; duplicate (row, column) pairs are summed when multiplying.
+
+        Method Parameters:
+            - values, the sequence of values of the entries.
+            - rows, the sequence of row indices of the entries.
+            - cols, the sequence of column indices of the entries.
+            - shape, the (rows, columns) shape of the matrix.
+        """
+
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.argsort(rows, kind="stable")
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.data = np.asarray(values, dtype=np.float64)[order]
+        self.indices = np.asarray(cols, dtype=np.int64)[order]
+        self._rows = rows[order]
+        self.indptr = np.zeros(self.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._rows, minlength=self.shape[0]),
+                  out=self.indptr[1:])
+
+    def __matmul__(self, other):
+        """Multiplies the matrix by a dense vector or matrix."""
+
+        other = np.asarray(other, dtype=np.float64)
+        if other.ndim == 1:
+            products = self.data * other[self.indices]
+            return np.bincount(self._rows, products, minlength=self.shape[0])
+        products = self.data[:, None] * other[self.indices]
+        result = np.zeros((self.shape[0], other.shape[1]))
+        np.add.at(result, self._rows, products)
+        return result
+
+    def toarray(self):
+        """Returns the matrix as a dense NumPy array."""
+
+        dense = np.zeros(self.shape)
+        np.add.at(dense, (self._rows, self.indices), self.data)
+        return dense
+
+
+def csr_matrix(values, rows, cols, shape):
+    """Builds a CSR matrix from coordinate-format entries.
+
+    The function returns a scipy.sparse.csr_matrix if SciPy is
+    available, and a CSRMatrix otherwise.
+
+    Function Arguments:
+        - values
+        - rows
+        - cols
+        - shape
+    """
+
+    if sparse is not None:
+        return sparse.csr_matrix((np.asarray(values, dtype=np.float64),
+                                  (rows, cols)), shape=shape)
+    return CSRMatrix(values, rows, cols, shape)
+
+
+def solve(values, rows, cols, shape, rhs):
+    """Solves the linear system given by coordinate-format entries.
+
+    The system is solved by sparse LU factorization if SciPy is
+    available, and as a dense system otherwise. Duplicate (row, column)
+    pairs are summed. A singular system gives non-finite values, or
+    raises numpy.linalg.LinAlgError.
+
+    Function Arguments:
+        - values
+        - rows
+        - cols
+        - shape
+        - rhs, the right-hand side vector.
+    """
+
+    rhs = np.asarray(rhs, dtype=np.float64)
+    if sparselinalg is not None:
+        matrix = sparse.csc_matrix((np.asarray(values, dtype=np.float64),
+                                    (rows, cols)), shape=shape)
+        return np.atleast_1d(sparselinalg.spsolve(matrix, rhs))
+    dense = CSRMatrix(values, rows, cols, shape).toarray()
+    return np.linalg.solve(dense, rhs)
+
+
+def spectral_radius(values, rows, cols, shape, denseLimit=500,
+                    iterations=200):
+    """Returns the spectral radius of the matrix of the given entries.
+
+    Matrices with at most <denseLimit> rows are solved exactly with a
+    dense eigenvalue routine. Larger ones use SciPy's ARPACK solver,
+    if available; failing that, the radius is estimated by <iterations>
+    steps of power iteration, as the geometric mean of the growth of a
+    vector per step, which is only approximate for matrices whose
+    largest eigenvalues are close in magnitude.
+
+    Function Arguments:
+        - values
+        - rows
+        - cols
+        - shape
+        - denseLimit
+        - iterations
+    """
+
+    nRows = shape[0]
+    if nRows == 0:
+        return 0.0
+    if nRows <= denseLimit:
+        dense = CSRMatrix(values, rows, cols, shape).toarray()
+        return float(np.max(np.abs(np.linalg.eigvals(dense))))
+    matrix = csr_matrix(values, rows, cols, shape)
+    if sparselinalg is not None:
+        try:
+            eigenvalues = sparselinalg.eigs(matrix, k=1, which="LM",
+                                            return_eigenvectors=False)
+            return float(np.max(np.abs(eigenvalues)))
+        except sparselinalg.ArpackNoConvergence:
+            pass
+    vector = np.random.default_rng(0).random(nRows) + 1.0
+    vector /= np.linalg.norm(vector)
+    logGrowth = 0.0
+    for _ in range(iterations):
+        vector = matrix @ vector
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return 0.0
+        logGrowth += np.log(norm)
+        vector /= norm
+    return float(np.exp(logGrowth / iterations))
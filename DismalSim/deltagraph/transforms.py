@@ -12,6 +12,21 @@ returned as a multiplier, not a percentage proper. Additionally, a
 'base' identifier is used, marking the wrapped functions containing
 code shared across analogous transform types.
 
+Every base, AA, AP, PA and PP function also accepts NumPy arrays, so
+that a batched engine can evaluate the edges of a whole transform
+family, across many runs, in one call. When <value>, or <parameters>,
+or any of the parameters is an array, the arrays are broadcast
+together--for instance an array of values of shape (runs, edges)
+against gradient arrays of shape (edges,)--and the result is a float64
+array of the broadcast shape, computed with the same formulas as for
+scalars. Polynomials whose exponents are small non-negative integers
+shared by all elements are evaluated in Horner form, which differs
+from the term-by-term sum only by rounding. Where the scalar functions
+raise an exception for a single value, such as a complex result of a
+negative base raised to a fractional power, the array functions follow
+IEEE arithmetic instead, giving nan or inf with a RuntimeWarning. With
+scalar arguments only, the functions behave exactly as before.
+
 Function Identifiers:
     - AA, takes an absolute change, returns an absolute change.
     - AP, takes an absolute change, returns a percentage change.
@@ -19,6 +34,10 @@ Function Identifiers:
     - PP, takes a percentage change, returns a percentage change.
     - base, a basic transform function, wrapped by the other functions
       to reduce code repetition.
+    - normalize, validates transform parameters once, and returns them
+      in the canonical form expected by the fast functions and by the
+      Edge classes of the digraph module.
+    - fast, an unchecked transform function, for canonical parameters.
 
 Functions:
     - base_linear
@@ -36,12 +55,22 @@ Functions:
     - PP_ linear
     - PP_exponential
     - PP_polynomial
+    - normalize_linear
+    - normalize_exponential
+    - normalize_polynomial
+    - fast_linear
+    - fast_exponential
+    - fast_polynomial
 
 Exceptions:
     - TransformError
     - ParameterError
 """
 
+import numbers
+
+import numpy as np
+
 
 class TransformError(Exception):
     """Base class for exceptions defined by this module.
@@ -79,14 +108,133 @@ class ParameterError(TransformError):
                    " present in supplied sequence. Unable to extract all"
                    " necessary transform parameters.",
                 2: "A value in the sequence <parameters> is not an integer or a"
-                   " float. Unable to use value for computation."}
+                   " float. Unable to use value for computation.",
+                3: "The shapes of the arrays of <value> and <parameters> can"
+                   " not be broadcast together. Unable to evaluate the"
+                   " transform element-wise."}
+
+
+_hornerDegree = 32
+
+
+def _is_array(value, parameters):
+    """Returns whether a transform is to be evaluated on arrays."""
+
+    if isinstance(value, np.ndarray) or isinstance(parameters, np.ndarray):
+        return True
+    return (isinstance(parameters, (tuple, list))
+            and any(isinstance(item, np.ndarray) for item in parameters))
+
+
+def _check_array(value):
+    """Returns <value> as a float64 array, or raises ParameterError(2)."""
+
+    array = np.asarray(value)
+    if array.dtype.kind not in "biuf":
+        raise ParameterError(2)
+    return array.astype(np.float64, copy=False)
+
+
+def _split_arrays(parameters):
+    """Returns the parameters of an array transform, as float64 arrays.
+
+    <parameters> is either a tuple or list of numbers and arrays, or an
+    array whose first axis runs over the parameters.
+    """
+
+    if isinstance(parameters, np.ndarray):
+        if parameters.ndim == 0:
+            raise ParameterError(0)
+    elif not isinstance(parameters, (tuple, list)):
+        raise ParameterError(0)
+    return [_check_array(item) for item in parameters]
+
+
+def _array_linear(value, parameters):
+    """Element-wise base_linear, for arrays."""
+
+    value = _check_array(value)
+    arrays = _split_arrays(parameters)
+    if len(arrays) < 1:
+        raise ParameterError(1)
+    intercept = arrays[1] if len(arrays) > 1 else 0.0
+    try:
+        return np.asarray((arrays[0] * value) + intercept)
+    except ValueError:
+        raise ParameterError(3)
+
+
+def _array_exponential(value, parameters):
+    """Element-wise base_exponential, for arrays."""
+
+    value = _check_array(value)
+    arrays = _split_arrays(parameters)
+    if len(arrays) < 1:
+        raise ParameterError(1)
+    constant = arrays[1] if len(arrays) > 1 else 0.0
+    try:
+        return np.asarray(np.power(arrays[0], value) + constant)
+    except ValueError:
+        raise ParameterError(3)
+
+
+def _horner_degrees(exponents):
+    """Returns the exponents as integer degrees, if Horner form applies.
+
+    Horner form applies when every exponent is a single, non-negative
+    integer of at most _hornerDegree; otherwise None is returned.
+    """
+
+    degrees = []
+    for exponent in exponents:
+        if exponent.ndim != 0 or not np.isfinite(exponent):
+            return None
+        degree = int(exponent)
+        if degree != exponent or not 0 <= degree <= _hornerDegree:
+            return None
+        degrees.append(degree)
+    return degrees
+
+
+def _array_polynomial(value, parameters):
+    """Element-wise base_polynomial, for arrays.
+
+    The terms are summed in Horner form, with one multiplication and
+    one addition per degree, when _horner_degrees allows it, and one
+    power per term otherwise.
+    """
+
+    value = _check_array(value)
+    arrays = _split_arrays(parameters)
+    nTerms = len(arrays) // 2
+    coefficients = arrays[0:2 * nTerms:2]
+    exponents = arrays[1:2 * nTerms:2]
+    constant = arrays[-1] if len(arrays) % 2 != 0 else 0.0
+    degrees = _horner_degrees(exponents)
+    try:
+        if degrees:
+            dense = [0.0] * (max(degrees) + 1)
+            for coefficient, degree in zip(coefficients, degrees):
+                dense[degree] = dense[degree] + coefficient
+            newVal = dense[-1] * np.ones(value.shape)
+            for coefficient in reversed(dense[:-1]):
+                newVal = (newVal * value) + coefficient
+        else:
+            newVal = np.zeros(value.shape)
+            for coefficient, exponent in zip(coefficients, exponents):
+                newVal = newVal + (coefficient * np.power(value, exponent))
+        return np.asarray(newVal + constant)
+    except ValueError:
+        raise ParameterError(3)
 
 
 def base_linear(value, parameters):
     """Basic linear transform function, intended for wrapping.
 
     The defined ordering for the sequence is [gradient, <intercept>],
-    where the intercept is optional, and will default to 0.
+    where the intercept is optional, and will default to 0. If <value>,
+    <parameters> or any parameter is a NumPy array, the transform is
+    evaluated element-wise, and returns an array.
 
     Function Arguments:
         - value, the value to be linearly transformed
@@ -95,6 +243,8 @@ def base_linear(value, parameters):
           transform function.
     """
 
+    if _is_array(value, parameters):
+        return _array_linear(value, parameters)
     if isinstance(parameters, (tuple, list)):
         try:
             gradient = parameters[0]  # Extracts the gradient
@@ -118,7 +268,8 @@ def base_exponential(value, parameters):
     """Basic exponential transform function, intended for wrapping.
 
     The defined ordering for the sequence is [base, <constant>], where
-    the constant is optional and will default to 0.
+    the constant is optional and will default to 0. Arrays are
+    evaluated element-wise, as by base_linear.
 
     Function Arguments:
         - value, the value to be exponentially transformed.
@@ -127,6 +278,8 @@ def base_exponential(value, parameters):
           transform function.
     """
 
+    if _is_array(value, parameters):
+        return _array_exponential(value, parameters)
     if isinstance(parameters, (tuple, list)):
         try:
             base = parameters[0]  # Extracts the base
@@ -150,7 +303,9 @@ def base_polynomial(value, parameters):
     The defined ordering for the sequence is [coefficient 1,
     exponent 1, coefficient 2, exponent 2, . . . , coefficient n,
     exponent n], where n is an arbitrary integer, as the function
-    supports polynomial expressions of arbitrary length.
+    supports polynomial expressions of arbitrary length. Arrays are
+    evaluated element-wise, as by base_linear, in Horner form when the
+    exponents are small non-negative integers.
 
     Function Arguments:
         - value, the value to be polynomially transformed
@@ -159,6 +314,8 @@ def base_polynomial(value, parameters):
           transform function.
     """
 
+    if _is_array(value, parameters):
+        return _array_polynomial(value, parameters)
     if isinstance(parameters, (tuple, list)):
         try:
             newVal = 0
@@ -419,6 +576,114 @@ def PP_polynomial(value, parameters):
     return multiplier
 
 
+def _check_number(value):
+    """Returns <value> as a float, or raises ParameterError(2)."""
+
+    if not isinstance(value, numbers.Real):
+        raise ParameterError(2)
+    return float(value)
+
+
+def normalize_linear(parameters):
+    """Validates linear transform parameters, once, before use.
+
+    The function performs the checks that base_linear performs on every
+    call, raising a ParameterError for invalid parameters, and returns
+    the parameters in canonical form: a (gradient, intercept) tuple of
+    floats, with the optional intercept made explicit.
+
+    Function Arguments:
+        - parameters, the container sequence (Current implementation
+          accepts tuples and lists) holding the parameters for the
+          transform function.
+    """
+
+    if not isinstance(parameters, (tuple, list)):
+        raise ParameterError(0)
+    if len(parameters) < 1:
+        raise ParameterError(1)
+    gradient = _check_number(parameters[0])
+    intercept = _check_number(parameters[1]) if len(parameters) > 1 else 0.0
+    return gradient, intercept
+
+
+def normalize_exponential(parameters):
+    """Validates exponential transform parameters, once, before use.
+
+    The function returns the parameters in canonical form: a
+    (base, constant) tuple of floats. See normalize_linear.
+
+    Function Arguments:
+        - parameters, the container sequence holding the parameters for
+          the transform function.
+    """
+
+    if not isinstance(parameters, (tuple, list)):
+        raise ParameterError(0)
+    if len(parameters) < 1:
+        raise ParameterError(1)
+    base = _check_number(parameters[0])
+    constant = _check_number(parameters[1]) if len(parameters) > 1 else 0.0
+    return base, constant
+
+
+def normalize_polynomial(parameters):
+    """Validates polynomial transform parameters, once, before use.
+
+    The function returns the parameters in canonical form: a tuple of
+    floats ordered as [coefficient 1, exponent 1, . . . , coefficient n,
+    exponent n, constant], with the optional constant made explicit.
+    See normalize_linear.
+
+    Function Arguments:
+        - parameters, the container sequence holding the parameters for
+          the transform function.
+    """
+
+    if not isinstance(parameters, (tuple, list)):
+        raise ParameterError(0)
+    canonical = [_check_number(value) for value in parameters]
+    if len(canonical) % 2 == 0:
+        canonical.append(0.0)
+    return tuple(canonical)
+
+
+def fast_linear(value, gradient, intercept):
+    """Unchecked linear transform, for canonical parameters.
+
+    The function skips the checks of base_linear, and expects the
+    parameters as returned by normalize_linear. It is called by the
+    CompiledGraph on whole arrays of edges; the scalar edge records of
+    the digraph module inline the same formula instead, since a second
+    call per edge would cost more than the formula itself.
+    """
+    return (gradient * value) + intercept
+
+
+def fast_exponential(value, base, constant):
+    """Unchecked exponential transform, for canonical parameters.
+
+    The function skips the checks of base_exponential, and expects the
+    parameters as returned by normalize_exponential. See fast_linear.
+    """
+    return (base ** value) + constant
+
+
+def fast_polynomial(value, terms, constant):
+    """Unchecked polynomial transform, for canonical parameters.
+
+    The function skips the checks of base_polynomial, and expects the
+    parameters as returned by normalize_polynomial, split into the
+    sequence of (coefficient, exponent) <terms> and the <constant>, as
+    held by the polynomial edge records of the digraph module.
+    """
+
+    newVal = 0
+    for coefficient, exponent in terms:
+        newVal += coefficient * (value ** exponent)
+    return newVal + constant
+
+
 def main():
     """Test script for the functions and exceptions in this module.
 
@@ -501,6 +766,19 @@ def main():
 
     # End Computation Test
 
+    # Begin Array Test
+    print("Testing transform functions on arrays.")
+    values = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])  # Two runs
+    gradients = np.array([2.0, 3.0, 4.0])  # One gradient per edge
+    print(AA_linear(values, [gradients, 1]))  # Should print [[3 7 13]
+    #                                                          [9 16 25]]
+    print(PP_exponential(values[0], [2]))  # Should print [.02 .04 .08]
+    aVal = AA_polynomial(values, [1, 2, 2, 3, 9])  # Horner form
+    print(np.allclose(aVal, [[AA_polynomial(x, [1, 2, 2, 3, 9])
+                             for x in row] for row in values.tolist()]))
+    # Should print True
+    # End Array Test
+
 
 if __name__ == '__main__':
     main()